@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+# Concurrent generator runner
+#
+# Generators depend on each other as the stages in stages.py declare. The runner starts
+# every generator as an asyncio task that waits for its dependencies and then runs in a worker
+# thread with its own pooled connection and sink, so independent generators (messages,
+# conversations and topups, for instance) overlap their database round-trips instead of
+# waiting on each other. A semaphore caps how many run at once, and the pool holds one
+# connection per slot.
+#
+# Generators run in threads of one process, so their Python work (Faker, encoding)
+# still takes turns on the GIL; the overlap comes from time spent waiting on Postgres.
+# Use --workers for CPU-bound scaling.
+
+import asyncio
+import time
+
+from psycopg2.pool import ThreadedConnectionPool
+
+import python_data_generator as generator
+from bulk_loader import LoadMode, make_sink
+from instrumentation import instrument_sink, stage
+from stages import STAGES, plan_stages, stage_dependencies
+
+# Generators run at once by default
+DEFAULT_CONCURRENCY = 4
+
+# Call a generator on its own connection and sink (options holds the generate_all_data
+# settings: now, vectorized, server_side, rating_summary, itersize), as an instrumented stage
+def run_generator(name, conn, sink, counts, options):
+    with stage(name):
+        _call_generator(name, conn, instrument_sink(sink), counts, options)
+
+def _call_generator(name, conn, sink, counts, options):
+    if name == 'specialties':
+        generator.generate_specialties(conn, sink)
+    elif name == 'users':
+        generator.generate_users(conn, counts['users'], sink)
+    elif name == 'advisors':
+        generator.generate_advisors(conn, counts['advisors'], sink)
+    elif name == 'admins':
+        generator.generate_admins(conn, counts['admins'], sink)
+    elif name == 'sessions':
+        if options.get('server_side'):
+            from server_side import generate_sessions_server
+            generate_sessions_server(conn, counts['sessions'], options.get('now'))
+        elif options.get('vectorized'):
+            from vectorized import generate_sessions_vectorized
+            generate_sessions_vectorized(conn, counts['sessions'], sink, options.get('now'))
+        else:
+            generator.generate_sessions(conn, counts['sessions'], sink)
+    elif name == 'messages':
+        if options.get('server_side'):
+            from server_side import generate_messages_server
+            generate_messages_server(conn, counts['messages'], options.get('now'), counts['message_threads'])
+        else:
+            generator.generate_messages(conn, counts['messages'], sink, counts['message_threads'])
+    elif name == 'reviews':
+        generator.generate_reviews(
+            conn, sink, options.get('rating_summary', False), options.get('itersize', generator.CURSOR_ITERSIZE)
+        )
+    elif name == 'conversations':
+        generator.generate_conversations(
+            conn, counts['conversations'], sink, options.get('itersize', generator.CURSOR_ITERSIZE)
+        )
+    elif name == 'topups':
+        if options.get('server_side'):
+            from server_side import generate_topups_server
+            generate_topups_server(conn, counts['topups'], options.get('now'))
+        else:
+            generator.generate_topups(conn, counts['topups'], sink, options.get('now'))
+    else:
+        raise ValueError(f"Unknown generator: {name}")
+
+def _run_pooled(pool, name, counts, load_mode, options):
+    conn = pool.getconn()
+    try:
+        started = time.perf_counter()
+        run_generator(name, conn, make_sink(conn, load_mode), counts, options)
+        print(f"Finished {name} in {time.perf_counter() - started:.1f}s.")
+    finally:
+        conn.rollback()
+        pool.putconn(conn)
+
+# Run the named generators, each as soon as the ones it depends on have finished
+#
+# Dependencies on generators that are not part of this run are taken as already met.
+async def run_generators_async(names, counts, load_mode=LoadMode.INSERT, concurrency=DEFAULT_CONCURRENCY, options=None):
+    options = options or {}
+    concurrency = max(1, min(concurrency, len(names)))
+    pool = ThreadedConnectionPool(1, concurrency, **generator.db_connection_params())
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = {}
+
+    async def run(name):
+        dependencies = [tasks[dependency] for dependency in stage_dependencies(name) if dependency in tasks]
+        await asyncio.gather(*dependencies)
+        async with semaphore:
+            await asyncio.to_thread(_run_pooled, pool, name, counts, load_mode, options)
+
+    try:
+        started = time.perf_counter()
+        # Dependencies come first in STAGES, so they already have tasks
+        for name in STAGES:
+            if name in names:
+                tasks[name] = asyncio.create_task(run(name))
+        await asyncio.gather(*tasks.values())
+        print(f"Ran {len(tasks)} generator(s) with concurrency {concurrency} in {time.perf_counter() - started:.1f}s.")
+    finally:
+        pool.closeall()
+
+def run_generators(names, counts, load_mode=LoadMode.INSERT, concurrency=DEFAULT_CONCURRENCY, options=None):
+    asyncio.run(run_generators_async(names, counts, load_mode, concurrency, options))
+
+# Run target stages and only the prerequisites they are missing
+#
+# counts must hold a row count for every counted stage that may run. With skip_complete
+# the targets themselves are skipped when their outputs are already complete.
+def run_targets(targets, counts, load_mode=LoadMode.INSERT, concurrency=DEFAULT_CONCURRENCY, options=None,
+                skip_complete=False):
+    conn = generator.get_db_connection()
+    try:
+        stages = plan_stages(conn, targets, counts, skip_complete)
+    finally:
+        conn.close()
+    if stages:
+        run_generators(stages, counts, load_mode, concurrency, options)
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+
+# Seeding throughput benchmark
+#
+# For every scale factor the benchmark clones the schema-only template of the configured
+# database (PGDATABASE, see schema_template.py) into a throwaway database and runs each
+# stage in dependency order, every stage in a fresh process so that its peak RSS and CPU
+# time are its own.
+# Per stage it records rows written (from row counts before and after), rows/sec, the
+# latency percentiles of the sink's commits (from the instrumentation's commit events), peak RSS and CPU time, and writes them all
+# to a JSON results file.
+#
+# With --baseline the results are compared against an earlier results file: a stage
+# regresses when its rows/sec drops, or its peak RSS grows, by more than --threshold.
+# The exit status is 1 when anything regressed.
+#
+#   python3 benchmark.py --scale-factors 1,10 --load-mode copy-binary \
+#       --output results.json --baseline baseline.json --threshold 0.15
+
+import io
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import resource
+import multiprocessing
+from datetime import datetime
+
+import instrumentation
+import python_data_generator as generator
+from async_runner import run_generator
+from bulk_loader import LoadMode, make_sink
+from schema_template import clone_database, drop_database, ensure_schema_template
+from stages import RESOURCE_QUERIES, STAGES
+
+DEFAULT_SCALE_FACTORS = (1, 10)
+DEFAULT_THRESHOLD = 0.1
+
+# Seconds between checks that a stage's process is still alive
+RESULT_POLL_SECONDS = 1
+
+def _resource_rows(cursor, resources):
+    rows = {}
+    for resource_name in resources:
+        query, params = RESOURCE_QUERIES[resource_name]
+        cursor.execute(query, params)
+        rows[resource_name] = cursor.fetchone()[0]
+    return rows
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+# Run one stage and report its measurements (runs in a child process)
+def _measure_stage(stage, counts, load_mode, results):
+    try:
+        results.put(_stage_measurements(stage, counts, load_mode))
+    except BaseException as e:
+        # Report the failure (sys.exit included) so the parent does not wait for a result
+        results.put({'stage': stage, 'error': str(e) or type(e).__name__})
+
+def _stage_measurements(stage, counts, load_mode):
+    # run_generator instruments the sink; its commit events carry the commit latencies
+    events = io.StringIO()
+    instrumentation.configure(metrics=events)
+    conn = generator.get_db_connection()
+    sink = make_sink(conn, load_mode)
+
+    cursor = conn.cursor()
+    outputs = STAGES[stage]['outputs']
+    before = _resource_rows(cursor, outputs)
+    conn.commit()
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    cpu_before = usage.ru_utime + usage.ru_stime
+    started = time.perf_counter()
+    run_generator(stage, conn, sink, counts, {})
+    seconds = time.perf_counter() - started
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+
+    after = _resource_rows(cursor, outputs)
+    conn.close()
+
+    rows = sum(after[name] - before[name] for name in outputs)
+    latencies = sorted(
+        event['ms'] for event in map(json.loads, events.getvalue().splitlines()) if event['event'] == 'commit'
+    )
+    return {
+        'stage': stage,
+        'rows': rows,
+        'seconds': round(seconds, 4),
+        'rows_per_sec': round(rows / seconds, 1) if seconds > 0 else None,
+        'commit_ms': {
+            'count': len(latencies),
+            'p50': percentile(latencies, 0.5),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+            'max': latencies[-1] if latencies else None,
+        },
+        'peak_rss_mb': round(usage.ru_maxrss / 1024, 1),  # ru_maxrss is in KB on Linux
+        'cpu_seconds': round(usage.ru_utime + usage.ru_stime - cpu_before, 3),
+    }
+
+# Clone the schema-only template of base into an empty throwaway database
+def create_scratch_database(base, name):
+    clone_database(ensure_schema_template(base), name)
+
+def drop_scratch_database(name):
+    drop_database(name)
+
+# Wait for a stage's result, or report its process dying without one
+def _stage_result(stage, child, results):
+    while True:
+        try:
+            return results.get(timeout=RESULT_POLL_SECONDS)
+        except queue.Empty:
+            if not child.is_alive():
+                # A result put just before exiting may still be on its way
+                try:
+                    return results.get(timeout=RESULT_POLL_SECONDS)
+                except queue.Empty:
+                    return {'stage': stage, 'error': f"process exited with status {child.exitcode}"}
+
+# Run every stage at every scale factor, returning the results document
+def run_benchmark(scale_factors, load_mode=LoadMode.INSERT):
+    base = os.environ.get('PGDATABASE')
+    scratch = f"{base}_bench_{os.getpid()}"
+    context = multiprocessing.get_context('spawn')
+    results = []
+
+    try:
+        for scale_factor in scale_factors:
+            counts = generator.scaled_counts(scale_factor)
+            print(f"Scale factor {scale_factor}: {counts}")
+            create_scratch_database(base, scratch)
+
+            # Children connect to the scratch database through the inherited environment
+            os.environ['PGDATABASE'] = scratch
+            try:
+                for stage in STAGES:
+                    stage_results = context.Queue()
+                    child = context.Process(target=_measure_stage, args=(stage, counts, load_mode, stage_results))
+                    child.start()
+                    result = _stage_result(stage, child, stage_results)
+                    child.join()
+                    if 'error' in result:
+                        raise RuntimeError(f"Stage {stage} failed at scale factor {scale_factor}: {result['error']}")
+                    result['scale_factor'] = scale_factor
+                    results.append(result)
+                    commit_ms = result['commit_ms']
+                    print(
+                        f"  {stage}: {result['rows']} rows in {result['seconds']:.2f}s "
+                        f"({result['rows_per_sec']} rows/s), commit p50/p95 "
+                        f"{_format_ms(commit_ms['p50'])}/{_format_ms(commit_ms['p95'])} ms, "
+                        f"peak RSS {result['peak_rss_mb']} MB, CPU {result['cpu_seconds']}s"
+                    )
+            finally:
+                os.environ['PGDATABASE'] = base
+    finally:
+        drop_scratch_database(scratch)
+
+    return {
+        'created_at': datetime.now().isoformat(),
+        'load_mode': load_mode,
+        'scale_factors': list(scale_factors),
+        'results': results,
+    }
+
+def _format_ms(value):
+    return '-' if value is None else f"{value:.1f}"
+
+# Compare results against a baseline, returning the regressions found
+def compare_results(results, baseline, threshold=DEFAULT_THRESHOLD):
+    previous = {(entry['scale_factor'], entry['stage']): entry for entry in baseline['results']}
+    regressions = []
+    for entry in results['results']:
+        base = previous.get((entry['scale_factor'], entry['stage']))
+        if not base:
+            continue
+        if base['rows_per_sec'] and entry['rows_per_sec'] is not None:
+            change = entry['rows_per_sec'] / base['rows_per_sec'] - 1
+            if change < -threshold:
+                regressions.append((entry, 'rows_per_sec', base['rows_per_sec'], entry['rows_per_sec'], change))
+        if base['peak_rss_mb']:
+            change = entry['peak_rss_mb'] / base['peak_rss_mb'] - 1
+            if change > threshold:
+                regressions.append((entry, 'peak_rss_mb', base['peak_rss_mb'], entry['peak_rss_mb'], change))
+    return regressions
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark seeding throughput per stage and scale factor")
+    parser.add_argument(
+        "--scale-factors",
+        type=lambda value: [float(factor) for factor in value.split(',')],
+        default=list(DEFAULT_SCALE_FACTORS),
+        help="Comma-separated multiples of the default row counts (default: 1,10)"
+    )
+    parser.add_argument(
+        "--load-mode",
+        choices=[LoadMode.INSERT, LoadMode.COPY_TEXT, LoadMode.COPY_BINARY],
+        default=LoadMode.INSERT,
+        help="How generated rows are written"
+    )
+    parser.add_argument("--output", default="benchmark-results.json", help="Where to write the results JSON")
+    parser.add_argument("--baseline", help="Results JSON to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Relative change counted as a regression (default: 0.1 for 10%%)"
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Also write the results to the --baseline file"
+    )
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = run_benchmark(args.scale_factors, args.load_mode)
+    with open(args.output, 'w') as results_file:
+        json.dump(results, results_file, indent=2)
+    print(f"Wrote results to {args.output}")
+
+    regressions = []
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare_results(results, baseline, args.threshold)
+        for entry, metric, before, after, change in regressions:
+            print(
+                f"Regression: {entry['stage']} at scale factor {entry['scale_factor']}: "
+                f"{metric} {before} -> {after} ({change:+.0%})"
+            )
+        if not regressions:
+            print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    if args.baseline and args.update_baseline:
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+        print(f"Updated baseline {args.baseline}")
+    sys.exit(1 if regressions else 0)
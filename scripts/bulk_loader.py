@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+
+import io
+import os
+import gzip
+import json
+import zlib
+import struct
+from datetime import datetime
+
+from psycopg2.extras import execute_values
+
+# Load modes for writing generated rows
+class LoadMode:
+    INSERT = 'insert'            # One INSERT statement per row
+    COPY_TEXT = 'copy-text'      # COPY ... FROM STDIN in text format
+    COPY_BINARY = 'copy-binary'  # COPY ... FROM STDIN in binary format
+
+# File formats for offline datasets (both gzip-compressed)
+class FileFormat:
+    CSV = 'csv'        # COPY csv format
+    BINARY = 'binary'  # COPY binary format
+
+# Postgres column types for every column the generators write (must match schema.ts)
+COLUMN_TYPES = {
+    'specialties': {
+        'id': 'int4', 'name': 'text', 'icon': 'text', 'category': 'text',
+    },
+    'users': {
+        'id': 'int4', 'username': 'text', 'password': 'text', 'name': 'text',
+        'email': 'text', 'phone': 'text', 'user_type': 'text', 'is_advisor': 'bool',
+        'bio': 'text', 'specialties': 'jsonb', 'profile_completed': 'bool',
+        'chat_rate': 'int4', 'audio_rate': 'int4', 'video_rate': 'int4',
+        'rating': 'int4', 'review_count': 'int4', 'online': 'bool',
+        'account_balance': 'int4', 'earnings_balance': 'int4', 'total_earnings': 'int4',
+    },
+    'advisor_specialties': {
+        'id': 'int4', 'advisor_id': 'int4', 'specialty_id': 'int4',
+    },
+    'sessions': {
+        'id': 'int4', 'user_id': 'int4', 'advisor_id': 'int4',
+        'start_time': 'timestamp', 'end_time': 'timestamp', 'session_type': 'text',
+        'status': 'text', 'notes': 'text', 'rate_per_minute': 'int4',
+        'actual_start_time': 'timestamp', 'actual_end_time': 'timestamp',
+        'actual_duration': 'int4', 'billed_amount': 'int4', 'is_paid': 'bool',
+    },
+    'messages': {
+        'id': 'int4', 'sender_id': 'int4', 'receiver_id': 'int4', 'content': 'text',
+        'timestamp': 'timestamp', 'read': 'bool',
+    },
+    'reviews': {
+        'id': 'int4', 'user_id': 'int4', 'advisor_id': 'int4', 'session_id': 'int4',
+        'rating': 'int4', 'content': 'text', 'created_at': 'timestamp',
+        'response': 'text', 'response_date': 'timestamp', 'is_hidden': 'bool',
+    },
+    'conversations': {
+        'id': 'int4', 'user_id': 'int4', 'messages': 'jsonb', 'last_updated': 'timestamp',
+    },
+    'transactions': {
+        'id': 'int4', 'type': 'text', 'user_id': 'int4', 'advisor_id': 'int4',
+        'session_id': 'int4', 'amount': 'int4', 'description': 'text',
+        'timestamp': 'timestamp', 'payment_status': 'text', 'payment_reference': 'text',
+    },
+}
+
+# Rows per COPY statement; COPY only pays off when each round-trip carries many rows
+COPY_BATCH_ROWS = 5000
+
+# Tables whose generated rows may already exist (users and specialties have unique
+# names), mapped to the condition a row must meet to be kept. Rows for these tables are
+# inserted one batch at a time with ON CONFLICT DO NOTHING, so re-runs skip the rows
+# they already wrote, and advisor specialties are kept only for advisors that were
+# inserted (a skipped advisor's reserved id never reaches the users table).
+CONFLICT_TABLES = {
+    'specialties': None,
+    'users': None,
+    'advisor_specialties': "EXISTS (SELECT 1 FROM users u WHERE u.id = v.advisor_id)",
+}
+
+# INSERT ... SELECT of the new rows of a conflict table from source (aliased as v)
+def conflict_insert_sql(table, columns, source):
+    column_list = ', '.join(columns)
+    condition = CONFLICT_TABLES[table]
+    return "INSERT INTO {} ({}) SELECT {} FROM {}{} ON CONFLICT DO NOTHING".format(
+        table, column_list, ', '.join(f"v.{column}" for column in columns), source,
+        f" WHERE {condition}" if condition else ''
+    )
+
+# Text format encoding (values are escaped, NULL is \N)
+def _escape_text(value):
+    return (
+        value.replace('\\', '\\\\')
+        .replace('\t', '\\t')
+        .replace('\n', '\\n')
+        .replace('\r', '\\r')
+    )
+
+TEXT_ENCODERS = {
+    'int4': str,
+    'text': _escape_text,
+    'jsonb': _escape_text,  # Generators pass JSON already serialized with json.dumps
+    'bool': lambda value: 't' if value else 'f',
+    'timestamp': lambda value: value.isoformat(),
+}
+
+# CSV format encoding (strings are always quoted so that only an unquoted empty field is NULL)
+def _quote_csv(value):
+    return '"' + value.replace('"', '""') + '"'
+
+CSV_ENCODERS = {
+    'int4': str,
+    'text': _quote_csv,
+    'jsonb': _quote_csv,
+    'bool': lambda value: 't' if value else 'f',
+    'timestamp': lambda value: value.isoformat(),
+}
+
+# Binary format encoding (each field is a length-prefixed big-endian value)
+PG_EPOCH = datetime(2000, 1, 1)
+BINARY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('!ii', 0, 0)
+BINARY_TRAILER = struct.pack('!h', -1)
+BINARY_NULL = struct.pack('!i', -1)
+
+_FIELD_COUNT = struct.Struct('!h')
+_LENGTH = struct.Struct('!i')
+_INT4_FIELD = struct.Struct('!ii')
+_INT8_FIELD = struct.Struct('!iq')
+_MICROSECOND = datetime.resolution
+
+def _binary_text(value):
+    data = value.encode('utf-8')
+    return _LENGTH.pack(len(data)) + data
+
+def _binary_jsonb(value):
+    data = b'\x01' + value.encode('utf-8')  # jsonb binary format version 1
+    return _LENGTH.pack(len(data)) + data
+
+def _binary_timestamp(value):
+    micros = (value - PG_EPOCH) // _MICROSECOND
+    return _INT8_FIELD.pack(8, micros)
+
+BINARY_ENCODERS = {
+    'int4': lambda value: _INT4_FIELD.pack(4, value),
+    'text': _binary_text,
+    'jsonb': _binary_jsonb,
+    'bool': lambda value: b'\x00\x00\x00\x01\x01' if value else b'\x00\x00\x00\x01\x00',
+    'timestamp': _binary_timestamp,
+}
+
+def _column_encoders(encoders, table, columns):
+    types = COLUMN_TYPES[table]
+    return [encoders[types[column]] for column in columns]
+
+# Encode rows as a COPY text format payload
+def encode_text_rows(table, columns, rows):
+    encoders = _column_encoders(TEXT_ENCODERS, table, columns)
+    lines = []
+    for row in rows:
+        lines.append('\t'.join(
+            '\\N' if value is None else encode(value)
+            for encode, value in zip(encoders, row)
+        ))
+    lines.append('')
+    return '\n'.join(lines).encode('utf-8')
+
+# Encode rows as a COPY csv format payload
+def encode_csv_rows(table, columns, rows):
+    encoders = _column_encoders(CSV_ENCODERS, table, columns)
+    lines = []
+    for row in rows:
+        lines.append(','.join(
+            '' if value is None else encode(value)
+            for encode, value in zip(encoders, row)
+        ))
+    lines.append('')
+    return '\n'.join(lines).encode('utf-8')
+
+# Encode rows as COPY binary format tuples, without the file header and trailer
+def encode_binary_tuples(table, columns, rows):
+    encoders = _column_encoders(BINARY_ENCODERS, table, columns)
+    field_count = _FIELD_COUNT.pack(len(columns))
+    parts = []
+    for row in rows:
+        parts.append(field_count)
+        for encode, value in zip(encoders, row):
+            parts.append(BINARY_NULL if value is None else encode(value))
+    return b''.join(parts)
+
+# Encode rows as a COPY binary format payload (header and trailer included)
+def encode_binary_rows(table, columns, rows):
+    return BINARY_HEADER + encode_binary_tuples(table, columns, rows) + BINARY_TRAILER
+
+# Writes generated rows to the database, one INSERT per row
+class InsertSink:
+    min_batch_rows = 1
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    # Pre-assign primary keys so dependent rows can reference them without RETURNING id
+    def reserve_ids(self, table, count):
+        if count <= 0:
+            return []
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)",
+                (table, count)
+            )
+            return [row[0] for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+    # Pre-assign a contiguous block of primary keys, returned as a range
+    def reserve_id_range(self, table, count):
+        if count <= 0:
+            return range(0)
+        cursor = self.conn.cursor()
+        try:
+            # Inserts take their table lock before DEFAULT draws an id, so holding EXCLUSIVE
+            # (reads still go ahead) keeps every other writer, generator or app, out of the
+            # sequence; advancing it in one statement never moves it backwards
+            cursor.execute(f"LOCK TABLE {table} IN EXCLUSIVE MODE")
+            cursor.execute(
+                "SELECT setval(pg_get_serial_sequence(%(table)s, 'id'), "
+                "nextval(pg_get_serial_sequence(%(table)s, 'id')) + %(count)s - 1)",
+                dict(table=table, count=count)
+            )
+            first_id = cursor.fetchone()[0] - count + 1
+            self.conn.commit()
+            return range(first_id, first_id + count)
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def write(self, table, columns, rows):
+        if not rows:
+            return 0
+        return self.write_encoded(table, columns, self.encode(table, columns, rows), len(rows))
+
+    # INSERT sends the row tuples as statement parameters, so there is nothing to encode
+    def encode(self, table, columns, rows):
+        return rows
+
+    # Returns the rows inserted, which is fewer than row_count when rows of a conflict
+    # table already existed
+    def write_encoded(self, table, columns, payload, row_count):
+        if table in CONFLICT_TABLES:
+            return self.write_new(table, columns, payload)
+        statement = "INSERT INTO {} ({}) VALUES ({})".format(
+            table, ', '.join(columns), ', '.join(['%s'] * len(columns))
+        )
+        cursor = self.conn.cursor()
+        try:
+            for row in payload:
+                cursor.execute(statement, row)
+        finally:
+            cursor.close()
+        return row_count
+
+    # Insert the rows of a conflict table that are new, as one statement
+    def write_new(self, table, columns, rows):
+        types = COLUMN_TYPES[table]
+        source = "(VALUES %s) AS v ({})".format(', '.join(columns))
+        cursor = self.conn.cursor()
+        try:
+            # Casts type the VALUES columns, which the SELECT would otherwise read as text
+            execute_values(
+                cursor,
+                conflict_insert_sql(table, columns, source),
+                rows,
+                template='({})'.format(', '.join(f"%s::{types[column]}" for column in columns)),
+                page_size=len(rows)
+            )
+            return cursor.rowcount
+        finally:
+            cursor.close()
+
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+# Writes generated rows to the database with COPY ... FROM STDIN, one statement per batch
+class CopySink(InsertSink):
+    min_batch_rows = COPY_BATCH_ROWS
+
+    def __init__(self, conn, binary=False):
+        super().__init__(conn)
+        self.binary = binary
+
+    def encode(self, table, columns, rows):
+        if self.binary:
+            return encode_binary_rows(table, columns, rows)
+        return encode_text_rows(table, columns, rows)
+
+    def write_encoded(self, table, columns, payload, row_count):
+        if table in CONFLICT_TABLES:
+            return self.write_new(table, columns, payload)
+        cursor = self.conn.cursor()
+        try:
+            self._copy(cursor, table, columns, payload)
+        finally:
+            cursor.close()
+        return row_count
+
+    def _copy(self, cursor, table, columns, payload):
+        statement = "COPY {} ({}) FROM STDIN WITH (FORMAT {})".format(
+            table, ', '.join(columns), 'binary' if self.binary else 'text'
+        )
+        cursor.copy_expert(statement, io.BytesIO(payload))
+
+    # COPY the payload of a conflict table into a temporary staging table, then insert
+    # the rows that are new from there
+    def write_new(self, table, columns, payload):
+        staging = f"{table}_staging_{zlib.crc32(','.join(columns).encode('utf-8')):08x}"
+        cursor = self.conn.cursor()
+        try:
+            # Created on first use in the session (and again after a rollback undid it)
+            cursor.execute(
+                f"CREATE TEMP TABLE IF NOT EXISTS {staging} AS SELECT {', '.join(columns)} FROM {table} WITH NO DATA"
+            )
+            self._copy(cursor, staging, columns, payload)
+            cursor.execute(conflict_insert_sql(table, columns, f"{staging} AS v"))
+            inserted = cursor.rowcount
+            cursor.execute(f"TRUNCATE {staging}")
+            return inserted
+        finally:
+            cursor.close()
+
+# Writes generated rows to compressed COPY files instead of a database
+#
+# Every distinct (table, columns) combination gets its own file, and every row must
+# carry a pre-assigned id: reserve_ids() and reserve_id_range() hand out keys from local
+# counters, so foreign keys line up without a database round-trip. close() writes
+# manifest.json with the files in load order, their row counts and id ranges.
+class FileSink:
+    min_batch_rows = COPY_BATCH_ROWS
+
+    def __init__(self, output_dir, file_format=FileFormat.CSV, compresslevel=3):
+        self.output_dir = output_dir
+        self.file_format = file_format
+        self.compresslevel = compresslevel
+        self.next_ids = {}
+        self.files = {}
+        self.entries = []
+        os.makedirs(output_dir, exist_ok=True)
+
+    def reserve_ids(self, table, count):
+        return list(self.reserve_id_range(table, count))
+
+    def reserve_id_range(self, table, count):
+        first_id = self.next_ids.get(table, 1)
+        self.next_ids[table] = first_id + max(count, 0)
+        return range(first_id, first_id + max(count, 0))
+
+    def write(self, table, columns, rows):
+        if not rows:
+            return 0
+        return self.write_encoded(table, columns, self.encode(table, columns, rows), len(rows))
+
+    # Encoding also records the id range of the rows, which the payload no longer shows
+    def encode(self, table, columns, rows):
+        entry = self._file(table, columns)[1]
+        if 'id' in columns:
+            position = columns.index('id')
+            low = min(row[position] for row in rows)
+            high = max(row[position] for row in rows)
+            if entry['min_id'] is None or low < entry['min_id']:
+                entry['min_id'] = low
+            if entry['max_id'] is None or high > entry['max_id']:
+                entry['max_id'] = high
+        if self.file_format == FileFormat.BINARY:
+            return encode_binary_tuples(table, columns, rows)
+        return encode_csv_rows(table, columns, rows)
+
+    def write_encoded(self, table, columns, payload, row_count):
+        handle, entry = self._file(table, columns)
+        handle.write(payload)
+        entry['rows'] += row_count
+        return row_count
+
+    # Open the file for a (table, columns) combination on first use
+    def _file(self, table, columns):
+        key = (table, tuple(columns))
+        if key not in self.files:
+            extension = 'copy.gz' if self.file_format == FileFormat.BINARY else 'csv.gz'
+            name = f"{len(self.entries):02d}-{table}.{extension}"
+            handle = gzip.open(os.path.join(self.output_dir, name), 'wb', compresslevel=self.compresslevel)
+            if self.file_format == FileFormat.BINARY:
+                handle.write(BINARY_HEADER)
+            entry = {
+                'file': name,
+                'table': table,
+                'columns': list(columns),
+                'format': self.file_format,
+                'rows': 0,
+                'min_id': None,
+                'max_id': None,
+            }
+            self.files[key] = (handle, entry)
+            self.entries.append(entry)
+        return self.files[key]
+
+    def commit(self):
+        for handle, _ in self.files.values():
+            handle.flush()
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        for handle, _ in self.files.values():
+            if self.file_format == FileFormat.BINARY:
+                handle.write(BINARY_TRAILER)
+            handle.close()
+        manifest = {
+            'format': self.file_format,
+            'created_at': datetime.now().isoformat(),
+            'files': self.entries,
+            'next_ids': self.next_ids,
+        }
+        with open(os.path.join(self.output_dir, 'manifest.json'), 'w') as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+        return manifest
+
+# Create the sink for a load mode
+def make_sink(conn, load_mode=LoadMode.INSERT):
+    if load_mode == LoadMode.INSERT:
+        return InsertSink(conn)
+    if load_mode == LoadMode.COPY_TEXT:
+        return CopySink(conn)
+    if load_mode == LoadMode.COPY_BINARY:
+        return CopySink(conn, binary=True)
+    raise ValueError(f"Unknown load mode: {load_mode}")
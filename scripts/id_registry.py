@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+# Process-wide registry of parent key sets, in compact arrays
+#
+# Sessions, messages and topups all pick random users and advisors. Instead of each
+# generator running its own SELECT and holding the result as a list of boxed ints
+# (~36 bytes per id with the list slot), the registry loads each key set once per
+# process into array('q') columns (8 bytes per value) and hands the same pool to every
+# later stage. A stage that inserts into a key set invalidates it, so the next reader
+# loads it again.
+#
+# A pool is a sequence, so random.choice(), random.sample() and sample_parents() work on
+# it directly; pools with extra columns (advisor rates) return a tuple per row. sample()
+# draws in bulk, uniformly or weighted, and as_numpy() hands the pool to NumPy (without
+# copying for pools of keys alone).
+
+import random
+import threading
+from array import array
+from collections.abc import Sequence
+
+# Rows fetched per round-trip while loading a pool
+LOAD_ITERSIZE = 10000
+
+# Keys (with optional extra integer columns per key), stored column-wise
+class IdPool(Sequence):
+    def __init__(self, ids=(), columns=()):
+        self.ids = array('q', ids)
+        self.columns = tuple(array('q', column) for column in columns)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if not self.columns:
+            return self.ids[index]
+        return (self.ids[index],) + tuple(column[index] for column in self.columns)
+
+    def __iter__(self):
+        if not self.columns:
+            return iter(self.ids)
+        return zip(self.ids, *self.columns)
+
+    def append(self, row):
+        if self.columns:
+            self.ids.append(row[0])
+            for column, value in zip(self.columns, row[1:]):
+                column.append(value)
+        else:
+            self.ids.append(row[0] if isinstance(row, tuple) else row)
+
+    # count rows drawn with replacement, uniformly or in proportion to weights
+    def sample(self, count, rng=random, weights=None):
+        return rng.choices(self, weights=weights, k=count)
+
+    # The pool as an (n,) int64 array, or (n, 1 + columns) when it has extra columns
+    def as_numpy(self):
+        import numpy as np
+        ids = np.frombuffer(self.ids, dtype=np.int64) if len(self.ids) else np.zeros(0, dtype=np.int64)
+        if not self.columns:
+            return ids
+        return np.column_stack([ids] + [np.frombuffer(column, dtype=np.int64) for column in self.columns])
+
+    # count rows drawn with a NumPy Generator, uniformly or in proportion to weights
+    def sample_array(self, count, generator, weights=None):
+        import numpy as np
+        if weights is not None:
+            weights = np.asarray(weights, dtype=np.float64)
+            weights = weights / weights.sum()
+        return self.as_numpy()[generator.choice(len(self), size=count, p=weights)]
+
+# Pools loaded on first use from {kind: (query, params)}; the query selects the key
+# first, then any extra integer columns
+class IdRegistry:
+    def __init__(self, queries):
+        self.queries = queries
+        self.pools = {}
+        self.lock = threading.Lock()
+
+    def pool(self, conn, kind):
+        with self.lock:
+            if kind not in self.pools:
+                self.pools[kind] = self._load(conn, kind)
+            return self.pools[kind]
+
+    def _load(self, conn, kind):
+        query, params = self.queries[kind]
+        # Streamed through a server-side cursor, so the rows never exist as one list
+        cursor = conn.cursor(f"id_registry_{kind}")
+        cursor.itersize = LOAD_ITERSIZE
+        try:
+            cursor.execute(query, params)
+            pool = None
+            for row in cursor:
+                if pool is None:
+                    pool = IdPool(columns=[()] * (len(row) - 1))
+                pool.append(row)
+            return pool or IdPool()
+        finally:
+            cursor.close()
+
+    # Forget key sets after rows were inserted into them
+    def invalidate(self, *kinds):
+        with self.lock:
+            for kind in kinds:
+                self.pools.pop(kind, None)
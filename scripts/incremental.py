@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+
+# Incremental "append recent activity" mode
+#
+# Instead of re-running the full generators, append_activity() adds the activity of a
+# recent time window: sessions (with their payments), messages, topups, and reviews of
+# the sessions it just added. Each table's window starts at the later of now - hours and
+# the table's high-water mark (the newest timestamp among its most recent rows), so
+# repeated runs continue where the last one stopped instead of piling rows onto the same
+# hours. The high-water marks are read from the last HIGH_WATER_ROWS rows by id, and
+# reviews only look at the sessions added by this run, so the cost follows the size of
+# the window, not the size of the tables.
+#
+# Rows per hour come from the counts of a full run spread over the span their dates
+# cover there: sessions over the last 30 days, messages over the last week, topups
+# (1-3 per topped-up user) over the last 60 days.
+
+import random
+from datetime import datetime, timedelta
+
+import python_data_generator as generator
+from bulk_loader import make_sink
+from instrumentation import instrument_sink, stage
+from pipeline import run_pipeline, sample_parents
+from python_data_generator import (
+    MESSAGE_COLUMNS,
+    PAYMENT_COLUMNS,
+    REVIEW_COLUMNS,
+    SESSION_COLUMNS,
+    TOPUP_COLUMNS,
+    TransactionType,
+)
+
+# Most recent rows (by id) a high-water mark is read from
+HIGH_WATER_ROWS = 10000
+
+# Hours the dates of each activity span in a full run
+ACTIVITY_SPAN_HOURS = {
+    'sessions': 30 * 24,
+    'messages': 7 * 24,
+    'topups': 60 * 24,
+}
+
+# Timestamp column of each activity, with the condition that picks its rows
+ACTIVITY_COLUMNS = {
+    'sessions': ('sessions', 'start_time', None),
+    'messages': ('messages', 'timestamp', None),
+    'topups': ('transactions', 'timestamp', TransactionType.USER_TOPUP),
+}
+
+# Rows of each activity per hour for a set of counts
+def hourly_rates(counts):
+    topups = counts['topups'] * sum(generator.TOPUPS_PER_USER) / 2
+    return {
+        'sessions': counts['sessions'] / ACTIVITY_SPAN_HOURS['sessions'],
+        'messages': counts['messages'] / ACTIVITY_SPAN_HOURS['messages'],
+        'topups': topups / ACTIVITY_SPAN_HOURS['topups'],
+    }
+
+# Newest timestamp among the most recent rows of an activity, or None for an empty table
+def high_water_mark(cursor, activity):
+    table, column, transaction_type = ACTIVITY_COLUMNS[activity]
+    condition = "WHERE type = %s" if transaction_type else ""
+    cursor.execute(
+        f"""
+        SELECT MAX({column}) FROM (
+            SELECT {column} FROM {table} {condition} ORDER BY id DESC LIMIT %s
+        ) AS recent
+        """,
+        ((transaction_type,) if transaction_type else ()) + (HIGH_WATER_ROWS,)
+    )
+    return cursor.fetchone()[0]
+
+# Start of an activity's window: now - hours, or its high-water mark when that is later
+def window_start(cursor, activity, hours, now):
+    start = now - timedelta(hours=hours)
+    mark = high_water_mark(cursor, activity)
+    if mark is not None and mark > start:
+        start = min(mark, now)
+    return start
+
+def random_time(start, end):
+    return start + (end - start) * random.random()
+
+def window_rows(rate, start, end):
+    return round(rate * (end - start).total_seconds() / 3600)
+
+# Session fields build_recent_session takes from build_session
+SESSION_FIELDS = {
+    column: SESSION_COLUMNS.index(column)
+    for column in ('start_time', 'end_time', 'session_type', 'notes', 'rate_per_minute')
+}
+
+# Build a session that started inside the window, drawn like a full run's sessions
+#
+# Type, rate, duration and notes come from build_session. The status follows from the
+# shifted times: a session that has ended gets the outcome of a full run's sessions that
+# ended (started 3-30 days ago), so the same mix of completed, canceled and paid ones;
+# one still running is in progress, not billed and not paid.
+def build_recent_session(session_id, user_id, advisor, start, now):
+    row, _ = generator.build_session(session_id, user_id, advisor, now)
+    start_time = random_time(start, now)
+    duration_minutes = int((row[SESSION_FIELDS['end_time']] - row[SESSION_FIELDS['start_time']]).total_seconds() // 60)
+    if start_time + timedelta(minutes=duration_minutes) <= now:
+        status, is_paid = generator.session_outcome(random.randint(3, 30))
+    else:
+        status, is_paid = "in_progress", False
+    return generator.session_rows(
+        session_id, user_id, advisor[0], start_time, duration_minutes, row[SESSION_FIELDS['session_type']], status,
+        row[SESSION_FIELDS['notes']], row[SESSION_FIELDS['rate_per_minute']], is_paid
+    )
+
+def append_sessions(conn, cursor, sink, rate, hours, now):
+    start = window_start(cursor, 'sessions', hours, now)
+    count = window_rows(rate, start, now)
+    print(f"Appending {count} sessions from {start.isoformat()}...")
+    user_ids = generator.id_registry.pool(conn, 'users')
+    advisors = generator.id_registry.pool(conn, 'advisor_rates')
+    if not count or not len(user_ids) or not len(advisors):
+        return None
+
+    first_ids = []
+
+    def build(chunk):
+        session_ids = sink.reserve_ids('sessions', len(chunk))
+        first_ids.append(session_ids[0])
+        session_rows = []
+        transaction_rows = []
+        for session_id, (user_id, advisor) in zip(session_ids, chunk):
+            session_row, transaction_row = build_recent_session(session_id, user_id, advisor, start, now)
+            session_rows.append(session_row)
+            if transaction_row:
+                transaction_rows.append(transaction_row)
+        return [
+            ('sessions', SESSION_COLUMNS, session_rows),
+            ('transactions', PAYMENT_COLUMNS, transaction_rows),
+        ]
+
+    parents = sample_parents((user_ids, advisors), count)
+    written = run_pipeline(parents, build, sink, generator.commit_batch_size(sink, 'sessions'))
+    print(f"Appended {written.get('sessions', 0)} sessions with {written.get('transactions', 0)} payments.")
+    # Reviews only look at sessions from here on
+    return min(first_ids) if first_ids else None
+
+def append_messages(conn, cursor, sink, rate, hours, now):
+    start = window_start(cursor, 'messages', hours, now)
+    count = window_rows(rate, start, now)
+    print(f"Appending {count} messages from {start.isoformat()}...")
+    user_ids = generator.id_registry.pool(conn, 'users').ids
+    advisor_ids = generator.id_registry.pool(conn, 'advisors').ids
+    if not count or not user_ids or not advisor_ids:
+        return
+
+    def build(chunk):
+        rows = []
+        for sender_id, receiver_id, i in chunk:
+            message_time = random_time(start, now)
+            rows.append((
+                sender_id,
+                receiver_id,
+                generator.text_source.text(100 if i % 2 == 0 else 150),
+                message_time,
+                message_time < now - timedelta(days=1) or random.random() > 0.5
+            ))
+        return [('messages', MESSAGE_COLUMNS, rows)]
+
+    threads = generator.message_threads(user_ids, advisor_ids, count)
+    written = run_pipeline(threads, build, sink, generator.commit_batch_size(sink, 'messages'))
+    print(f"Appended {written.get('messages', 0)} messages.")
+
+def append_topups(conn, cursor, sink, rate, hours, now):
+    start = window_start(cursor, 'topups', hours, now)
+    count = window_rows(rate, start, now)
+    print(f"Appending {count} topups from {start.isoformat()}...")
+    users = generator.id_registry.pool(conn, 'users')
+    if not count or not len(users):
+        return
+
+    def build(chunk):
+        rows = []
+        for user_id in chunk:
+            row = generator.build_topup(user_id, now)
+            rows.append(row[:4] + (random_time(start, now),) + row[5:])
+        return [('transactions', TOPUP_COLUMNS, rows)]
+
+    # Add each batch's topups to the account balances before it commits
+    def update_balances(writes):
+        totals = {}
+        for _, _, rows, _ in writes:
+            for row in rows:
+                totals[row[1]] = totals.get(row[1], 0) + row[2]
+        generator.add_to_balances(cursor, totals)
+
+    topup_users = users.sample(count)
+    written = run_pipeline(topup_users, build, sink, generator.commit_batch_size(sink, 'topups'), update_balances)
+    print(f"Appended {written.get('transactions', 0)} topups.")
+
+def append_reviews(conn, sink, first_session_id, now, rating_summary=False):
+    print("Appending reviews for the new completed sessions...")
+    deltas = {}
+    created = REVIEW_COLUMNS.index('created_at')
+
+    def build(chunk):
+        rows = []
+        for session in chunk:
+            # 70% chance of having a review, written between the session's end and now
+            if random.random() > 0.3:
+                session_id, user_id, advisor_id, end_time = session
+                row = list(generator.build_review(session_id, user_id, advisor_id, now))
+                row[created] = random_time(end_time, now)
+                if row[created + 1] is not None:
+                    row[created + 2] = random_time(row[created], now)
+                rows.append(tuple(row))
+        return [('reviews', REVIEW_COLUMNS, rows)]
+
+    def collect_deltas(writes):
+        for _, _, rows, _ in writes:
+            generator.add_rating_deltas(deltas, rows)
+
+    sessions = generator.stream_rows(
+        conn,
+        'new_completed_sessions',
+        """
+        SELECT s.id, s.user_id, s.advisor_id, s.end_time
+        FROM sessions s
+        WHERE s.id >= %s AND s.status = %s
+        AND NOT EXISTS (SELECT 1 FROM reviews r WHERE r.session_id = s.id)
+        ORDER BY s.id
+        """,
+        (first_session_id, "completed")
+    )
+    written = run_pipeline(sessions, build, sink, generator.commit_batch_size(sink, 'reviews'), collect_deltas)
+    if written.get('reviews'):
+        # Only the reviewed advisors are updated
+        generator.update_advisor_ratings(conn, deltas, rating_summary)
+    print(f"Appended {written.get('reviews', 0)} reviews.")
+
+# Append the activity of the last hours (counts set the rates, see hourly_rates)
+def append_activity(conn, hours, counts=None, sink=None, now=None, rating_summary=False):
+    now = now or datetime.now()
+    rates = hourly_rates(counts or generator.DEFAULT_COUNTS)
+    sink = instrument_sink(sink or make_sink(conn))
+    cursor = conn.cursor()
+    try:
+        with stage('sessions'):
+            first_session_id = append_sessions(conn, cursor, sink, rates['sessions'], hours, now)
+        with stage('messages'):
+            append_messages(conn, cursor, sink, rates['messages'], hours, now)
+        with stage('reviews'):
+            if first_session_id is not None:
+                append_reviews(conn, sink, first_session_id, now, rating_summary)
+        with stage('topups'):
+            append_topups(conn, cursor, sink, rates['topups'], hours, now)
+    except Exception:
+        sink.rollback()
+        raise
+    finally:
+        cursor.close()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+
+# Defer secondary indexes and foreign keys during bulk loads
+#
+# Inside deferred_schema() the target tables carry no secondary indexes and no foreign
+# keys, so rows are written without index maintenance or per-row FK checks. Afterwards
+# the indexes are rebuilt on several connections at once (each with maintenance_work_mem
+# raised), the foreign keys are added back NOT VALID and validated with one scan per
+# constraint, and the tables are analyzed.
+#
+# The definitions (pg_get_indexdef / pg_get_constraintdef) are recorded in the
+# deferred_schema table in the same transaction that drops them, and a definition is only
+# deleted in the transaction that restores it, so the schema always comes back exactly:
+# on success, on an exception (the context manager restores before re-raising), and after
+# a crash (the next deferred run, or running this module, restores what is recorded).
+#
+# Primary keys, indexes backing constraints and unique indexes stay: ON CONFLICT DO
+# NOTHING needs them to skip existing users and specialties.
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from python_data_generator import get_db_connection
+
+# Schema-qualified: a staging load (staging_swap.py) puts its own schema first on the
+# search_path, and the record must outlive that schema
+DEFERRED_TABLE = 'public.deferred_schema'
+
+# Tables the generators write in bulk
+DEFAULT_TABLES = (
+    'users', 'advisor_specialties', 'sessions', 'transactions', 'messages', 'reviews', 'conversations'
+)
+
+DEFAULT_MAINTENANCE_WORK_MEM = '1GB'
+
+# Indexes built, and constraints validated, at the same time
+DEFAULT_REBUILD_JOBS = 4
+
+# Kinds of deferred objects
+class DeferredKind:
+    INDEX = 'index'
+    FOREIGN_KEY = 'foreign_key'
+
+CREATE_DEFERRED_SQL = f"""
+    CREATE TABLE IF NOT EXISTS {DEFERRED_TABLE} (
+        table_name TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        name TEXT NOT NULL,
+        definition TEXT NOT NULL,
+        validated BOOLEAN NOT NULL DEFAULT TRUE,
+        PRIMARY KEY (table_name, kind, name)
+    )
+"""
+
+# Plain secondary indexes: not the primary key, not unique, not backing a constraint
+SECONDARY_INDEXES_SQL = """
+    SELECT c.oid::regclass::text, x.indexrelid::regclass::text, pg_get_indexdef(x.indexrelid)
+    FROM pg_index x
+    JOIN pg_class c ON c.oid = x.indrelid
+    WHERE c.relname = ANY(%s) AND pg_table_is_visible(c.oid)
+    AND NOT x.indisprimary AND NOT x.indisunique
+    AND NOT EXISTS (
+        SELECT 1 FROM pg_constraint k WHERE k.conrelid = x.indrelid AND k.conindid = x.indexrelid
+    )
+    ORDER BY 1, 2
+"""
+
+FOREIGN_KEYS_SQL = """
+    SELECT c.oid::regclass::text, quote_ident(k.conname), pg_get_constraintdef(k.oid), k.convalidated
+    FROM pg_constraint k
+    JOIN pg_class c ON c.oid = k.conrelid
+    WHERE k.contype = 'f' AND c.relname = ANY(%s) AND pg_table_is_visible(c.oid)
+    ORDER BY 1, 2
+"""
+
+def _ensure_table(conn):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(CREATE_DEFERRED_SQL)
+        conn.commit()
+    finally:
+        cursor.close()
+
+# Recorded definitions of a kind, as (table, name, definition, validated) rows
+def pending(conn, kind):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            f"SELECT table_name, name, definition, validated FROM {DEFERRED_TABLE} WHERE kind = %s ORDER BY 1, 2",
+            (kind,)
+        )
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+# Record and drop the secondary indexes and foreign keys of tables, in one transaction
+def drop_deferred(conn, tables=DEFAULT_TABLES):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(FOREIGN_KEYS_SQL, (list(tables),))
+        foreign_keys = cursor.fetchall()
+        cursor.execute(SECONDARY_INDEXES_SQL, (list(tables),))
+        indexes = cursor.fetchall()
+        for table, name, definition, validated in foreign_keys:
+            cursor.execute(
+                f"INSERT INTO {DEFERRED_TABLE} (table_name, kind, name, definition, validated) VALUES (%s, %s, %s, %s, %s)",
+                (table, DeferredKind.FOREIGN_KEY, name, definition, validated)
+            )
+            cursor.execute(f"ALTER TABLE {table} DROP CONSTRAINT {name}")
+        for table, name, definition in indexes:
+            cursor.execute(
+                f"INSERT INTO {DEFERRED_TABLE} (table_name, kind, name, definition) VALUES (%s, %s, %s, %s)",
+                (table, DeferredKind.INDEX, name, definition)
+            )
+            cursor.execute(f"DROP INDEX {name}")
+        conn.commit()
+        print(f"Deferred {len(indexes)} index(es) and {len(foreign_keys)} foreign key(s) until the load is done.")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+# Create one recorded index on its own connection, deleting its record in the same transaction
+def _rebuild_index(row, maintenance_work_mem):
+    table, name, definition, _ = row
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SET maintenance_work_mem = %s", (maintenance_work_mem,))
+        cursor.execute(definition)
+        cursor.execute(
+            f"DELETE FROM {DEFERRED_TABLE} WHERE table_name = %s AND kind = %s AND name = %s",
+            (table, DeferredKind.INDEX, name)
+        )
+        conn.commit()
+        print(f"Rebuilt index {name} on {table}.")
+    finally:
+        cursor.close()
+        conn.close()
+
+# Add a recorded foreign key back NOT VALID, unless an earlier restore already did
+def _add_foreign_key(conn, row):
+    table, name, definition, _ = row
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT 1 FROM pg_constraint WHERE conrelid = %s::regclass AND quote_ident(conname) = %s",
+            (table, name)
+        )
+        if cursor.fetchone() is None:
+            # Definitions of constraints that were never validated already end in NOT VALID
+            if not definition.endswith(' NOT VALID'):
+                definition += ' NOT VALID'
+            cursor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}")
+        conn.commit()
+    finally:
+        cursor.close()
+
+# Validate a foreign key on its own connection (one scan of the table), then forget its record
+def _validate_foreign_key(row, maintenance_work_mem):
+    table, name, _, validated = row
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SET maintenance_work_mem = %s", (maintenance_work_mem,))
+        # A constraint that was NOT VALID before the load stays that way
+        if validated:
+            cursor.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {name}")
+        cursor.execute(
+            f"DELETE FROM {DEFERRED_TABLE} WHERE table_name = %s AND kind = %s AND name = %s",
+            (table, DeferredKind.FOREIGN_KEY, name)
+        )
+        conn.commit()
+        print(f"Restored foreign key {name} on {table}.")
+    finally:
+        cursor.close()
+        conn.close()
+
+# Rebuild every recorded index and foreign key, then analyze their tables
+#
+# Failures are reported after everything else was attempted; whatever failed stays
+# recorded, so the restore can simply run again once the cause is fixed.
+def restore_deferred(conn, maintenance_work_mem=DEFAULT_MAINTENANCE_WORK_MEM, jobs=DEFAULT_REBUILD_JOBS):
+    _ensure_table(conn)
+    indexes = pending(conn, DeferredKind.INDEX)
+    foreign_keys = pending(conn, DeferredKind.FOREIGN_KEY)
+    if not indexes and not foreign_keys:
+        return
+    print(f"Restoring {len(indexes)} index(es) and {len(foreign_keys)} foreign key(s) with {jobs} job(s)...")
+
+    errors = []
+
+    def attempt(task, row):
+        try:
+            task(row, maintenance_work_mem)
+        except Exception as e:
+            errors.append(f"{row[1]} on {row[0]}: {e}")
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        list(executor.map(lambda row: attempt(_rebuild_index, row), indexes))
+
+    # Added NOT VALID in one short transaction, so the scans below run without blocking writes
+    added = []
+    for row in foreign_keys:
+        try:
+            _add_foreign_key(conn, row)
+            added.append(row)
+        except Exception as e:
+            conn.rollback()
+            errors.append(f"{row[1]} on {row[0]}: {e}")
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        list(executor.map(lambda row: attempt(_validate_foreign_key, row), added))
+
+    cursor = conn.cursor()
+    try:
+        for table in sorted({row[0] for row in indexes + foreign_keys}):
+            cursor.execute(f"ANALYZE {table}")
+        conn.commit()
+    finally:
+        cursor.close()
+
+    if errors:
+        raise RuntimeError(
+            f"Could not restore {len(errors)} deferred object(s), still recorded in {DEFERRED_TABLE} "
+            f"(run index_deferral.py to retry): " + "; ".join(errors)
+        )
+    print("Schema restored.")
+
+# Run the body with the tables' secondary indexes and foreign keys dropped, restoring them
+# afterwards whether or not the body succeeds
+@contextmanager
+def deferred_schema(conn, tables=DEFAULT_TABLES, maintenance_work_mem=DEFAULT_MAINTENANCE_WORK_MEM,
+                    jobs=DEFAULT_REBUILD_JOBS):
+    # An earlier run that crashed left its definitions recorded
+    restore_deferred(conn, maintenance_work_mem, jobs)
+    drop_deferred(conn, tables)
+    try:
+        yield
+    finally:
+        conn.rollback()
+        restore_deferred(conn, maintenance_work_mem, jobs)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=f"Restore the indexes and foreign keys recorded in {DEFERRED_TABLE} by an interrupted load"
+    )
+    parser.add_argument(
+        "--maintenance-work-mem",
+        default=DEFAULT_MAINTENANCE_WORK_MEM,
+        help=f"maintenance_work_mem for the rebuilds (default: {DEFAULT_MAINTENANCE_WORK_MEM})"
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=DEFAULT_REBUILD_JOBS, help="Indexes built at the same time, each on its own connection"
+    )
+    args = parser.parse_args()
+    conn = get_db_connection()
+    try:
+        restore_deferred(conn, args.maintenance_work_mem, args.jobs)
+    finally:
+        conn.close()
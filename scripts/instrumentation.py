@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+
+# Per-stage instrumentation and profiling for the generators
+#
+# Once configure() has been called, every generator run through stage() reports as JSON
+# lines (to a file, or stdout for '-'):
+#
+#   {"event": "commit", "stage": ..., "ms": ..., "rows": ..., "skipped": ...}   every sink commit
+#   {"event": "stage", "stage": ..., "seconds": ..., "rows": {table: rows},
+#    "skipped": {table: rows}, "commits": ..., "faker_seconds": ..., "encode_seconds": ...,
+#    "db_seconds": ...}
+#
+# rows counts the rows inserted and skipped the rows of conflict tables (users,
+# specialties) that already existed, for each batch and for the whole stage.
+#
+# faker_seconds is time spent in Faker and the text source, encode_seconds in the sink
+# encoding rows, and db_seconds in the sink's writes, commits and id reservations, all
+# attributed to the stage running on the calling thread, so stages that run at the same
+# time on the concurrent runner's threads keep separate figures. Stages whose rows are
+# synthesized by Postgres (--server-side) bypass the sink and only report seconds.
+#
+# With a profile mode every stage also writes one artifact to the profile directory: a
+# cProfile dump (cpu, open with pstats or snakeviz) or the top allocation sites from
+# tracemalloc (memory). Both profilers are process-wide, so profiled stages take turns.
+
+import os
+import sys
+import json
+import time
+import cProfile
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+# Profile modes
+class ProfileMode:
+    CPU = 'cpu'        # cProfile, one .prof file per stage
+    MEMORY = 'memory'  # tracemalloc, one .txt report of allocation sites per stage
+
+DEFAULT_PROFILE_DIR = 'profiles'
+
+# Allocation sites listed in a memory profile
+MEMORY_TOP_SITES = 50
+
+# Active instrumentation (None when disabled)
+_active = None
+
+# Figures of the stage running on each thread
+_current = threading.local()
+
+class Instrumentation:
+    def __init__(self, metrics=None, profile=None, profile_dir=DEFAULT_PROFILE_DIR):
+        # metrics: a path, '-' for stdout, or a stream the caller owns
+        self.owns_output = isinstance(metrics, str) and metrics not in ('', '-')
+        if metrics == '-':
+            self.output = sys.stdout
+        elif self.owns_output:
+            self.output = open(metrics, 'a')
+        else:
+            self.output = metrics or None
+        self.profile = profile
+        self.profile_dir = profile_dir
+        self.profiled = 0
+        self.lock = threading.Lock()
+        self.profile_lock = threading.Lock()
+        if profile:
+            os.makedirs(profile_dir, exist_ok=True)
+
+    def emit(self, event, **fields):
+        if not self.output:
+            return
+        line = json.dumps(dict(event=event, time=datetime.now().isoformat(), **fields))
+        with self.lock:
+            self.output.write(line + '\n')
+            self.output.flush()
+
+    def close(self):
+        if self.owns_output:
+            self.output.close()
+        self.output = None
+
+    # Next artifact path for a stage (numbered, since a run can repeat a stage)
+    def artifact_path(self, name, extension):
+        with self.lock:
+            self.profiled += 1
+            index = self.profiled
+        return os.path.join(self.profile_dir, f"{index:02d}-{name}.{extension}")
+
+# Enable instrumentation for this process, returning it
+def configure(metrics=None, profile=None, profile_dir=DEFAULT_PROFILE_DIR):
+    global _active
+    if _active:
+        _active.close()
+    _active = Instrumentation(metrics, profile, profile_dir)
+    _install_timers()
+    return _active
+
+def _add(key, seconds):
+    stats = getattr(_current, 'stats', None)
+    if stats is not None:
+        stats[key] += seconds
+
+# Wraps an object so that time spent in its method calls counts towards key
+class _Timed:
+    def __init__(self, target, key):
+        self._target = target
+        self._key = key
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        if not callable(value):
+            return value
+
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return value(*args, **kwargs)
+            finally:
+                _add(self._key, time.perf_counter() - started)
+
+        return timed
+
+# Time the generator module's Faker instance and text source
+def _install_timers():
+    import python_data_generator as generator
+    if not isinstance(generator.faker, _Timed):
+        generator.faker = _Timed(generator.faker, 'faker_seconds')
+    if not isinstance(generator.text_source, _Timed):
+        generator.text_source = _Timed(generator.text_source, 'faker_seconds')
+
+# Sink wrapper that times encoding, writes, commits and id reservations
+class InstrumentedSink:
+    def __init__(self, sink):
+        self.sink = sink
+        self.min_batch_rows = sink.min_batch_rows
+
+    def _timed(self, key, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            _add(key, time.perf_counter() - started)
+
+    def reserve_ids(self, table, count):
+        return self._timed('db_seconds', self.sink.reserve_ids, table, count)
+
+    def reserve_id_range(self, table, count):
+        return self._timed('db_seconds', self.sink.reserve_id_range, table, count)
+
+    def write(self, table, columns, rows):
+        if not rows:
+            return 0
+        return self.write_encoded(table, columns, self.encode(table, columns, rows), len(rows))
+
+    def encode(self, table, columns, rows):
+        return self._timed('encode_seconds', self.sink.encode, table, columns, rows)
+
+    def write_encoded(self, table, columns, payload, row_count):
+        written = self._timed('db_seconds', self.sink.write_encoded, table, columns, payload, row_count)
+        stats = getattr(_current, 'stats', None)
+        if stats is not None:
+            stats['rows'][table] = stats['rows'].get(table, 0) + written
+            stats['pending'] += written
+            if written < row_count:
+                stats['skipped'][table] = stats['skipped'].get(table, 0) + row_count - written
+                stats['pending_skipped'] += row_count - written
+        return written
+
+    def commit(self):
+        started = time.perf_counter()
+        self.sink.commit()
+        seconds = time.perf_counter() - started
+        stats = getattr(_current, 'stats', None)
+        if stats is not None:
+            stats['db_seconds'] += seconds
+            stats['commits'] += 1
+            _active.emit(
+                'commit', stage=stats['stage'], ms=round(seconds * 1000, 3),
+                rows=stats['pending'], skipped=stats['pending_skipped']
+            )
+            stats['pending'] = 0
+            stats['pending_skipped'] = 0
+
+    def rollback(self):
+        self.sink.rollback()
+
+    def __getattr__(self, name):
+        return getattr(self.sink, name)
+
+# Instrument a sink (unchanged when instrumentation is disabled or already applied)
+def instrument_sink(sink):
+    if _active is None or sink is None or isinstance(sink, InstrumentedSink):
+        return sink
+    return InstrumentedSink(sink)
+
+# Time and count one generation stage on the calling thread, profiling it when enabled
+@contextmanager
+def stage(name):
+    instrumentation = _active
+    if instrumentation is None:
+        yield
+        return
+
+    stats = {
+        'stage': name, 'rows': {}, 'skipped': {}, 'pending': 0, 'pending_skipped': 0, 'commits': 0,
+        'faker_seconds': 0.0, 'encode_seconds': 0.0, 'db_seconds': 0.0,
+    }
+    outer = getattr(_current, 'stats', None)
+    _current.stats = stats
+    profiler = None
+    artifact = None
+    if instrumentation.profile:
+        instrumentation.profile_lock.acquire()
+    started = time.perf_counter()
+    try:
+        if instrumentation.profile == ProfileMode.CPU:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        elif instrumentation.profile == ProfileMode.MEMORY:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            before = tracemalloc.take_snapshot()
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        try:
+            if instrumentation.profile == ProfileMode.CPU:
+                profiler.disable()
+                artifact = instrumentation.artifact_path(name, 'prof')
+                profiler.dump_stats(artifact)
+            elif instrumentation.profile == ProfileMode.MEMORY:
+                artifact = instrumentation.artifact_path(name, 'txt')
+                _write_memory_profile(artifact, name, before, tracemalloc.take_snapshot())
+        finally:
+            if instrumentation.profile:
+                instrumentation.profile_lock.release()
+            _current.stats = outer
+
+        fields = dict(
+            stage=name,
+            seconds=round(seconds, 4),
+            rows=stats['rows'],
+            skipped=stats['skipped'],
+            commits=stats['commits'],
+            faker_seconds=round(stats['faker_seconds'], 4),
+            encode_seconds=round(stats['encode_seconds'], 4),
+            db_seconds=round(stats['db_seconds'], 4),
+        )
+        if artifact:
+            fields['profile'] = artifact
+        instrumentation.emit('stage', **fields)
+
+def _write_memory_profile(path, name, before, after):
+    current, peak = tracemalloc.get_traced_memory()
+    with open(path, 'w') as report:
+        report.write(f"Stage {name}: peak traced memory {peak / 2 ** 20:.1f} MiB, {current / 2 ** 20:.1f} MiB at the end\n")
+        report.write(f"Top {MEMORY_TOP_SITES} allocation sites by growth during the stage:\n")
+        for difference in after.compare_to(before, 'lineno')[:MEMORY_TOP_SITES]:
+            report.write(f"{difference}\n")
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+
+# Crash-safe progress journal for resumable sharded generation
+#
+# A journaled run stores its settings (seed, reference time, counts), the context each
+# sharded stage prepared (reserved id ranges, parent pools, selected users) and one row
+# per completed shard in the seed_journal table. Every shard runs as one transaction that
+# also writes its journal row, so a shard is either fully in the database and journaled,
+# or not there at all. Shards are seeded from the master seed, the stage and the shard
+# index, so after a crash the same run name resumes with the shards that are missing and
+# produces the same dataset as an uninterrupted run.
+#
+# Stages that are not sharded either skip existing rows (specialties, admins) or run as
+# one journaled transaction (topups).
+#
+# States are stored as JSON, so reading a journal never runs code from the database:
+# id arrays, parent pools and timestamps are tagged objects turned back into their types.
+
+import json
+from array import array
+from datetime import datetime
+
+from id_registry import IdPool
+
+JOURNAL_TABLE = 'seed_journal'
+
+# Pseudo stage holding the run's settings, and the shard numbers of a stage's own rows
+RUN_STAGE = 'run'
+STATE_SHARD = -1     # A stage's saved state (run settings, prepared context, completion)
+FINISHED_SHARD = -2  # The run has finished
+
+CREATE_JOURNAL_SQL = f"""
+    CREATE TABLE IF NOT EXISTS {JOURNAL_TABLE} (
+        run_name TEXT NOT NULL,
+        stage TEXT NOT NULL,
+        shard INTEGER NOT NULL,
+        first_row INTEGER,
+        row_count INTEGER,
+        seed NUMERIC(20),
+        state JSONB,
+        completed_at TIMESTAMP NOT NULL DEFAULT NOW(),
+        PRIMARY KEY (run_name, stage, shard)
+    )
+"""
+
+# Journals from before states were JSON hold pickles; those states are dropped, never loaded
+MIGRATE_STATE_SQL = f"""
+    DO $$
+    BEGIN
+        IF (SELECT data_type FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = '{JOURNAL_TABLE}' AND column_name = 'state') = 'bytea'
+        THEN
+            ALTER TABLE {JOURNAL_TABLE} ALTER COLUMN state TYPE JSONB USING NULL;
+        END IF;
+    END $$
+"""
+
+def _encode_state(value):
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, IdPool):
+        return {'__pool__': [value.ids.tolist(), [column.tolist() for column in value.columns]]}
+    if isinstance(value, array):
+        return {'__array__': value.tolist()}
+    raise TypeError(f"Cannot journal a {type(value).__name__}")
+
+def _decode_state(value):
+    if '__datetime__' in value:
+        return datetime.fromisoformat(value['__datetime__'])
+    if '__pool__' in value:
+        return IdPool(*value['__pool__'])
+    if '__array__' in value:
+        return array('q', value['__array__'])
+    return value
+
+def dump_state(state):
+    return json.dumps(state, default=_encode_state)
+
+# Tuples come back as lists
+def load_state(text):
+    return json.loads(text, object_hook=_decode_state)
+
+# Record a completed shard on conn without committing (the shard's own commit does)
+def record_shard(conn, run_name, stage, index, first_row, row_count, seed):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            f"""
+            INSERT INTO {JOURNAL_TABLE} (run_name, stage, shard, first_row, row_count, seed)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            """,
+            (run_name, stage, index, first_row, row_count, seed)
+        )
+    finally:
+        cursor.close()
+
+# Sink wrapper that holds back the generators' batch commits, so that whatever runs
+# through it commits once, together with its journal row
+class HeldCommitSink:
+    def __init__(self, sink):
+        self.sink = sink
+        self.rolled_back = False
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        self.rolled_back = True
+        self.sink.rollback()
+
+    def __getattr__(self, name):
+        return getattr(self.sink, name)
+
+# The journal of one named run
+class Journal:
+    def __init__(self, conn, run_name):
+        self.conn = conn
+        self.run_name = run_name
+        cursor = conn.cursor()
+        try:
+            cursor.execute(CREATE_JOURNAL_SQL)
+            cursor.execute(MIGRATE_STATE_SQL)
+            conn.commit()
+        finally:
+            cursor.close()
+
+    # Start or resume the run: returns the stored settings when the run exists and the
+    # given ones (stored) when it is new, or None when the run has already finished
+    def start(self, settings):
+        if self.finished():
+            return None
+        stored = self.state(RUN_STAGE)
+        if stored is not None:
+            return stored
+        self.save_state(RUN_STAGE, settings)
+        return settings
+
+    def finished(self):
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(
+                f"SELECT 1 FROM {JOURNAL_TABLE} WHERE run_name = %s AND stage = %s AND shard = %s",
+                (self.run_name, RUN_STAGE, FINISHED_SHARD)
+            )
+            return cursor.fetchone() is not None
+        finally:
+            cursor.close()
+
+    def finish(self):
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(
+                f"INSERT INTO {JOURNAL_TABLE} (run_name, stage, shard) VALUES (%s, %s, %s)",
+                (self.run_name, RUN_STAGE, FINISHED_SHARD)
+            )
+            self.conn.commit()
+        finally:
+            cursor.close()
+
+    # Saved state of a stage, or None
+    def state(self, stage):
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(
+                f"SELECT state::text FROM {JOURNAL_TABLE} WHERE run_name = %s AND stage = %s AND shard = %s",
+                (self.run_name, stage, STATE_SHARD)
+            )
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            if row[0] is None:
+                raise RuntimeError(
+                    f"Run {self.run_name} was journaled by an older version; its {stage} state cannot be resumed"
+                )
+            return load_state(row[0])
+        finally:
+            cursor.close()
+
+    # Save the state of a stage (without commit it joins the caller's transaction)
+    def save_state(self, stage, state, commit=True):
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(
+                f"INSERT INTO {JOURNAL_TABLE} (run_name, stage, shard, state) VALUES (%s, %s, %s, %s)",
+                (self.run_name, stage, STATE_SHARD, dump_state(state))
+            )
+            if commit:
+                self.conn.commit()
+        finally:
+            cursor.close()
+
+    # Indexes of the shards of a stage that are already done
+    def completed_shards(self, stage):
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(
+                f"SELECT shard FROM {JOURNAL_TABLE} WHERE run_name = %s AND stage = %s AND shard >= 0",
+                (self.run_name, stage)
+            )
+            return {row[0] for row in cursor.fetchall()}
+        finally:
+            cursor.close()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+# Load a dataset written by python_data_generator.py --output-dir into the database
+#
+# Files are streamed straight from gzip into COPY ... FROM STDIN, in manifest order or
+# with several files in flight at once (--jobs). Primary keys come from the files, so
+# the loader refuses to run when the id ranges would collide with existing rows, and
+# moves every sequence past the loaded ids afterwards.
+
+import os
+import sys
+import gzip
+import json
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from index_deferral import DEFAULT_REBUILD_JOBS, deferred_schema
+from python_data_generator import get_db_connection, update_advisor_ratings, TransactionType
+
+# Bytes read from a file per COPY data message
+COPY_READ_SIZE = 1 << 20
+
+def read_manifest(dataset_dir):
+    with open(os.path.join(dataset_dir, 'manifest.json')) as manifest_file:
+        return json.load(manifest_file)
+
+# Id range per table across all files of the manifest
+def table_id_ranges(manifest):
+    ranges = {}
+    for entry in manifest['files']:
+        if entry['min_id'] is None:
+            continue
+        low, high = ranges.get(entry['table'], (entry['min_id'], entry['max_id']))
+        ranges[entry['table']] = (min(low, entry['min_id']), max(high, entry['max_id']))
+    return ranges
+
+# Return the tables whose existing rows overlap the ids in the dataset
+def find_id_collisions(conn, manifest):
+    collisions = []
+    cursor = conn.cursor()
+    try:
+        for table, (low, high) in table_id_ranges(manifest).items():
+            cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {table} WHERE id BETWEEN %s AND %s)", (low, high))
+            if cursor.fetchone()[0]:
+                collisions.append(table)
+    finally:
+        cursor.close()
+    return collisions
+
+# COPY one file on its own connection
+def load_file(dataset_dir, entry):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        statement = "COPY {} ({}) FROM STDIN WITH (FORMAT {})".format(
+            entry['table'], ', '.join(entry['columns']), entry['format']
+        )
+        with gzip.open(os.path.join(dataset_dir, entry['file']), 'rb') as data:
+            cursor.copy_expert(statement, data, size=COPY_READ_SIZE)
+        conn.commit()
+        print(f"Loaded {entry['rows']} rows into {entry['table']} from {entry['file']}.")
+        return entry['rows']
+    finally:
+        cursor.close()
+        conn.close()
+
+# Move each sequence past the highest loaded id so later inserts don't collide
+def reset_sequences(conn, tables):
+    cursor = conn.cursor()
+    try:
+        for table in tables:
+            cursor.execute(
+                f"SELECT setval(pg_get_serial_sequence(%s, 'id'), GREATEST((SELECT MAX(id) FROM {table}), 1))",
+                (table,)
+            )
+        conn.commit()
+    finally:
+        cursor.close()
+
+# Add the loaded topups to the users' account balances
+def apply_topup_balances(conn, manifest):
+    cursor = conn.cursor()
+    try:
+        for entry in manifest['files']:
+            if entry['table'] != 'transactions' or 'payment_reference' not in entry['columns'] or not entry['rows']:
+                continue
+            cursor.execute(
+                """
+                UPDATE users u
+                SET account_balance = u.account_balance + topups.total
+                FROM (
+                    SELECT user_id, SUM(amount) AS total
+                    FROM transactions
+                    WHERE type = %s AND id BETWEEN %s AND %s
+                    GROUP BY user_id
+                ) AS topups
+                WHERE u.id = topups.user_id
+                """,
+                (TransactionType.USER_TOPUP, entry['min_id'], entry['max_id'])
+            )
+        conn.commit()
+    finally:
+        cursor.close()
+
+def load_dataset(dataset_dir, jobs=1, defer_indexes=False):
+    manifest = read_manifest(dataset_dir)
+    conn = get_db_connection()
+    try:
+        collisions = find_id_collisions(conn, manifest)
+        if collisions:
+            print(f"Error: dataset ids overlap existing rows in {', '.join(collisions)}.")
+            sys.exit(1)
+
+        # Secondary indexes and foreign keys of the loaded tables are rebuilt after the COPYs
+        deferral = nullcontext()
+        if defer_indexes:
+            tables = sorted({entry['table'] for entry in manifest['files']})
+            deferral = deferred_schema(conn, tables, jobs=max(jobs, DEFAULT_REBUILD_JOBS))
+
+        with deferral:
+            print(f"Loading {len(manifest['files'])} files from {dataset_dir} with {jobs} job(s)...")
+            with ThreadPoolExecutor(max_workers=jobs) as executor:
+                loaded = sum(executor.map(lambda entry: load_file(dataset_dir, entry), manifest['files']))
+
+            reset_sequences(conn, table_id_ranges(manifest))
+            apply_topup_balances(conn, manifest)
+        update_advisor_ratings(conn)
+        print(f"Loaded {loaded} rows.")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load a generated dataset into the AngelGuides database")
+    parser.add_argument("dataset_dir", help="Directory containing manifest.json and the table files")
+    parser.add_argument("--jobs", type=int, default=1, help="Files to load concurrently, each on its own connection")
+    parser.add_argument(
+        "--defer-indexes",
+        action="store_true",
+        help="Drop secondary indexes and foreign keys of the loaded tables during the COPYs and rebuild them afterwards"
+    )
+    args = parser.parse_args()
+    load_dataset(args.dataset_dir, args.jobs, args.defer_indexes)
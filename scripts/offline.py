@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+# Offline dataset generation: write every table to compressed COPY files without a database
+#
+# All primary keys are assigned locally by the FileSink, and the parent pools that the
+# online generators look up (user ids, advisors with their rates) are kept from the
+# stages that produced them. Reviews are drawn while their completed session is
+# generated, since there is no sessions table to scan afterwards. Use load_dataset.py
+# to ingest the result.
+
+import random
+
+import python_data_generator as generator
+from bulk_loader import FileSink
+from pipeline import run_pipeline, sample_parents
+
+# Positions of the values that later stages need from generated rows
+ADVISOR_RATES = generator.ADVISOR_COLUMNS.index('chat_rate')
+SESSION_STATUS = generator.SESSION_COLUMNS.index('status')
+
+# Generate a full dataset into output_dir and return the manifest
+def generate_offline(output_dir, file_format, counts, seed, now):
+    print(f"Writing {file_format} dataset to {output_dir}...")
+
+    random.seed(seed)
+    generator.faker.seed_instance(seed)
+    sink = FileSink(output_dir, file_format)
+
+    # Specialties
+    specialty_ids = sink.reserve_id_range('specialties', len(generator.SPECIALTIES))
+    sink.write('specialties', ('id',) + generator.SPECIALTY_COLUMNS, [
+        (specialty_id, s["name"], s["icon"], s["category"])
+        for specialty_id, s in zip(specialty_ids, generator.SPECIALTIES)
+    ])
+
+    # Users
+    user_ids = sink.reserve_id_range('users', counts['users'])
+
+    def build_users(chunk):
+        rows = [(user_ids[i],) + generator.build_user(i) for i in chunk]
+        return [('users', ('id',) + generator.USER_COLUMNS, rows)]
+
+    run_pipeline(range(counts['users']), build_users, sink, generator.commit_batch_size(sink, 'users'))
+
+    # Advisors, keeping (id, chat_rate, audio_rate, video_rate) for sessions
+    advisor_ids = sink.reserve_id_range('users', counts['advisors'])
+    advisors = []
+
+    def build_advisors(chunk):
+        advisor_rows = []
+        specialty_rows = []
+        for i in chunk:
+            advisor_row, specialties = generator.build_advisor(i, advisor_ids[i])
+            advisor_rows.append(advisor_row)
+            advisors.append((advisor_ids[i],) + advisor_row[ADVISOR_RATES:ADVISOR_RATES + 3])
+            for specialty_id, row_id in zip(specialties, sink.reserve_ids('advisor_specialties', len(specialties))):
+                specialty_rows.append((row_id, advisor_ids[i], specialty_id))
+        return [
+            ('users', generator.ADVISOR_COLUMNS, advisor_rows),
+            ('advisor_specialties', ('id',) + generator.ADVISOR_SPECIALTY_COLUMNS, specialty_rows),
+        ]
+
+    run_pipeline(range(counts['advisors']), build_advisors, sink, generator.commit_batch_size(sink, 'advisors'))
+
+    # Admins
+    admin_ids = sink.reserve_id_range('users', counts['admins'])
+
+    def build_admins(chunk):
+        rows = [(admin_ids[i],) + generator.build_admin(i) for i in chunk]
+        return [('users', ('id',) + generator.ADMIN_COLUMNS, rows)]
+
+    run_pipeline(range(counts['admins']), build_admins, sink, max(counts['admins'], 1))
+
+    # Sessions with their payments, and reviews for the completed ones
+    if user_ids and advisors:
+        def build_sessions(chunk):
+            session_ids = sink.reserve_ids('sessions', len(chunk))
+            session_rows = []
+            transaction_rows = []
+            review_rows = []
+            for session_id, (user_id, advisor) in zip(session_ids, chunk):
+                session_row, transaction_row = generator.build_session(session_id, user_id, advisor, now)
+                session_rows.append(session_row)
+                if transaction_row:
+                    transaction_rows.append((sink.reserve_ids('transactions', 1)[0],) + transaction_row)
+                # 70% chance of having a review
+                if session_row[SESSION_STATUS] == "completed" and random.random() > 0.3:
+                    review = generator.build_review(session_id, user_id, advisor[0], now)
+                    review_rows.append((sink.reserve_ids('reviews', 1)[0],) + review)
+            return [
+                ('sessions', generator.SESSION_COLUMNS, session_rows),
+                ('transactions', ('id',) + generator.PAYMENT_COLUMNS, transaction_rows),
+                ('reviews', ('id',) + generator.REVIEW_COLUMNS, review_rows),
+            ]
+
+        parents = sample_parents((user_ids, advisors), counts['sessions'], random.Random(random.getrandbits(64)))
+        run_pipeline(parents, build_sessions, sink, generator.commit_batch_size(sink, 'sessions'))
+
+        # Messages
+        def build_messages(chunk):
+            message_ids = sink.reserve_ids('messages', len(chunk))
+            rows = [
+                (message_id,) + generator.build_message(sender_id, receiver_id, i, now)
+                for message_id, (sender_id, receiver_id, i) in zip(message_ids, chunk)
+            ]
+            return [('messages', ('id',) + generator.MESSAGE_COLUMNS, rows)]
+
+        advisor_user_ids = [advisor[0] for advisor in advisors]
+        pair_count = min(len(user_ids), len(advisor_user_ids), counts['message_threads'])
+        threads = generator.message_threads(
+            user_ids, advisor_user_ids, counts['messages'], pair_count, random.Random(random.getrandbits(64))
+        )
+        run_pipeline(threads, build_messages, sink, generator.commit_batch_size(sink, 'messages'))
+
+    # Angela AI conversations
+    conversation_users = random.sample(user_ids, min(counts['conversations'], len(user_ids)))
+
+    def build_conversations(chunk):
+        conversation_ids = sink.reserve_ids('conversations', len(chunk))
+        rows = [
+            (conversation_id,) + generator.build_conversation(user_id, now)
+            for conversation_id, user_id in zip(conversation_ids, chunk)
+        ]
+        return [('conversations', ('id',) + generator.CONVERSATION_COLUMNS, rows)]
+
+    run_pipeline(conversation_users, build_conversations, sink, generator.commit_batch_size(sink, 'conversations'))
+
+    # Topups (load_dataset.py adds them to the account balances after loading)
+    topup_users = random.sample(user_ids, min(counts['topups'], len(user_ids)))
+    topup_counts = [random.randint(*generator.TOPUPS_PER_USER) for _ in topup_users]
+
+    def build_topups(chunk):
+        topup_ids = sink.reserve_ids('transactions', len(chunk))
+        rows = [(topup_id,) + generator.build_topup(user_id, now) for topup_id, user_id in zip(topup_ids, chunk)]
+        return [('transactions', ('id',) + generator.TOPUP_COLUMNS, rows)]
+
+    topups = (user_id for user_id, n in zip(topup_users, topup_counts) for _ in range(n))
+    run_pipeline(topups, build_topups, sink, generator.commit_batch_size(sink, 'topups'))
+
+    manifest = sink.close()
+    for entry in manifest['files']:
+        print(f"  {entry['file']}: {entry['rows']} rows, ids {entry['min_id']}-{entry['max_id']}")
+    return manifest
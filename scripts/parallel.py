@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+
+# Multi-process data generation with deterministic seed partitioning
+#
+# Each generator's row range is split into fixed-size shards. A shard is seeded from
+# the master seed, the generator name and the shard index, and takes its primary keys
+# from a block reserved before any worker starts, so a shard always produces the same
+# rows however many workers run, whichever worker picks it up and whichever load mode
+# writes them. Workers write through their own connections and sinks.
+
+import hashlib
+import multiprocessing
+import random
+
+import python_data_generator as generator
+from bulk_loader import make_sink
+from instrumentation import instrument_sink, stage
+from journal import HeldCommitSink, record_shard
+from pipeline import reservoir_sample, run_pipeline, sample_parents
+
+# Rows per shard (fixed so that the shard layout never depends on the worker count)
+SHARD_ROWS = 5000
+
+# Upper bound of specialties per advisor (see generate_advisors)
+MAX_ADVISOR_SPECIALTIES = 5
+
+# Derive the seed for one shard of a generator from the master seed
+def shard_seed(master_seed, name, index):
+    digest = hashlib.sha256(f"{master_seed}:{name}:{index}".encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+# Seed both random and Faker for one shard
+def seed_shard(master_seed, name, index):
+    seed = shard_seed(master_seed, name, index)
+    random.seed(seed)
+    generator.faker.seed_instance(seed)
+
+# Split total rows into (index, start, count) shards
+def plan_shards(total):
+    return [
+        (index, start, min(SHARD_ROWS, total - start))
+        for index, start in enumerate(range(0, total, SHARD_ROWS))
+    ]
+
+# Each stage has a prepare step run once by the coordinator (load parent pools, reserve
+# primary keys) returning (context, total rows), and a shard step run by the workers
+# returning (source, build) for run_pipeline over rows start..start+count of the stage.
+
+def prepare_users(conn, sink, count, seed):
+    return {'first_id': sink.reserve_id_range('users', count).start}, count
+
+def shard_users(conn, context, start, count):
+    source = range(start, start + count)
+
+    def build(chunk):
+        rows = [(context['first_id'] + i,) + generator.build_user(i) for i in chunk]
+        return [('users', ('id',) + generator.USER_COLUMNS, rows)]
+
+    return source, build
+
+def prepare_advisors(conn, sink, count, seed):
+    return {
+        'first_id': sink.reserve_id_range('users', count).start,
+        'first_specialty_id': sink.reserve_id_range('advisor_specialties', count * MAX_ADVISOR_SPECIALTIES).start,
+    }, count
+
+def shard_advisors(conn, context, start, count):
+    source = range(start, start + count)
+
+    def build(chunk):
+        advisor_rows = []
+        specialty_rows = []
+        for i in chunk:
+            advisor_id = context['first_id'] + i
+            advisor_row, specialties = generator.build_advisor(i, advisor_id)
+            advisor_rows.append(advisor_row)
+            for k, specialty_id in enumerate(specialties):
+                specialty_rows.append((
+                    context['first_specialty_id'] + i * MAX_ADVISOR_SPECIALTIES + k,
+                    advisor_id,
+                    specialty_id
+                ))
+        return [
+            ('users', generator.ADVISOR_COLUMNS, advisor_rows),
+            ('advisor_specialties', ('id',) + generator.ADVISOR_SPECIALTY_COLUMNS, specialty_rows),
+        ]
+
+    return source, build
+
+def prepare_sessions(conn, sink, count, seed):
+    user_ids, advisors = _parent_pools(conn, with_rates=True)
+    if not user_ids or not advisors:
+        print("No users or advisors found. Skipping session generation.")
+        return None, 0
+    return {
+        'user_ids': user_ids,
+        'advisors': advisors,
+        'first_id': sink.reserve_id_range('sessions', count).start,
+        # At most one payment per session, so payments share the session offsets
+        'first_transaction_id': sink.reserve_id_range('transactions', count).start,
+    }, count
+
+def shard_sessions(conn, context, start, count):
+    # Parents come from their own stream so the rows don't depend on the chunk size
+    rng = random.Random(random.getrandbits(64))
+    parents = sample_parents((context['user_ids'], context['advisors']), count, rng)
+    source = zip(range(start, start + count), parents)
+
+    def build(chunk):
+        session_rows = []
+        transaction_rows = []
+        for offset, (user_id, advisor) in chunk:
+            session_row, transaction_row = generator.build_session(
+                context['first_id'] + offset, user_id, advisor, context['now']
+            )
+            session_rows.append(session_row)
+            if transaction_row:
+                transaction_rows.append((context['first_transaction_id'] + offset,) + transaction_row)
+        return [
+            ('sessions', generator.SESSION_COLUMNS, session_rows),
+            ('transactions', ('id',) + generator.PAYMENT_COLUMNS, transaction_rows),
+        ]
+
+    return source, build
+
+def prepare_messages(conn, sink, count, seed):
+    user_ids, advisor_ids = _parent_pools(conn)
+    if not user_ids or not advisor_ids:
+        print("No users or advisors found. Skipping message generation.")
+        return None, 0
+    return {
+        'user_ids': user_ids,
+        'advisor_ids': advisor_ids,
+        'first_id': sink.reserve_id_range('messages', count).start,
+        'total': count,
+    }, count
+
+def shard_messages(conn, context, start, count):
+    # The thread cap of generate_messages, split over the shards in proportion to their
+    # rows; each shard fills its rows with complete threads, drawn from their own stream
+    pairs = generator.message_thread_count(
+        context['counts'], len(context['user_ids']), len(context['advisor_ids'])
+    )
+    pair_count = pairs * (start + count) // context['total'] - pairs * start // context['total']
+    rng = random.Random(random.getrandbits(64))
+    threads = generator.message_threads(context['user_ids'], context['advisor_ids'], count, pair_count, rng=rng)
+    source = zip(range(start, start + count), threads)
+
+    def build(chunk):
+        rows = [
+            (context['first_id'] + offset,) + generator.build_message(sender_id, receiver_id, i, context['now'])
+            for offset, (sender_id, receiver_id, i) in chunk
+        ]
+        return [('messages', ('id',) + generator.MESSAGE_COLUMNS, rows)]
+
+    return source, build
+
+def prepare_reviews(conn, sink, count, seed):
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT MIN(id), MAX(id) FROM sessions WHERE status = %s", ("completed",))
+        min_id, max_id = cursor.fetchone()
+    finally:
+        cursor.close()
+    if min_id is None:
+        print("No completed sessions found. Skipping review generation.")
+        return None, 0
+
+    # Shards cover the completed session id space; a review takes its session's offset
+    total = max_id - min_id + 1
+    return {
+        'min_session_id': min_id,
+        'first_id': sink.reserve_id_range('reviews', total).start,
+    }, total
+
+def shard_reviews(conn, context, start, count):
+    first_session_id = context['min_session_id'] + start
+    source = generator.unreviewed_sessions(
+        conn, SHARD_ROWS, first_session_id, first_session_id + count - 1
+    )
+
+    def build(chunk):
+        rows = []
+        for session in chunk:
+            # 70% chance of having a review
+            if random.random() > 0.3:
+                review_id = context['first_id'] + session[0] - context['min_session_id']
+                rows.append((review_id,) + generator.build_review(*session, context['now']))
+        return [('reviews', ('id',) + generator.REVIEW_COLUMNS, rows)]
+
+    return source, build
+
+def prepare_conversations(conn, sink, count, seed):
+    # The users are picked up front from their own seed, then sharded
+    rng = random.Random(shard_seed(seed, 'conversations', 'selection'))
+    selected_users = reservoir_sample(generator.users_without_conversations(conn), count, rng)
+    return {
+        'selected_users': selected_users,
+        'first_id': sink.reserve_id_range('conversations', len(selected_users)).start,
+    }, len(selected_users)
+
+def shard_conversations(conn, context, start, count):
+    source = zip(range(start, start + count), context['selected_users'][start:start + count])
+
+    def build(chunk):
+        rows = [
+            (context['first_id'] + offset,) + generator.build_conversation(user_id, context['now'])
+            for offset, user_id in chunk
+        ]
+        return [('conversations', ('id',) + generator.CONVERSATION_COLUMNS, rows)]
+
+    return source, build
+
+STAGES = {
+    'users': (prepare_users, shard_users),
+    'advisors': (prepare_advisors, shard_advisors),
+    'sessions': (prepare_sessions, shard_sessions),
+    'messages': (prepare_messages, shard_messages),
+    'reviews': (prepare_reviews, shard_reviews),
+    'conversations': (prepare_conversations, shard_conversations),
+}
+
+# User ids and advisors (those with rates, or all their ids) from the shared registry;
+# the pools travel to the workers as compact arrays
+def _parent_pools(conn, with_rates=False):
+    user_ids = generator.id_registry.pool(conn, 'users').ids
+    if with_rates:
+        return user_ids, generator.id_registry.pool(conn, 'advisor_rates')
+    return user_ids, generator.id_registry.pool(conn, 'advisors').ids
+
+# Per-process worker state, set up once by _init_worker
+_worker = {}
+
+def _init_worker(load_mode, stage, context, conn=None):
+    conn = conn or generator.get_db_connection()
+    # Spawned workers start with the Faker text source; switch to the coordinator's corpus
+    if context['text_corpus'] != generator.text_source.spec:
+        generator.use_text_corpus(*context['text_corpus'][1:])
+    if context['adaptive_batches'] != generator.adaptive_batches:
+        generator.use_adaptive_batches(*context['adaptive_batches'])
+    sink = instrument_sink(make_sink(conn, load_mode))
+    _worker.update(
+        conn=conn,
+        sink=sink,
+        stage=stage,
+        context=context,
+        # One batch size per worker, so an adaptive one carries what it learned across shards
+        batch_size=generator.commit_batch_size(sink, stage),
+    )
+
+# Run one shard, returning the rows written per table and the worker's adaptive batch
+# size afterwards (None with fixed sizes)
+def _run_shard(shard):
+    index, start, count = shard
+    stage, context, sink, batch_size = _worker['stage'], _worker['context'], _worker['sink'], _worker['batch_size']
+    seed_shard(context['seed'], stage, index)
+
+    _, shard_stage = STAGES[stage]
+    source, build = shard_stage(_worker['conn'], context, start, count)
+    run_name = context['journal']
+    try:
+        if not run_name:
+            written = run_pipeline(source, build, sink, batch_size, report=False)
+        else:
+            # A journaled shard is one transaction, committed together with its journal row
+            written = run_pipeline(source, build, HeldCommitSink(sink), batch_size, report=False)
+            record_shard(
+                _worker['conn'], run_name, stage, index, start, count, shard_seed(context['seed'], stage, index)
+            )
+            sink.commit()
+    except Exception:
+        sink.rollback()
+        raise
+    return written, getattr(batch_size, 'size', None)
+
+# Run one stage across a pool of worker processes, returning the rows written per table
+#
+# With a journal the prepared context is saved before any shard runs (and reused when
+# the run resumes), and only the shards not journaled as done run.
+def generate_sharded(conn, stage, count, workers, seed, now, load_mode, journal=None, counts=None):
+    print(f"Generating {stage} across {workers} worker(s)...")
+
+    prepare, _ = STAGES[stage]
+    prepared = journal.state(stage) if journal else None
+    if prepared is None:
+        prepared = prepare(conn, make_sink(conn, load_mode), count, seed)
+        if journal:
+            journal.save_state(stage, prepared)
+    context, total = prepared
+    if not total:
+        return {}
+    context.update(
+        seed=seed, now=now, text_corpus=generator.text_source.spec, journal=journal.run_name if journal else None,
+        adaptive_batches=generator.adaptive_batches, counts=counts or generator.DEFAULT_COUNTS
+    )
+
+    shards = plan_shards(total)
+    if journal:
+        done = journal.completed_shards(stage)
+        if done:
+            print(f"Resuming {stage}: {len(done)} of {len(shards)} shard(s) already done.")
+        shards = [shard for shard in shards if shard[0] not in done]
+    written = {}
+    batch_sizes = []
+
+    def collect(result):
+        result, batch_size = result
+        for table, rows in result.items():
+            written[table] = written.get(table, 0) + rows
+        if batch_size is not None:
+            batch_sizes.append(batch_size)
+
+    if workers <= 1 or len(shards) <= 1:
+        # Run in-process on the coordinator's connection
+        _init_worker(load_mode, stage, context, conn)
+        for shard in shards:
+            collect(_run_shard(shard))
+    else:
+        # Workers are spawned (not forked) so no process inherits another's connection
+        with multiprocessing.get_context('spawn').Pool(
+            min(workers, len(shards)),
+            initializer=_init_worker,
+            initargs=(load_mode, stage, context)
+        ) as pool:
+            for result in pool.imap_unordered(_run_shard, shards):
+                collect(result)
+
+    summary = ", ".join(f"{rows} {table}" for table, rows in written.items()) or "no rows"
+    print(f"Created {summary} in {len(shards)} shard(s).")
+    if batch_sizes:
+        print(f"Adaptive batches for {stage}: shards ended at {min(batch_sizes)}-{max(batch_sizes)} rows per commit.")
+    return written
+
+# Generate all data with sharded stages; the output depends only on the seed and now
+#
+# Instrumented stages only count the rows and time of shards run in this process, so
+# stages spread over worker processes report their seconds alone. With a journal the
+# run can be resumed after a crash (see journal.py).
+def generate_all_data_parallel(conn, load_mode, workers, seed, now, counts, journal=None):
+    sink = instrument_sink(make_sink(conn, load_mode))
+
+    # Small or order-dependent stages run in the coordinator, each from its own seed
+    with stage('specialties'):
+        generator.generate_specialties(conn, sink)
+    with stage('users'):
+        generate_sharded(conn, 'users', counts['users'], workers, seed, now, load_mode, journal)
+        generator.id_registry.invalidate('users')
+    with stage('advisors'):
+        generate_sharded(conn, 'advisors', counts['advisors'], workers, seed, now, load_mode, journal)
+        generator.id_registry.invalidate('advisors', 'advisor_rates')
+    with stage('admins'):
+        seed_shard(seed, 'admins', 0)
+        generator.generate_admins(conn, counts['admins'], sink)
+    with stage('sessions'):
+        generate_sharded(conn, 'sessions', counts['sessions'], workers, seed, now, load_mode, journal)
+    with stage('messages'):
+        generate_sharded(conn, 'messages', counts['messages'], workers, seed, now, load_mode, journal, counts)
+    with stage('reviews'):
+        # A resumed run may have written its reviews before the ratings were updated
+        if generate_sharded(conn, 'reviews', None, workers, seed, now, load_mode, journal).get('reviews') or journal:
+            generator.update_advisor_ratings(conn)
+    with stage('conversations'):
+        generate_sharded(conn, 'conversations', counts['conversations'], workers, seed, now, load_mode, journal)
+    with stage('topups'):
+        if not journal:
+            seed_shard(seed, 'topups', 0)
+            generator.generate_topups(conn, counts['topups'], sink, now)
+        elif journal.state('topups') is None:
+            # Topups add to balances, so they run as one transaction with their journal row
+            seed_shard(seed, 'topups', 0)
+            held = HeldCommitSink(sink)
+            generator.generate_topups(conn, counts['topups'], held, now)
+            if held.rolled_back:
+                raise RuntimeError("Topup generation failed; run again to resume")
+            journal.save_state('topups', True, commit=False)
+            sink.commit()
+    if journal:
+        journal.finish()
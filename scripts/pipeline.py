@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+
+# Streaming row pipeline for the data generators
+#
+# Rows are produced by a chain of generator stages that pass fixed-size chunks
+# along, so only one chunk is alive at a time however many rows are requested:
+#
+#   sample parents -> synthesize attributes -> encode -> sink
+#
+# Memory ceiling per stage, for a chunk of C rows with an average width of W bytes:
+#   sample parents  C parent tuples (~C * 100 bytes)
+#   synthesize      C row tuples for each table written by the chunk (~C * W * 3 as Python objects)
+#   encode          one payload per table (~C * W for COPY, the row tuples themselves for INSERT)
+#   sink            nothing once the write returns; the chunk is committed and released
+#
+# C is the generator's commit batch size (at most COPY_BATCH_ROWS for COPY sinks), so
+# with the widest rows (reviews, conversations: a few KB) a chunk stays in the tens of MB.
+# The parent pools looked up before a run starts (user and advisor IDs) are the only
+# state that grows, and they grow with the number of users, not the rows generated.
+#
+# With an AdaptiveBatchSize instead of a fixed size, C follows the measured transaction
+# time of each chunk (writes and commit) towards a target, within max_rows.
+
+import random
+import time
+from itertools import islice
+
+# Default target duration of one batch transaction, and cap on its rows, for adaptive batches
+DEFAULT_TARGET_COMMIT_SECONDS = 0.5
+DEFAULT_MAX_BATCH_ROWS = 50000
+
+# Largest factor a batch grows or shrinks by from one chunk to the next
+MAX_BATCH_STEP = 2.0
+
+# Weight of the latest chunk in the smoothed seconds per row
+SMOOTHING = 0.5
+
+# Throughput drop (relative) after growing a batch that makes the controller back off
+THROUGHPUT_TOLERANCE = 0.1
+
+# Batch size that adapts to the measured cost of each committed chunk
+#
+# Every chunk reports its size, its transaction seconds (writes and commit) and its total
+# seconds (synthesis included). The next size is the target over the smoothed seconds
+# per row, moving at most MAX_BATCH_STEP per chunk and staying within min_rows..max_rows.
+# Growing past the point where throughput (rows per total second) stops improving gains
+# nothing but longer transactions, so a grown batch that lowers throughput becomes the
+# ceiling and the size steps back.
+class AdaptiveBatchSize:
+    def __init__(self, name, size, min_rows=1, max_rows=DEFAULT_MAX_BATCH_ROWS,
+                 target_seconds=DEFAULT_TARGET_COMMIT_SECONDS):
+        self.name = name
+        self.min_rows = max(1, min_rows)
+        self.max_rows = max(self.min_rows, max_rows)
+        self.target_seconds = target_seconds
+        self.size = min(max(size, self.min_rows), self.max_rows)
+        self.initial = self.size
+        self.ceiling = self.max_rows
+        self.row_seconds = None
+        self.throughput = None
+        self.last_size = None
+        self.smallest = None
+        self.largest = None
+        self.batches = 0
+        self.pulled = 0
+
+    def observe(self, rows, transaction_seconds, total_seconds):
+        if not rows:
+            return
+        self.batches += 1
+        self.smallest = rows if self.smallest is None else min(self.smallest, rows)
+        self.largest = rows if self.largest is None else max(self.largest, rows)
+        # A short last chunk says nothing about the size that was asked for
+        if rows < self.size:
+            return
+
+        row_seconds = transaction_seconds / rows
+        if self.row_seconds is None:
+            self.row_seconds = row_seconds
+        else:
+            self.row_seconds += SMOOTHING * (row_seconds - self.row_seconds)
+
+        throughput = rows / total_seconds if total_seconds > 0 else None
+        if (throughput and self.throughput and self.last_size and rows > self.last_size
+                and throughput < self.throughput * (1 - THROUGHPUT_TOLERANCE)):
+            # Growing cost throughput: stay below this size from now on
+            self.ceiling = max(self.min_rows, self.last_size)
+            self.last_size, self.size = rows, self.ceiling
+            return
+        self.throughput = throughput
+        self.last_size = rows
+
+        wanted = self.target_seconds / self.row_seconds if self.row_seconds > 0 else self.ceiling
+        wanted = min(max(wanted, rows / MAX_BATCH_STEP), rows * MAX_BATCH_STEP)
+        self.size = int(min(max(wanted, self.min_rows), self.ceiling))
+
+    # One line describing the sizes the controller went through
+    def summary(self):
+        if not self.batches:
+            return f"Adaptive batches for {self.name}: no rows written."
+        row_ms = f", {self.row_seconds * 1000:.3f} ms per row" if self.row_seconds else ""
+        return (
+            f"Adaptive batches for {self.name}: {self.batches} commit(s) of {self.smallest}-{self.largest} rows, "
+            f"started at {self.initial}, settled at {self.size} "
+            f"(target {self.target_seconds:g}s per commit{row_ms})."
+        )
+
+# Split an iterable into lists of at most size items (an AdaptiveBatchSize is read again
+# for every chunk, and remembers how many items the chunk it handed out holds)
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    adaptive = isinstance(size, AdaptiveBatchSize)
+    while True:
+        chunk = list(islice(iterator, size.size if adaptive else size))
+        if not chunk:
+            return
+        if adaptive:
+            size.pulled = len(chunk)
+        yield chunk
+
+# Stage 1: pick count random parents, one from each pool per row
+def sample_parents(pools, count, rng=random):
+    for _ in range(count):
+        yield tuple(rng.choice(pool) for pool in pools)
+
+# Pick up to count items of a stream uniformly at random, holding only count of them
+def reservoir_sample(iterable, count, rng=random):
+    sample = []
+    for seen, item in enumerate(iterable):
+        if seen < count:
+            sample.append(item)
+        else:
+            slot = rng.randrange(seen + 1)
+            if slot < count:
+                sample[slot] = item
+    return sample
+
+# Stage 2: turn each chunk of parents into (table, columns, rows) writes
+def synthesize(chunks, build):
+    for chunk in chunks:
+        yield build(chunk)
+
+# Stage 3: encode every write in the chunk into the sink's wire format
+def encode(batches, sink):
+    for writes in batches:
+        yield [
+            (table, columns, rows, sink.encode(table, columns, rows))
+            for table, columns, rows in writes
+            if rows
+        ]
+
+# Stage 4: write and commit each chunk, returning the rows written per table
+#
+# Rows of conflict tables that already exist are not written; when a skipped dict is
+# given it collects how many were skipped per table. An AdaptiveBatchSize is told how
+# long each chunk took, before the next chunk is pulled through the earlier stages.
+def drain(encoded, sink, after_write=None, skipped=None, batch_size=None):
+    written = {}
+    chunk_started = time.perf_counter()
+    for writes in encoded:
+        started = time.perf_counter()
+        for table, columns, rows, payload in writes:
+            inserted = sink.write_encoded(table, columns, payload, len(rows))
+            written[table] = written.get(table, 0) + inserted
+            if skipped is not None and inserted < len(rows):
+                skipped[table] = skipped.get(table, 0) + len(rows) - inserted
+        if after_write:
+            after_write(writes)
+        sink.commit()
+        if batch_size is not None:
+            finished = time.perf_counter()
+            # Stages pull lazily, so the last chunk handed out is the one just committed
+            batch_size.observe(batch_size.pulled, finished - started, finished - chunk_started)
+            chunk_started = finished
+    return written
+
+# Run a full pipeline over a parent source in chunks of chunk_size (rows, or an
+# AdaptiveBatchSize, which reports the sizes it chose when report is set)
+def run_pipeline(source, build, sink, chunk_size, after_write=None, skipped=None, report=True):
+    chunks = chunked(source, chunk_size)
+    adaptive = chunk_size if isinstance(chunk_size, AdaptiveBatchSize) else None
+    written = drain(encode(synthesize(chunks, build), sink), sink, after_write, skipped, adaptive)
+    if adaptive and report:
+        print(adaptive.summary())
+    return written
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+
+# Dry-run planner: expected rows, on-disk size and load time of a run, without a database
+#
+# Rows per table follow from the counts and the generators' own rates (the session
+# outcomes of build_session, the 70% review rate, 2-5 specialties per advisor, 1-3 topups
+# per topped-up user). Widths come from a trial batch: TRIAL_ROWS rows of every kind are
+# built with the real row builders and measured the way Postgres lays them out (tuple
+# header, null bitmap, alignment, varlena headers, line pointer), which gives the heap
+# size; primary key B-trees are estimated from their entry size. TOAST compression of
+# long texts and secondary indexes are not modelled.
+#
+# The same trial batch calibrates the runtime: building and encoding it gives seconds
+# per row of Python work, spread over the worker processes. The database side cannot be
+# measured without touching it, so it is projected from an assumed write rate per load
+# mode and a commit round-trip per batch (ASSUMED_WRITE_MB_PER_SECOND,
+# ASSUMED_COMMIT_SECONDS).
+
+import json
+import math
+import random
+import time
+from datetime import datetime
+
+import python_data_generator as generator
+from bulk_loader import COLUMN_TYPES, COPY_BATCH_ROWS, LoadMode, encode_binary_tuples, encode_text_rows
+
+# Rows of each kind built for the trial batch
+TRIAL_ROWS = 200
+
+# Session outcomes of build_session: sessions start 0-30 days ago (31 equally likely
+# days); older than 7 days they are completed and 70% paid, 3-7 days ago completed or
+# canceled (half each) with half of the completed paid, the last 3 days not completed
+SESSION_DAYS = 31
+COMPLETED_RATE = (23 + 5 * 0.5) / SESSION_DAYS
+PAID_RATE = (23 * 0.7 + 5 * 0.5 * 0.5) / SESSION_DAYS
+
+# Share of completed sessions that get a review
+REVIEW_RATE = 0.7
+
+# Specialties per advisor (inclusive range, see generate_advisors)
+SPECIALTIES_PER_ADVISOR = (2, 5)
+
+# Assumed database write throughput of the encoded rows, and time per commit round-trip
+ASSUMED_WRITE_MB_PER_SECOND = {
+    LoadMode.INSERT: 2,
+    LoadMode.COPY_TEXT: 40,
+    LoadMode.COPY_BINARY: 50,
+}
+ASSUMED_COMMIT_SECONDS = 0.002
+
+# Heap and B-tree page layout
+PAGE_SIZE = 8192
+PAGE_HEADER = 24
+BTREE_SPECIAL = 16
+BTREE_FILL = 0.9
+TUPLE_HEADER = 23
+LINE_POINTER = 4
+MAXALIGN = 8
+
+# Size and alignment of fixed-width column types
+FIXED_TYPES = {'int4': (4, 4), 'bool': (1, 1), 'timestamp': (8, 8)}
+
+# Kinds of rows: the table they go to and their columns in row tuple order
+ROW_KINDS = {
+    'specialties': ('specialties', generator.SPECIALTY_COLUMNS),
+    'users': ('users', generator.USER_COLUMNS),
+    'advisors': ('users', generator.ADVISOR_COLUMNS),
+    'admins': ('users', generator.ADMIN_COLUMNS),
+    'advisor_specialties': ('advisor_specialties', ('id',) + generator.ADVISOR_SPECIALTY_COLUMNS),
+    'sessions': ('sessions', generator.SESSION_COLUMNS),
+    'payments': ('transactions', generator.PAYMENT_COLUMNS),
+    'messages': ('messages', generator.MESSAGE_COLUMNS),
+    'reviews': ('reviews', generator.REVIEW_COLUMNS),
+    'conversations': ('conversations', generator.CONVERSATION_COLUMNS),
+    'topups': ('transactions', generator.TOPUP_COLUMNS),
+}
+
+# Batch size of each kind's pipeline (kinds written along with another use its batches)
+BATCH_GENERATORS = {
+    'users': 'users', 'advisors': 'advisors', 'sessions': 'sessions', 'messages': 'messages',
+    'reviews': 'reviews', 'conversations': 'conversations', 'topups': 'topups',
+}
+
+def _mean(bounds):
+    return sum(bounds) / 2
+
+def _align(offset, alignment):
+    return -(-offset // alignment) * alignment
+
+# Expected rows of every kind for a set of counts, on an empty database
+#
+# The capped stages use the generators' own caps: messages fill the capped user-advisor
+# threads, conversations and topups go to distinct regular users.
+def expected_rows(counts):
+    return {
+        'specialties': len(generator.SPECIALTIES),
+        'users': counts['users'],
+        'advisors': counts['advisors'],
+        'admins': counts['admins'],
+        'advisor_specialties': round(counts['advisors'] * _mean(SPECIALTIES_PER_ADVISOR)),
+        'sessions': counts['sessions'],
+        'payments': round(counts['sessions'] * PAID_RATE),
+        'messages': generator.message_rows(counts),
+        'reviews': round(counts['sessions'] * COMPLETED_RATE * REVIEW_RATE),
+        'conversations': generator.picked_users(counts, 'conversations'),
+        'topups': round(generator.picked_users(counts, 'topups') * _mean(generator.TOPUPS_PER_USER)),
+    }
+
+# Bytes one row takes in a heap page, line pointer included
+#
+# Columns are laid out in COLUMN_TYPES order; the ones a kind does not write are NULL.
+def heap_tuple_bytes(table, columns, row):
+    values = dict(zip(columns, row))
+    values.setdefault('id', 1)
+    offset = 0
+    has_null = False
+    for column, column_type in COLUMN_TYPES[table].items():
+        value = values.get(column)
+        if value is None:
+            has_null = True
+        elif column_type in FIXED_TYPES:
+            size, alignment = FIXED_TYPES[column_type]
+            offset = _align(offset, alignment) + size
+        else:
+            if not isinstance(value, str):
+                value = json.dumps(value)
+            length = len(value.encode('utf-8'))
+            # Short values get a 1-byte header and no alignment, longer ones 4 bytes aligned
+            if length < 127:
+                offset += 1 + length
+            else:
+                offset = _align(offset, 4) + 4 + length
+    header = TUPLE_HEADER + (math.ceil(len(COLUMN_TYPES[table]) / 8) if has_null else 0)
+    return _align(_align(header, MAXALIGN) + offset, MAXALIGN) + LINE_POINTER
+
+# Bytes of a primary key B-tree over rows int4 ids (leaf pages at the default fill)
+def primary_key_bytes(rows):
+    entry = _align(8 + 4, MAXALIGN) + LINE_POINTER
+    per_page = int((PAGE_SIZE - PAGE_HEADER - BTREE_SPECIAL) * BTREE_FILL) // entry
+    return math.ceil(rows / per_page) * PAGE_SIZE if rows else 0
+
+# Build TRIAL_ROWS rows of every kind with the real builders, returning the rows and the
+# seconds spent per kind (payments and advisor specialties are built along with sessions
+# and advisors, and count towards them)
+def trial_batch(now, rows=TRIAL_ROWS):
+    samples = {}
+    seconds = {}
+
+    def timed(kind, build):
+        started = time.perf_counter()
+        samples[kind] = build()
+        seconds[kind] = time.perf_counter() - started
+
+    samples['specialties'] = [(s["name"], s["icon"], s["category"]) for s in generator.SPECIALTIES]
+    timed('users', lambda: [generator.build_user(i) for i in range(rows)])
+    timed('advisors', lambda: [generator.build_advisor(i, rows + i + 1) for i in range(rows)])
+    advisors = samples['advisors']
+    samples['advisors'] = [row for row, _ in advisors]
+    samples['advisor_specialties'] = [
+        (1, row[0], specialty_id) for row, specialties in advisors for specialty_id in specialties
+    ]
+    timed('admins', lambda: [generator.build_admin(i) for i in range(generator.ADMIN_COUNT)])
+
+    rates = generator.ADVISOR_COLUMNS.index('chat_rate')
+    parents = [(row[0],) + row[rates:rates + 3] for row in samples['advisors']]
+    timed('sessions', lambda: [
+        generator.build_session(i + 1, random.randint(1, rows), random.choice(parents), now) for i in range(rows)
+    ])
+    sessions = samples['sessions']
+    samples['sessions'] = [session for session, _ in sessions]
+    samples['payments'] = [payment for _, payment in sessions if payment]
+    timed('messages', lambda: [
+        generator.build_message(random.randint(1, rows), random.choice(parents)[0], i, now) for i in range(rows)
+    ])
+    timed('reviews', lambda: [
+        generator.build_review(i + 1, random.randint(1, rows), random.choice(parents)[0], now) for i in range(rows)
+    ])
+    timed('conversations', lambda: [generator.build_conversation(i + 1, now) for i in range(rows)])
+    timed('topups', lambda: [generator.build_topup(i + 1, now) for i in range(rows)])
+    return samples, seconds
+
+# Plan a run: per kind the expected rows, heap bytes, encoded bytes and Python seconds
+def plan(counts, load_mode=LoadMode.INSERT, seed=None, now=None):
+    now = now or datetime.now()
+    random.seed(seed)
+    generator.faker.seed_instance(seed)
+    samples, build_seconds = trial_batch(now)
+    encode = encode_binary_tuples if load_mode == LoadMode.COPY_BINARY else encode_text_rows
+
+    kinds = {}
+    for kind, rows in expected_rows(counts).items():
+        table, columns = ROW_KINDS[kind]
+        sample = samples[kind]
+        started = time.perf_counter()
+        payload = encode(table, columns, sample) if sample else b''
+        encode_seconds = time.perf_counter() - started
+        trial = max(len(sample), 1)
+        kinds[kind] = dict(
+            table=table,
+            rows=rows,
+            heap_bytes=rows * sum(heap_tuple_bytes(table, columns, row) for row in sample) / trial,
+            encoded_bytes=rows * len(payload) / trial,
+            # Payments are built within the sessions' time, advisor specialties within the advisors'
+            python_seconds=rows * (build_seconds.get(kind, 0) + encode_seconds) / trial,
+        )
+    return kinds
+
+# Projected wall time (Python work spread over workers, database writes and commits)
+def projected_seconds(kinds, load_mode, workers=0, sink_min_batch_rows=1):
+    python_seconds = sum(kind['python_seconds'] for kind in kinds.values()) / max(workers, 1)
+    write_seconds = sum(kind['encoded_bytes'] for kind in kinds.values()) / 2 ** 20 / ASSUMED_WRITE_MB_PER_SECOND[load_mode]
+    commits = sum(
+        math.ceil(kinds[kind]['rows'] / max(generator.COMMIT_BATCH_SIZES[name], sink_min_batch_rows))
+        for kind, name in BATCH_GENERATORS.items()
+    )
+    return python_seconds, write_seconds, commits * ASSUMED_COMMIT_SECONDS
+
+def _size(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+def _duration(seconds):
+    if seconds < 120:
+        return f"{seconds:.1f}s"
+    if seconds < 7200:
+        return f"{seconds / 60:.1f} min"
+    return f"{seconds / 3600:.1f} h"
+
+# Print the plan of a run
+def print_plan(counts, load_mode=LoadMode.INSERT, workers=0, seed=None, now=None):
+    kinds = plan(counts, load_mode, seed, now)
+
+    tables = {}
+    for kind in kinds.values():
+        table = tables.setdefault(kind['table'], dict(rows=0, heap_bytes=0))
+        table['rows'] += kind['rows']
+        table['heap_bytes'] += kind['heap_bytes']
+
+    print(f"Plan for {counts} ({load_mode}, trial of {TRIAL_ROWS} rows per kind, database not touched):")
+    print(f"  {'table':<22}{'rows':>14}{'heap':>12}{'primary key':>14}{'row width':>12}")
+    total_bytes = 0
+    for name, table in tables.items():
+        heap_bytes = math.ceil(table['heap_bytes'] / (PAGE_SIZE - PAGE_HEADER)) * PAGE_SIZE
+        index_bytes = primary_key_bytes(table['rows'])
+        total_bytes += heap_bytes + index_bytes
+        width = table['heap_bytes'] / table['rows'] if table['rows'] else 0
+        print(
+            f"  {name:<22}{table['rows']:>14,}{_size(heap_bytes):>12}{_size(index_bytes):>14}{width:>10.0f} B"
+        )
+    print(f"  {'total':<22}{sum(t['rows'] for t in tables.values()):>14,}{_size(total_bytes):>12} with primary keys")
+
+    min_batch_rows = 1 if load_mode == LoadMode.INSERT else COPY_BATCH_ROWS
+    python_seconds, write_seconds, commit_seconds = projected_seconds(kinds, load_mode, workers, min_batch_rows)
+    print(
+        f"Projected time: ~{_duration(python_seconds + write_seconds + commit_seconds)} "
+        f"({_duration(python_seconds)} generating and encoding on {max(workers, 1)} process(es), "
+        f"{_duration(write_seconds)} writing at an assumed {ASSUMED_WRITE_MB_PER_SECOND[load_mode]} MB/s, "
+        f"{_duration(commit_seconds)} committing)"
+    )
@@ -4,24 +4,54 @@ import os
 import sys
 import random
 import psycopg2
-import json
+from psycopg2.extensions import TRANSACTION_STATUS_INERROR
 from psycopg2.extras import execute_values
+import json
+import time
+import argparse
+from itertools import repeat
+from contextlib import nullcontext
 from faker import Faker
 from datetime import datetime, timedelta
+from bulk_loader import LoadMode, FileFormat, make_sink
+from id_registry import IdRegistry
+from instrumentation import DEFAULT_PROFILE_DIR, ProfileMode, configure as configure_instrumentation
+from pipeline import (
+    DEFAULT_MAX_BATCH_ROWS,
+    DEFAULT_TARGET_COMMIT_SECONDS,
+    AdaptiveBatchSize,
+    reservoir_sample,
+    run_pipeline,
+    sample_parents,
+)
+from text_corpus import DEFAULT_SEED, DEFAULT_UNIQUENESS, FakerText, open_corpus
 
 # Initialize Faker
 faker = Faker()
 
+# Where free-text content comes from: Faker by default, or a cached corpus (see use_text_corpus)
+text_source = FakerText(faker)
+
+# Draw message, review, session and conversation text from a pre-generated corpus
+def use_text_corpus(seed=DEFAULT_SEED, uniqueness=DEFAULT_UNIQUENESS, directory=None):
+    global text_source
+    text_source = open_corpus(faker.locales[0], seed, uniqueness, directory)
+    return text_source
+
+# PostgreSQL connection parameters from environment variables
+def db_connection_params():
+    return dict(
+        dbname=os.environ.get('PGDATABASE'),
+        user=os.environ.get('PGUSER'),
+        password=os.environ.get('PGPASSWORD'),
+        host=os.environ.get('PGHOST'),
+        port=os.environ.get('PGPORT')
+    )
+
 # PostgreSQL connection using environment variables
 def get_db_connection():
     try:
-        conn = psycopg2.connect(
-            dbname=os.environ.get('PGDATABASE'),
-            user=os.environ.get('PGUSER'),
-            password=os.environ.get('PGPASSWORD'),
-            host=os.environ.get('PGHOST'),
-            port=os.environ.get('PGPORT')
-        )
+        conn = psycopg2.connect(**db_connection_params())
         return conn
     except Exception as e:
         print(f"Error connecting to database: {e}")
@@ -58,58 +88,200 @@ class TransactionType:
     ADVISOR_PAYOUT = 'advisor_payout'
     USER_TOPUP = 'user_topup'
 
+# Parent key sets shared by the generators: regular user ids, advisor ids, the advisors
+# sessions can bill (with their chat, audio and video rates; advisors created in the app
+# may have none) and specialty ids (loaded once per process, see id_registry.py)
+id_registry = IdRegistry({
+    'users': ("SELECT id FROM users WHERE user_type = %s ORDER BY id", (UserType.USER,)),
+    'advisors': ("SELECT id FROM users WHERE user_type = %s ORDER BY id", (UserType.ADVISOR,)),
+    'advisor_rates': (
+        """
+        SELECT id, chat_rate, audio_rate, video_rate FROM users
+        WHERE user_type = %s AND chat_rate IS NOT NULL AND audio_rate IS NOT NULL AND video_rate IS NOT NULL
+        ORDER BY id
+        """,
+        (UserType.ADVISOR,)
+    ),
+    'specialties': ("SELECT id FROM specialties ORDER BY id", ()),
+})
+
+# Columns written by each generator (in row tuple order)
+SPECIALTY_COLUMNS = ('name', 'icon', 'category')
+USER_COLUMNS = (
+    'username', 'password', 'name', 'email', 'phone', 'user_type', 'is_advisor', 'bio',
+    'profile_completed', 'account_balance'
+)
+ADVISOR_COLUMNS = (
+    'id', 'username', 'password', 'name', 'email', 'phone', 'user_type', 'is_advisor',
+    'bio', 'specialties', 'profile_completed', 'chat_rate', 'audio_rate', 'video_rate',
+    'rating', 'review_count', 'online', 'earnings_balance', 'total_earnings'
+)
+ADMIN_COLUMNS = (
+    'username', 'password', 'name', 'email', 'phone', 'user_type', 'is_advisor', 'bio',
+    'profile_completed'
+)
+ADVISOR_SPECIALTY_COLUMNS = ('advisor_id', 'specialty_id')
+SESSION_COLUMNS = (
+    'id', 'user_id', 'advisor_id', 'start_time', 'end_time', 'session_type', 'status', 'notes',
+    'rate_per_minute', 'actual_start_time', 'actual_end_time', 'actual_duration',
+    'billed_amount', 'is_paid'
+)
+PAYMENT_COLUMNS = (
+    'type', 'user_id', 'advisor_id', 'session_id', 'amount', 'description', 'timestamp',
+    'payment_status'
+)
+MESSAGE_COLUMNS = ('sender_id', 'receiver_id', 'content', 'timestamp', 'read')
+REVIEW_COLUMNS = (
+    'user_id', 'advisor_id', 'session_id', 'rating', 'content', 'created_at',
+    'response', 'response_date', 'is_hidden'
+)
+CONVERSATION_COLUMNS = ('user_id', 'messages', 'last_updated')
+TOPUP_COLUMNS = (
+    'type', 'user_id', 'amount', 'description', 'timestamp', 'payment_status', 'payment_reference'
+)
+
+# Regular users at scale factor 1; every other count is derived from the user count
+USERS_PER_SCALE_FACTOR = 100
+
+# Messages per user-advisor thread and topups per topped-up user (inclusive ranges)
+MESSAGES_PER_THREAD = (3, 20)
+MEAN_MESSAGES_PER_THREAD = sum(MESSAGES_PER_THREAD) / 2
+TOPUPS_PER_USER = (1, 3)
+
+# Rows per regular user (topups counts the users that top up)
+COUNT_RATIOS = {
+    'advisors': 0.5,
+    'sessions': 2,
+    'messages': 5,
+    'conversations': 0.5,
+    'topups': 0.5,
+}
+
+# Admins do not grow with the scale factor
+ADMIN_COUNT = 2
+
+# Row counts for a scale factor, with per-table overrides
+#
+# Counts derived from the user count follow an overridden user count, so
+# scaled_counts(1, {'users': 5000}) keeps the ratios of scale factor 50 for every
+# table that is not overridden itself. message_threads, the cap on the user-advisor
+# threads messages are spread over, follows the message count: enough threads of mean
+# length to hold it (see message_rows for what a run writes).
+def scaled_counts(scale_factor=1, overrides=None):
+    overrides = dict(overrides or {})
+    unknown = set(overrides) - set(COUNT_RATIOS) - {'users', 'admins', 'message_threads'}
+    if unknown:
+        raise ValueError(f"Unknown count: {', '.join(sorted(unknown))}")
+    if scale_factor <= 0:
+        raise ValueError(f"Scale factor must be positive, got {scale_factor}")
+    
+    users = overrides.pop('users', max(1, round(USERS_PER_SCALE_FACTOR * scale_factor)))
+    counts = {'users': users, 'admins': ADMIN_COUNT}
+    for name, ratio in COUNT_RATIOS.items():
+        counts[name] = max(1, round(users * ratio))
+    counts.update(overrides)
+    counts.setdefault('message_threads', max(1, round(counts['messages'] / MEAN_MESSAGES_PER_THREAD)))
+    return counts
+
+# Threads generate_messages spreads messages over: one per user-advisor pair, capped by
+# the regular users and advisors there are (their counts unless given)
+def message_thread_count(counts, users=None, advisors=None):
+    users = counts['users'] if users is None else users
+    advisors = counts['advisors'] if advisors is None else advisors
+    return min(users, advisors, counts['message_threads'])
+
+# Messages a run writes: counts['messages'] is a ceiling the capped threads reach on
+# average; with minimum, the rows they always hold (every thread at its shortest)
+def message_rows(counts, minimum=False, users=None, advisors=None):
+    per_thread = MESSAGES_PER_THREAD[0] if minimum else MEAN_MESSAGES_PER_THREAD
+    return min(counts['messages'], int(message_thread_count(counts, users, advisors) * per_thread))
+
+# Regular users a per-user stage (conversations, topups) picks: each at most once
+def picked_users(counts, name):
+    return min(counts[name], counts['users'])
+
+# Rows generated by a full run (scale factor 1)
+DEFAULT_COUNTS = scaled_counts(1)
+
+# Generation stages (their dependencies are declared in stages.py)
+STAGE_NAMES = (
+    'specialties', 'users', 'advisors', 'admins', 'sessions', 'messages', 'reviews', 'conversations', 'topups'
+)
+
+# Rows fetched per round-trip when streaming parent rows from server-side cursors
+CURSOR_ITERSIZE = 2000
+
+# Rows per commit for each generator (bulk sinks raise these to their own minimum)
+COMMIT_BATCH_SIZES = {
+    'users': 10,
+    'advisors': 5,
+    'sessions': 20,
+    'messages': 50,
+    'reviews': 20,
+    'conversations': 10,
+    'topups': 10,
+}
+
+# (target seconds per commit, max rows per batch) when commit batches adapt to the
+# measured commit cost (see use_adaptive_batches), None for the fixed sizes above
+adaptive_batches = None
+
+# Let commit batches grow or shrink towards a transaction duration, starting from the
+# fixed sizes
+def use_adaptive_batches(target_seconds=DEFAULT_TARGET_COMMIT_SECONDS, max_rows=DEFAULT_MAX_BATCH_ROWS):
+    global adaptive_batches
+    adaptive_batches = (target_seconds, max_rows)
+
+# Rows to buffer before writing and committing a batch through the sink
+def commit_batch_size(sink, generator):
+    size = max(COMMIT_BATCH_SIZES[generator], sink.min_batch_rows)
+    if adaptive_batches is None:
+        return size
+    target_seconds, max_rows = adaptive_batches
+    # Bulk sinks never go below their own minimum
+    return AdaptiveBatchSize(generator, size, sink.min_batch_rows, max(max_rows, size), target_seconds)
+
+# Specialties offered by advisors
+SPECIALTIES = [
+    {"name": "Tarot Reading", "icon": "tarot", "category": SpecialtyCategory.DIVINATION},
+    {"name": "Palm Reading", "icon": "palm", "category": SpecialtyCategory.DIVINATION},
+    {"name": "Astrology", "icon": "stars", "category": SpecialtyCategory.ASTROLOGY},
+    {"name": "Energy Healing", "icon": "energy", "category": SpecialtyCategory.HEALING},
+    {"name": "Chakra Alignment", "icon": "chakra", "category": SpecialtyCategory.ENERGY_WORK},
+    {"name": "Spirit Communication", "icon": "spirit", "category": SpecialtyCategory.MEDIUM},
+    {"name": "Angel Guidance", "icon": "angel", "category": SpecialtyCategory.SPIRITUAL_GUIDANCE},
+    {"name": "Dream Interpretation", "icon": "dream", "category": SpecialtyCategory.DREAM_INTERPRETATION},
+    {"name": "Past Life Reading", "icon": "pastlife", "category": SpecialtyCategory.PAST_LIVES},
+    {"name": "Numerology", "icon": "numbers", "category": SpecialtyCategory.DIVINATION},
+    {"name": "Crystal Healing", "icon": "crystal", "category": SpecialtyCategory.HEALING},
+    {"name": "Aura Reading", "icon": "aura", "category": SpecialtyCategory.ENERGY_WORK},
+    {"name": "Spiritual Counseling", "icon": "counsel", "category": SpecialtyCategory.SPIRITUAL_GUIDANCE},
+    {"name": "Reiki", "icon": "reiki", "category": SpecialtyCategory.HEALING},
+    {"name": "Channeling", "icon": "channel", "category": SpecialtyCategory.CHANNELING},
+    {"name": "Mediumship", "icon": "medium", "category": SpecialtyCategory.MEDIUM},
+    {"name": "Natal Chart Reading", "icon": "natalchart", "category": SpecialtyCategory.ASTROLOGY},
+    {"name": "Shamanic Healing", "icon": "shamanic", "category": SpecialtyCategory.HEALING},
+    {"name": "Akashic Records", "icon": "akashic", "category": SpecialtyCategory.PAST_LIVES},
+    {"name": "Sound Healing", "icon": "sound", "category": SpecialtyCategory.HEALING}
+]
+
 # Generate specialties for the database
-def generate_specialties(conn):
+def generate_specialties(conn, sink=None):
     print("Generating specialties...")
     
-    specialty_list = [
-        {"name": "Tarot Reading", "icon": "tarot", "category": SpecialtyCategory.DIVINATION},
-        {"name": "Palm Reading", "icon": "palm", "category": SpecialtyCategory.DIVINATION},
-        {"name": "Astrology", "icon": "stars", "category": SpecialtyCategory.ASTROLOGY},
-        {"name": "Energy Healing", "icon": "energy", "category": SpecialtyCategory.HEALING},
-        {"name": "Chakra Alignment", "icon": "chakra", "category": SpecialtyCategory.ENERGY_WORK},
-        {"name": "Spirit Communication", "icon": "spirit", "category": SpecialtyCategory.MEDIUM},
-        {"name": "Angel Guidance", "icon": "angel", "category": SpecialtyCategory.SPIRITUAL_GUIDANCE},
-        {"name": "Dream Interpretation", "icon": "dream", "category": SpecialtyCategory.DREAM_INTERPRETATION},
-        {"name": "Past Life Reading", "icon": "pastlife", "category": SpecialtyCategory.PAST_LIVES},
-        {"name": "Numerology", "icon": "numbers", "category": SpecialtyCategory.DIVINATION},
-        {"name": "Crystal Healing", "icon": "crystal", "category": SpecialtyCategory.HEALING},
-        {"name": "Aura Reading", "icon": "aura", "category": SpecialtyCategory.ENERGY_WORK},
-        {"name": "Spiritual Counseling", "icon": "counsel", "category": SpecialtyCategory.SPIRITUAL_GUIDANCE},
-        {"name": "Reiki", "icon": "reiki", "category": SpecialtyCategory.HEALING},
-        {"name": "Channeling", "icon": "channel", "category": SpecialtyCategory.CHANNELING},
-        {"name": "Mediumship", "icon": "medium", "category": SpecialtyCategory.MEDIUM},
-        {"name": "Natal Chart Reading", "icon": "natalchart", "category": SpecialtyCategory.ASTROLOGY},
-        {"name": "Shamanic Healing", "icon": "shamanic", "category": SpecialtyCategory.HEALING},
-        {"name": "Akashic Records", "icon": "akashic", "category": SpecialtyCategory.PAST_LIVES},
-        {"name": "Sound Healing", "icon": "sound", "category": SpecialtyCategory.HEALING}
-    ]
-
-    cursor = conn.cursor()
+    sink = sink or make_sink(conn)
     try:
-        # Check existing specialties
-        cursor.execute("SELECT name FROM specialties")
-        existing_specialties = {row[0] for row in cursor.fetchall()}
-        
-        # Filter out existing specialties
-        new_specialties = [s for s in specialty_list if s["name"] not in existing_specialties]
-        
-        if new_specialties:
-            values = [(s["name"], s["icon"], s["category"]) for s in new_specialties]
-            execute_values(
-                cursor,
-                "INSERT INTO specialties (name, icon, category) VALUES %s RETURNING id",
-                values
-            )
-            conn.commit()
-            print(f"Created {len(new_specialties)} new specialties.")
+        # Specialties that already exist are skipped by the insert
+        values = [(s["name"], s["icon"], s["category"]) for s in SPECIALTIES]
+        created = sink.write('specialties', SPECIALTY_COLUMNS, values)
+        sink.commit()
+        if created:
+            print(f"Created {created} new specialties, skipped {len(values) - created} existing.")
         else:
             print("No new specialties to create - all already exist.")
     except Exception as e:
-        conn.rollback()
+        sink.rollback()
         print(f"Error generating specialties: {e}")
-    finally:
-        cursor.close()
 
 # Generate a random selection of specialty IDs
 def generate_random_specialties(count=3):
@@ -156,368 +328,339 @@ def generate_random_bio():
     
     return f"{random.choice(intros)} {years} years. I specialize in {random.choice(skills)} and {random.choice(skills)}. {random.choice(promises)}"
 
+# Build the row for the i-th regular user
+def build_user(i):
+    username = f"user{i+1}"
+    name = faker.name()
+    password = f"password{i+1}" # In production, these would be hashed
+    
+    return (
+        username, 
+        password, 
+        name, 
+        faker.email(),
+        faker.phone_number(),
+        UserType.USER,
+        False,
+        "Regular user account",
+        True,
+        random.randint(0, 10000) if random.random() > 0.7 else 0
+    )
+
 # Generate users for the database
-def generate_users(conn, count=100):
+def generate_users(conn, count=100, sink=None):
     print(f"Generating {count} regular users...")
     
-    cursor = conn.cursor()
+    sink = sink or make_sink(conn)
     try:
-        # Check existing users
-        cursor.execute("SELECT username FROM users WHERE user_type = %s", (UserType.USER,))
-        existing_usernames = {row[0] for row in cursor.fetchall()}
-        
-        # Create users that don't exist yet
-        users_created = 0
-        for i in range(count):
-            username = f"user{i+1}"
-            
-            # Skip if user already exists
-            if username in existing_usernames:
-                continue
-                
-            name = faker.name()
-            password = f"password{i+1}" # In production, these would be hashed
-            
-            cursor.execute(
-                """
-                INSERT INTO users (
-                    username, password, name, email, phone, user_type, is_advisor, bio, 
-                    profile_completed, account_balance
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """,
-                (
-                    username, 
-                    password, 
-                    name, 
-                    faker.email(),
-                    faker.phone_number(),
-                    UserType.USER,
-                    False,
-                    "Regular user account",
-                    True,
-                    random.randint(0, 10000) if random.random() > 0.7 else 0
-                )
-            )
-            users_created += 1
-            
-            # Commit in batches to avoid holding transaction too long
-            if users_created % 10 == 0:
-                conn.commit()
+        def build(chunk):
+            return [('users', USER_COLUMNS, [build_user(i) for i in chunk])]
         
-        conn.commit()
-        print(f"Created {users_created} new regular users.")
+        # Commit in batches to avoid holding transaction too long; users whose username
+        # already exists are skipped by the insert
+        skipped = {}
+        written = run_pipeline(range(count), build, sink, commit_batch_size(sink, 'users'), skipped=skipped)
+        if written.get('users'):
+            id_registry.invalidate('users')
+        print(f"Created {written.get('users', 0)} new regular users, skipped {skipped.get('users', 0)} existing.")
     except Exception as e:
-        conn.rollback()
+        sink.rollback()
         print(f"Error generating users: {e}")
-    finally:
-        cursor.close()
+
+# Build the row for the i-th advisor, returning it with the advisor's specialty IDs
+def build_advisor(i, advisor_id):
+    username = f"advisor{i+101}" # Start from 101 to not overlap with users
+    name = faker.name()
+    password = f"password{i+101}" # In production, these would be hashed
+    
+    chat_rate = random.randint(100, 500) # $1-$5 per minute
+    audio_rate = chat_rate + random.randint(50, 150) # A bit more than chat
+    video_rate = audio_rate + random.randint(100, 300) # A bit more than audio
+    
+    rating = random.randint(35, 50) # 3.5 to 5.0 stars (stored as 35 to 50)
+    review_count = random.randint(5, 100)
+    
+    specialties = generate_random_specialties(random.randint(2, 5))
+    
+    advisor_row = (
+        advisor_id,
+        username, 
+        password, 
+        name, 
+        faker.email(),
+        faker.phone_number(),
+        UserType.ADVISOR,
+        True,
+        generate_random_bio(),
+        json.dumps(specialties),
+        True,
+        chat_rate,
+        audio_rate,
+        video_rate,
+        rating,
+        review_count,
+        random.random() > 0.7, # 30% chance of being online
+        random.randint(5000, 50000) if random.random() > 0.7 else 0,
+        random.randint(10000, 100000) if random.random() > 0.5 else 0
+    )
+    return advisor_row, specialties
 
 # Generate advisors for the database
-def generate_advisors(conn, count=50):
+def generate_advisors(conn, count=50, sink=None):
     print(f"Generating {count} advisors...")
     
-    cursor = conn.cursor()
+    sink = sink or make_sink(conn)
     try:
-        # Check existing advisors
-        cursor.execute("SELECT username FROM users WHERE user_type = %s", (UserType.ADVISOR,))
-        existing_usernames = {row[0] for row in cursor.fetchall()}
-        
-        # Create advisors that don't exist yet
-        advisors_created = 0
-        for i in range(count):
-            username = f"advisor{i+101}" # Start from 101 to not overlap with users
-            
-            # Skip if advisor already exists
-            if username in existing_usernames:
-                continue
+        def build(chunk):
+            # Advisor IDs are reserved up front so specialties can reference them
+            advisor_ids = sink.reserve_ids('users', len(chunk))
+            advisor_rows = []
+            specialty_rows = []
+            for i, advisor_id in zip(chunk, advisor_ids):
+                advisor_row, specialties = build_advisor(i, advisor_id)
+                advisor_rows.append(advisor_row)
                 
-            name = faker.name()
-            password = f"password{i+101}" # In production, these would be hashed
-            
-            chat_rate = random.randint(100, 500) # $1-$5 per minute
-            audio_rate = chat_rate + random.randint(50, 150) # A bit more than chat
-            video_rate = audio_rate + random.randint(100, 300) # A bit more than audio
-            
-            rating = random.randint(35, 50) # 3.5 to 5.0 stars (stored as 35 to 50)
-            review_count = random.randint(5, 100)
+                # Advisor specialties
+                for specialty_id in specialties:
+                    specialty_rows.append((advisor_id, specialty_id))
             
-            specialties = generate_random_specialties(random.randint(2, 5))
-            
-            cursor.execute(
-                """
-                INSERT INTO users (
-                    username, password, name, email, phone, user_type, is_advisor, 
-                    bio, specialties, profile_completed, chat_rate, audio_rate, video_rate,
-                    rating, review_count, online, earnings_balance, total_earnings
-                ) VALUES (
-                    %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-                ) RETURNING id
-                """,
-                (
-                    username, 
-                    password, 
-                    name, 
-                    faker.email(),
-                    faker.phone_number(),
-                    UserType.ADVISOR,
-                    True,
-                    generate_random_bio(),
-                    json.dumps(specialties),
-                    True,
-                    chat_rate,
-                    audio_rate,
-                    video_rate,
-                    rating,
-                    review_count,
-                    random.random() > 0.7, # 30% chance of being online
-                    random.randint(5000, 50000) if random.random() > 0.7 else 0,
-                    random.randint(10000, 100000) if random.random() > 0.5 else 0
-                )
-            )
-            advisor_id = cursor.fetchone()[0]
-            
-            # Insert advisor specialties
-            for specialty_id in specialties:
-                try:
-                    cursor.execute(
-                        "INSERT INTO advisor_specialties (advisor_id, specialty_id) VALUES (%s, %s)",
-                        (advisor_id, specialty_id)
-                    )
-                except Exception as e:
-                    # Ignore duplicate advisor-specialty mappings
-                    if "duplicate key" not in str(e):
-                        raise
-            
-            advisors_created += 1
-            
-            # Commit in batches to avoid holding transaction too long
-            if advisors_created % 5 == 0:
-                conn.commit()
+            return [
+                ('users', ADVISOR_COLUMNS, advisor_rows),
+                ('advisor_specialties', ADVISOR_SPECIALTY_COLUMNS, specialty_rows),
+            ]
         
-        conn.commit()
-        print(f"Created {advisors_created} new advisors with their specialties.")
+        # Commit in batches to avoid holding transaction too long; advisors whose username
+        # already exists are skipped by the insert, together with their specialties
+        skipped = {}
+        written = run_pipeline(range(count), build, sink, commit_batch_size(sink, 'advisors'), skipped=skipped)
+        if written.get('users'):
+            id_registry.invalidate('advisors', 'advisor_rates')
+        print(
+            f"Created {written.get('users', 0)} new advisors with their specialties, "
+            f"skipped {skipped.get('users', 0)} existing."
+        )
     except Exception as e:
-        conn.rollback()
+        sink.rollback()
         print(f"Error generating advisors: {e}")
-    finally:
-        cursor.close()
+
+# Build the row for the i-th admin
+def build_admin(i):
+    username = f"admin{i+1}"
+    name = faker.name()
+    password = f"admin{i+1}pass" # In production, these would be hashed
+    
+    return (
+        username, 
+        password, 
+        name, 
+        f"admin{i+1}@angelguides.ai",
+        faker.phone_number(),
+        UserType.ADMIN,
+        False,
+        "Administrator account",
+        True
+    )
 
 # Generate admins for the database
-def generate_admins(conn, count=2):
+def generate_admins(conn, count=2, sink=None):
     print(f"Generating {count} admins...")
     
-    cursor = conn.cursor()
+    sink = sink or make_sink(conn)
     try:
-        # Check existing admins
-        cursor.execute("SELECT username FROM users WHERE user_type = %s", (UserType.ADMIN,))
-        existing_usernames = {row[0] for row in cursor.fetchall()}
-        
-        # Create admins that don't exist yet
-        admins_created = 0
-        for i in range(count):
-            username = f"admin{i+1}"
-            
-            # Skip if admin already exists
-            if username in existing_usernames:
-                continue
-                
-            name = faker.name()
-            password = f"admin{i+1}pass" # In production, these would be hashed
-            
-            cursor.execute(
-                """
-                INSERT INTO users (
-                    username, password, name, email, phone, user_type, is_advisor, bio, profile_completed
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """,
-                (
-                    username, 
-                    password, 
-                    name, 
-                    f"admin{i+1}@angelguides.ai",
-                    faker.phone_number(),
-                    UserType.ADMIN,
-                    False,
-                    "Administrator account",
-                    True
-                )
-            )
-            admins_created += 1
+        def build(chunk):
+            return [('users', ADMIN_COLUMNS, [build_admin(i) for i in chunk])]
         
-        conn.commit()
-        print(f"Created {admins_created} new admins.")
+        # Admins whose username already exists are skipped by the insert
+        skipped = {}
+        written = run_pipeline(range(count), build, sink, max(count, 1), skipped=skipped)
+        print(f"Created {written.get('users', 0)} new admins, skipped {skipped.get('users', 0)} existing.")
     except Exception as e:
-        conn.rollback()
+        sink.rollback()
         print(f"Error generating admins: {e}")
-    finally:
-        cursor.close()
+
+# Build one session row, plus its payment transaction row when the session was paid
+def build_session(session_id, user_id, advisor, now):
+    advisor_id, chat_rate, audio_rate, video_rate = advisor
+    
+    # Random date in the past 30 days
+    days_ago = random.randint(0, 30)
+    start_time = now - timedelta(days=days_ago, hours=random.randint(0, 23))
+    
+    # Random duration between 15 and 90 minutes
+    duration_minutes = random.randint(15, 90)
+    
+    # Random session type
+    session_type = random.choice([SessionType.CHAT, SessionType.AUDIO, SessionType.VIDEO])
+    
+    # Determine rate based on session type
+    if session_type == SessionType.CHAT:
+        rate = chat_rate
+    elif session_type == SessionType.AUDIO:
+        rate = audio_rate
+    else:
+        rate = video_rate
+    
+    status, is_paid = session_outcome(days_ago)
+    notes = text_source.text(200) if random.random() > 0.7 else None
+    return session_rows(
+        session_id, user_id, advisor_id, start_time, duration_minutes, session_type, status, notes, rate, is_paid
+    )
+
+# Status of a session that started days_ago days ago, and whether it was paid
+def session_outcome(days_ago):
+    if days_ago > 7:
+        return "completed", random.random() > 0.3  # 70% chance it's paid
+    elif days_ago > 2:
+        status = random.choice(["completed", "canceled"])
+        return status, status == "completed" and random.random() > 0.5
+    else:
+        return random.choice(["scheduled", "in_progress"]), False
+
+# Session row for a status, plus its payment when a completed session was paid
+def session_rows(session_id, user_id, advisor_id, start_time, duration_minutes, session_type, status, notes, rate,
+                 is_paid):
+    end_time = start_time + timedelta(minutes=duration_minutes)
+    actual_start_time = None
+    actual_end_time = None
+    actual_duration = None
+    billed_amount = None
+    if status == "completed":
+        actual_start_time = start_time
+        actual_end_time = end_time
+        actual_duration = duration_minutes
+        billed_amount = rate * duration_minutes
+    elif status == "in_progress":
+        actual_start_time = start_time
+    else:
+        is_paid = False
+    
+    session_row = (
+        session_id,
+        user_id,
+        advisor_id,
+        start_time,
+        end_time,
+        session_type,
+        status,
+        notes,
+        rate,
+        actual_start_time,
+        actual_end_time,
+        actual_duration,
+        billed_amount,
+        is_paid
+    )
+    
+    # Generate transaction for completed sessions that have been paid
+    transaction_row = None
+    if status == "completed" and billed_amount and is_paid:
+        transaction_row = (
+            TransactionType.SESSION_PAYMENT,
+            user_id,
+            advisor_id,
+            session_id,
+            -billed_amount,  # Negative for user (payment)
+            f"Payment for {session_type} session with advisor #{advisor_id}",
+            actual_end_time,  # Paid when the session ended
+            "completed"
+        )
+    
+    return session_row, transaction_row
 
 # Generate session data
-def generate_sessions(conn, count=200):
+def generate_sessions(conn, count=200, sink=None):
     print(f"Generating {count} sessions...")
     
-    cursor = conn.cursor()
+    sink = sink or make_sink(conn)
     try:
-        # Get all users and advisors
-        cursor.execute("SELECT id FROM users WHERE user_type = %s", (UserType.USER,))
-        user_ids = [row[0] for row in cursor.fetchall()]
-        
-        cursor.execute("SELECT id, chat_rate, audio_rate, video_rate FROM users WHERE user_type = %s", (UserType.ADVISOR,))
-        advisors = [(row[0], row[1], row[2], row[3]) for row in cursor.fetchall()]
+        # Get all users and the advisors with rates
+        user_ids = id_registry.pool(conn, 'users')
+        advisors = id_registry.pool(conn, 'advisor_rates')
         
         if not user_ids or not advisors:
             print("No users or advisors found. Skipping session generation.")
             return
             
         # Generate session data
-        sessions_created = 0
-        transactions_created = 0
         now = datetime.now()
         
-        for i in range(count):
-            user_id = random.choice(user_ids)
-            advisor_id, chat_rate, audio_rate, video_rate = random.choice(advisors)
-            
-            # Random date in the past 30 days
-            days_ago = random.randint(0, 30)
-            start_time = now - timedelta(days=days_ago, hours=random.randint(0, 23))
-            
-            # Random duration between 15 and 90 minutes
-            duration_minutes = random.randint(15, 90)
-            end_time = start_time + timedelta(minutes=duration_minutes)
-            
-            # Random session type
-            session_type = random.choice([SessionType.CHAT, SessionType.AUDIO, SessionType.VIDEO])
-            
-            # Determine rate based on session type
-            if session_type == SessionType.CHAT:
-                rate = chat_rate
-            elif session_type == SessionType.AUDIO:
-                rate = audio_rate
-            else:
-                rate = video_rate
-            
-            # Determine status
-            if days_ago > 7:
-                status = "completed"
-                actual_start_time = start_time
-                actual_end_time = end_time
-                actual_duration = duration_minutes
-                billed_amount = rate * duration_minutes
-                is_paid = random.random() > 0.3  # 70% chance it's paid
-            elif days_ago > 2:
-                status = random.choice(["completed", "canceled"])
-                if status == "completed":
-                    actual_start_time = start_time
-                    actual_end_time = end_time
-                    actual_duration = duration_minutes
-                    billed_amount = rate * duration_minutes
-                    is_paid = random.random() > 0.5
-                else:
-                    actual_start_time = None
-                    actual_end_time = None
-                    actual_duration = None
-                    billed_amount = None
-                    is_paid = False
-            else:
-                status = random.choice(["scheduled", "in_progress"])
-                if status == "in_progress":
-                    actual_start_time = start_time
-                    actual_end_time = None
-                    actual_duration = None
-                    billed_amount = None
-                    is_paid = False
-                else:
-                    actual_start_time = None
-                    actual_end_time = None
-                    actual_duration = None
-                    billed_amount = None
-                    is_paid = False
-            
-            try:
-                cursor.execute(
-                    """
-                    INSERT INTO sessions (
-                        user_id, advisor_id, start_time, end_time, session_type, status, notes,
-                        rate_per_minute, actual_start_time, actual_end_time, actual_duration,
-                        billed_amount, is_paid
-                    ) VALUES (
-                        %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-                    ) RETURNING id
-                    """,
-                    (
-                        user_id,
-                        advisor_id,
-                        start_time,
-                        end_time,
-                        session_type,
-                        status,
-                        faker.text(max_nb_chars=200) if random.random() > 0.7 else None,
-                        rate,
-                        actual_start_time,
-                        actual_end_time,
-                        actual_duration,
-                        billed_amount,
-                        is_paid
-                    )
-                )
-                
-                sessions_created += 1
-                
-                # Generate transaction for completed sessions that have been paid
-                if status == "completed" and billed_amount and is_paid:
-                    session_id = cursor.fetchone()[0]
-                    cursor.execute(
-                        """
-                        INSERT INTO transactions (
-                            type, user_id, advisor_id, session_id, amount, description, payment_status
-                        ) VALUES (
-                            %s, %s, %s, %s, %s, %s, %s
-                        )
-                        """,
-                        (
-                            TransactionType.SESSION_PAYMENT,
-                            user_id,
-                            advisor_id,
-                            session_id,
-                            -billed_amount,  # Negative for user (payment)
-                            f"Payment for {session_type} session with advisor #{advisor_id}",
-                            "completed"
-                        )
-                    )
-                    transactions_created += 1
-                
-                # Commit in batches to avoid long transaction
-                if sessions_created % 20 == 0:
-                    conn.commit()
-                    
-            except Exception as e:
-                # Continue with the next session if this one fails
-                if "duplicate key" in str(e):
-                    continue
-                else:
-                    raise
+        def build(chunk):
+            # Session IDs are reserved up front so payments can reference them
+            session_ids = sink.reserve_ids('sessions', len(chunk))
+            session_rows = []
+            transaction_rows = []
+            for session_id, (user_id, advisor) in zip(session_ids, chunk):
+                session_row, transaction_row = build_session(session_id, user_id, advisor, now)
+                session_rows.append(session_row)
+                if transaction_row:
+                    transaction_rows.append(transaction_row)
+            return [
+                ('sessions', SESSION_COLUMNS, session_rows),
+                ('transactions', PAYMENT_COLUMNS, transaction_rows),
+            ]
         
-        conn.commit()
-        print(f"Created {sessions_created} sessions with {transactions_created} related transactions.")
+        # Commit in batches to avoid long transaction
+        parents = sample_parents((user_ids, advisors), count)
+        written = run_pipeline(parents, build, sink, commit_batch_size(sink, 'sessions'))
+        print(f"Created {written.get('sessions', 0)} sessions with {written.get('transactions', 0)} related transactions.")
     except Exception as e:
-        conn.rollback()
+        sink.rollback()
         print(f"Error generating sessions: {e}")
-    finally:
-        cursor.close()
 
-# Generate messages between users and advisors
-def generate_messages(conn, count=500):
+# Yield (sender, receiver, turn) for each message, thread by thread, until count messages
+# (or until pair_count threads have been started; None keeps adding threads)
+def message_threads(user_ids, advisor_ids, count, pair_count=None, rng=random):
+    planned = 0
+    pairs = range(pair_count) if pair_count is not None else repeat(None)
+    for _ in pairs:
+        user_id = rng.choice(user_ids)
+        advisor_id = rng.choice(advisor_ids)
+        
+        # Random number of messages in this thread
+        thread_count = min(rng.randint(*MESSAGES_PER_THREAD), count - planned)
+        if thread_count <= 0:
+            return
+        planned += thread_count
+        
+        for i in range(thread_count):
+            # Alternate between user and advisor
+            if i % 2 == 0:
+                yield user_id, advisor_id, i
+            else:
+                yield advisor_id, user_id, i
+
+# Build the row for the i-th message of a thread
+def build_message(sender_id, receiver_id, i, now):
+    # User messages are shorter than advisor responses
+    content = text_source.text(100 if i % 2 == 0 else 150)
+    
+    # Random timestamp in the past week
+    message_time = now - timedelta(
+        days=random.randint(0, 7),
+        hours=random.randint(0, 23),
+        minutes=random.randint(0, 59)
+    )
+    
+    # Messages from longer ago are more likely to be read
+    read = True if message_time < (now - timedelta(days=1)) else random.random() > 0.5
+    
+    return (
+        sender_id,
+        receiver_id,
+        content,
+        message_time,
+        read
+    )
+
+# Generate messages between users and advisors, over at most pair_count threads
+def generate_messages(conn, count=500, sink=None, pair_count=30):
     print(f"Generating {count} messages...")
     
-    cursor = conn.cursor()
+    sink = sink or make_sink(conn)
     try:
         # Get all users and advisors
-        cursor.execute("SELECT id FROM users WHERE user_type = %s", (UserType.USER,))
-        user_ids = [row[0] for row in cursor.fetchall()]
-        
-        cursor.execute("SELECT id FROM users WHERE user_type = %s", (UserType.ADVISOR,))
-        advisor_ids = [row[0] for row in cursor.fetchall()]
+        user_ids = id_registry.pool(conn, 'users').ids
+        advisor_ids = id_registry.pool(conn, 'advisors').ids
         
         if not user_ids or not advisor_ids:
             print("No users or advisors found. Skipping message generation.")
@@ -526,290 +669,404 @@ def generate_messages(conn, count=500):
         # Generate message pairs (user to advisor and responses)
         now = datetime.now()
         
-        # Create user-advisor pairs for messaging
-        pairs = []
-        for _ in range(min(len(user_ids), len(advisor_ids), 30)):
-            user_id = random.choice(user_ids)
-            advisor_id = random.choice(advisor_ids)
-            pairs.append((user_id, advisor_id))
-        
-        # Insert messages
-        messages_created = 0
-        
-        for user_id, advisor_id in pairs:
-            # Random number of messages in this thread
-            thread_count = min(random.randint(3, 20), count - messages_created)
-            if thread_count <= 0:
-                break
-                
-            for i in range(thread_count):
-                # Alternate between user and advisor
-                if i % 2 == 0:
-                    sender_id = user_id
-                    receiver_id = advisor_id
-                    content = faker.text(max_nb_chars=100)
-                else:
-                    sender_id = advisor_id
-                    receiver_id = user_id
-                    content = faker.text(max_nb_chars=150)
-                
-                # Random timestamp in the past week
-                message_time = now - timedelta(
-                    days=random.randint(0, 7),
-                    hours=random.randint(0, 23),
-                    minutes=random.randint(0, 59)
-                )
-                
-                # Messages from longer ago are more likely to be read
-                read = True if message_time < (now - timedelta(days=1)) else random.random() > 0.5
-                
-                try:
-                    cursor.execute(
-                        """
-                        INSERT INTO messages (
-                            sender_id, receiver_id, content, timestamp, read
-                        ) VALUES (
-                            %s, %s, %s, %s, %s
-                        )
-                        """,
-                        (
-                            sender_id,
-                            receiver_id,
-                            content,
-                            message_time,
-                            read
-                        )
-                    )
-                    messages_created += 1
-                    
-                    # Commit in batches
-                    if messages_created % 50 == 0:
-                        conn.commit()
-                        
-                except Exception as e:
-                    # Just continue if this message fails
-                    if "duplicate key" in str(e):
-                        continue
-                    else:
-                        raise
+        def build(chunk):
+            rows = [build_message(sender_id, receiver_id, i, now) for sender_id, receiver_id, i in chunk]
+            return [('messages', MESSAGE_COLUMNS, rows)]
         
-        conn.commit()
-        print(f"Created {messages_created} messages.")
+        # Insert messages, committing in batches
+        # User-advisor pairs for messaging
+        pair_count = min(len(user_ids), len(advisor_ids), pair_count)
+        threads = message_threads(user_ids, advisor_ids, count, pair_count)
+        written = run_pipeline(threads, build, sink, commit_batch_size(sink, 'messages'))
+        print(f"Created {written.get('messages', 0)} messages.")
     except Exception as e:
-        conn.rollback()
+        sink.rollback()
         print(f"Error generating messages: {e}")
+
+# Stream the rows of a query through a named server-side cursor, itersize rows per fetch
+#
+# The cursor is declared WITH HOLD so that it survives the commits the generators make
+# while its rows are consumed. Postgres keeps the rows not yet fetched on the server,
+# so the client never holds more than itersize of them.
+def stream_rows(conn, name, query, params=None, itersize=CURSOR_ITERSIZE):
+    cursor = conn.cursor(name, withhold=True)
+    cursor.itersize = itersize
+    try:
+        cursor.execute(query, params)
+        for row in cursor:
+            yield row
     finally:
-        cursor.close()
+        # The cursor is already gone if the transaction that declared it was rolled back,
+        # and nothing can be closed inside a failed transaction
+        if not conn.closed and conn.info.transaction_status != TRANSACTION_STATUS_INERROR:
+            check = conn.cursor()
+            try:
+                check.execute("SELECT 1 FROM pg_cursors WHERE name = %s", (name,))
+                if check.fetchone():
+                    cursor.close()
+            finally:
+                check.close()
+
+# Stream completed sessions that have no review yet, in id order
+# (optionally only sessions with min_id <= id <= max_id)
+def unreviewed_sessions(conn, itersize=CURSOR_ITERSIZE, min_id=1, max_id=None):
+    return stream_rows(
+        conn,
+        'unreviewed_sessions',
+        """
+        SELECT s.id, s.user_id, s.advisor_id
+        FROM sessions s
+        WHERE s.status = %s AND s.id >= %s AND (%s IS NULL OR s.id <= %s)
+        AND NOT EXISTS (SELECT 1 FROM reviews r WHERE r.session_id = s.id)
+        ORDER BY s.id
+        """,
+        ("completed", min_id, max_id, max_id),
+        itersize
+    )
+
+# Build the review row for a completed session
+def build_review(session_id, user_id, advisor_id, now):
+    # Rating between 3-5 stars, weighted toward higher ratings
+    rating = random.choices([3, 4, 5], weights=[1, 3, 6])[0]
+    
+    # Content more likely for higher ratings
+    has_content = random.random() > (0.6 - (rating * 0.1))
+    content = text_source.paragraph() if has_content else None
+    
+    # Reviews from longer ago are more likely to have advisor responses
+    has_response = random.random() > 0.6
+    response = text_source.paragraph() if has_response else None
+    response_date = now - timedelta(days=random.randint(0, 10)) if has_response else None
+    
+    return (
+        user_id,
+        advisor_id,
+        session_id,
+        rating,
+        content,
+        now - timedelta(days=random.randint(0, 30)),
+        response,
+        response_date,
+        random.random() < 0.05  # 5% chance of being hidden
+    )
 
 # Generate reviews for completed sessions
-def generate_reviews(conn):
+def generate_reviews(conn, sink=None, rating_summary=False, itersize=CURSOR_ITERSIZE):
     print("Generating reviews for completed sessions...")
     
+    sink = sink or make_sink(conn)
     cursor = conn.cursor()
     try:
-        # Get all completed sessions
-        cursor.execute(
-            "SELECT id, user_id, advisor_id FROM sessions WHERE status = %s",
-            ("completed",)
-        )
-        sessions = cursor.fetchall()
+        now = datetime.now()
+        deltas = {}
         
-        if not sessions:
-            print("No completed sessions found. Skipping review generation.")
-            return
-            
-        # Check for existing reviews to avoid duplicates
-        cursor.execute("SELECT session_id FROM reviews")
-        existing_session_reviews = {row[0] for row in cursor.fetchall()}
-        
-        # Generate reviews for some of the sessions
-        reviews_count = 0
-        for session_id, user_id, advisor_id in sessions:
-            # Skip if session already has a review
-            if session_id in existing_session_reviews:
-                continue
-                
-            # 70% chance of having a review
-            if random.random() > 0.3:
-                try:
-                    # Rating between 3-5 stars, weighted toward higher ratings
-                    rating = random.choices([3, 4, 5], weights=[1, 3, 6])[0]
-                    
-                    # Content more likely for higher ratings
-                    has_content = random.random() > (0.6 - (rating * 0.1))
-                    content = faker.paragraph() if has_content else None
-                    
-                    # Reviews from longer ago are more likely to have advisor responses
-                    has_response = random.random() > 0.6
-                    response = faker.paragraph() if has_response else None
-                    response_date = datetime.now() - timedelta(days=random.randint(0, 10)) if has_response else None
-                    
-                    cursor.execute(
-                        """
-                        INSERT INTO reviews (
-                            user_id, advisor_id, session_id, rating, content, created_at,
-                            response, response_date, is_hidden
-                        ) VALUES (
-                            %s, %s, %s, %s, %s, %s, %s, %s, %s
-                        )
-                        """,
-                        (
-                            user_id,
-                            advisor_id,
-                            session_id,
-                            rating,
-                            content,
-                            datetime.now() - timedelta(days=random.randint(0, 30)),
-                            response,
-                            response_date,
-                            random.random() < 0.05  # 5% chance of being hidden
-                        )
-                    )
-                    reviews_count += 1
-                    
-                    # Commit in batches
-                    if reviews_count % 20 == 0:
-                        conn.commit()
-                        
-                except Exception as e:
-                    # Continue with next review if this one fails
-                    if "duplicate key" in str(e):
-                        continue
-                    else:
-                        raise
+        def build(chunk):
+            rows = []
+            for session in chunk:
+                # 70% chance of having a review
+                if random.random() > 0.3:
+                    rows.append(build_review(*session, now))
+            return [('reviews', REVIEW_COLUMNS, rows)]
         
-        conn.commit()
+        # Keep per-advisor deltas so only the advisors reviewed here are updated
+        def collect_deltas(writes):
+            for _, _, rows, _ in writes:
+                add_rating_deltas(deltas, rows)
+        
+        # Generate reviews for some of the completed sessions that don't have one yet,
+        # committing in batches
+        sessions = unreviewed_sessions(conn, itersize)
+        written = run_pipeline(sessions, build, sink, commit_batch_size(sink, 'reviews'), collect_deltas)
+        reviews_count = written.get('reviews', 0)
         
         if reviews_count > 0:
-            # Update advisor ratings based on reviews
-            try:
-                cursor.execute(
-                    """
-                    UPDATE users u
-                    SET 
-                        rating = subquery.avg_rating,
-                        review_count = subquery.review_count
-                    FROM (
-                        SELECT 
-                            advisor_id, 
-                            COUNT(*) as review_count,
-                            CAST(AVG(rating) * 10 AS INTEGER) as avg_rating
-                        FROM reviews
-                        GROUP BY advisor_id
-                    ) as subquery
-                    WHERE u.id = subquery.advisor_id
-                    """
-                )
-                conn.commit()
-            except Exception as e:
-                print(f"Warning: Failed to update advisor ratings: {e}")
-                # Continue anyway
+            update_advisor_ratings(conn, deltas, rating_summary)
                 
         print(f"Created {reviews_count} reviews and updated advisor ratings.")
     except Exception as e:
-        conn.rollback()
+        sink.rollback()
         print(f"Error generating reviews: {e}")
     finally:
         cursor.close()
 
+# Build an Angela AI conversation row for a user
+def build_conversation(user_id, now):
+    # Generate a conversation with 3-10 messages
+    message_count = random.randint(3, 10)
+    messages = []
+    
+    for i in range(message_count):
+        if i % 2 == 0:
+            role = "user"
+            content = text_source.sentence()
+        else:
+            role = "assistant"
+            content = text_source.paragraph()
+        
+        # Add timestamp to each message
+        timestamp = now - timedelta(
+            days=random.randint(0, 14),
+            hours=random.randint(0, 23),
+            minutes=random.randint(0, 59)
+        )
+        
+        messages.append({
+            "role": role,
+            "content": content,
+            "timestamp": timestamp.isoformat()
+        })
+    
+    # Sort messages by timestamp
+    messages.sort(key=lambda x: x["timestamp"])
+    
+    return (
+        user_id,
+        json.dumps(messages),
+        now - timedelta(days=random.randint(0, 14))
+    )
+
+# Positions of the advisor and rating in review rows
+REVIEW_ADVISOR = REVIEW_COLUMNS.index('advisor_id')
+REVIEW_RATING = REVIEW_COLUMNS.index('rating')
+
+# Optional table with exact per-advisor review counts and rating sums, for the app to
+# read and for incremental rating updates
+RATING_SUMMARY_TABLE = 'advisor_rating_summary'
+
+# Add review rows to per-advisor [review count, rating sum] deltas
+def add_rating_deltas(deltas, rows):
+    for row in rows:
+        delta = deltas.setdefault(row[REVIEW_ADVISOR], [0, 0])
+        delta[0] += 1
+        delta[1] += row[REVIEW_RATING]
+
+def rating_summary_exists(cursor):
+    cursor.execute("SELECT to_regclass(%s)", (RATING_SUMMARY_TABLE,))
+    return cursor.fetchone()[0] is not None
+
+# Create the rating summary table
+def create_rating_summary(cursor):
+    cursor.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {RATING_SUMMARY_TABLE} (
+            advisor_id INTEGER PRIMARY KEY,
+            review_count INTEGER NOT NULL,
+            rating_sum BIGINT NOT NULL,
+            rating INTEGER NOT NULL,
+            updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+        )
+        """
+    )
+
+# Rebuild the rating summary from the full reviews table
+def refresh_rating_summary(cursor):
+    cursor.execute(f"TRUNCATE {RATING_SUMMARY_TABLE}")
+    cursor.execute(
+        f"""
+        INSERT INTO {RATING_SUMMARY_TABLE} (advisor_id, review_count, rating_sum, rating)
+        SELECT advisor_id, COUNT(*), SUM(rating), CAST(AVG(rating) * 10 AS INTEGER)
+        FROM reviews
+        GROUP BY advisor_id
+        """
+    )
+
+# Update advisor ratings based on reviews
+#
+# Without deltas every advisor is recomputed from a full scan of reviews. With deltas
+# ({advisor_id: [review count, rating sum]} for reviews just inserted) only those
+# advisors are updated: from the summary table, where the deltas are added to the
+# exact counts and sums, otherwise by aggregating just their reviews. rating_summary
+# creates the summary table; once it exists it is always kept up to date.
+def update_advisor_ratings(conn, deltas=None, rating_summary=False):
+    cursor = conn.cursor()
+    try:
+        started = time.perf_counter()
+        if rating_summary_exists(cursor):
+            rating_summary = True
+        elif rating_summary:
+            # A new summary has to be built from every review once
+            print(f"Building {RATING_SUMMARY_TABLE} from all reviews...")
+            create_rating_summary(cursor)
+            deltas = None
+        
+        if deltas is None:
+            cursor.execute(
+                """
+                UPDATE users u
+                SET 
+                    rating = subquery.avg_rating,
+                    review_count = subquery.review_count
+                FROM (
+                    SELECT 
+                        advisor_id, 
+                        COUNT(*) as review_count,
+                        CAST(AVG(rating) * 10 AS INTEGER) as avg_rating
+                    FROM reviews
+                    GROUP BY advisor_id
+                ) as subquery
+                WHERE u.id = subquery.advisor_id
+                """
+            )
+            updated = cursor.rowcount
+            if rating_summary:
+                refresh_rating_summary(cursor)
+            scope = "all advisors (full scan)"
+        elif rating_summary:
+            values = sorted((advisor_id, count, total) for advisor_id, (count, total) in deltas.items())
+            execute_values(
+                cursor,
+                f"""
+                INSERT INTO {RATING_SUMMARY_TABLE} AS s (advisor_id, review_count, rating_sum, rating)
+                SELECT v.advisor_id, v.review_count, v.rating_sum, CAST(v.rating_sum * 10.0 / v.review_count AS INTEGER)
+                FROM (VALUES %s) AS v(advisor_id, review_count, rating_sum)
+                ON CONFLICT (advisor_id) DO UPDATE SET
+                    review_count = s.review_count + EXCLUDED.review_count,
+                    rating_sum = s.rating_sum + EXCLUDED.rating_sum,
+                    rating = CAST((s.rating_sum + EXCLUDED.rating_sum) * 10.0
+                                  / (s.review_count + EXCLUDED.review_count) AS INTEGER),
+                    updated_at = NOW()
+                """,
+                values,
+                page_size=len(values)
+            )
+            cursor.execute(
+                f"""
+                UPDATE users u
+                SET rating = s.rating, review_count = s.review_count
+                FROM {RATING_SUMMARY_TABLE} s
+                WHERE u.id = s.advisor_id AND s.advisor_id = ANY(%s)
+                """,
+                (sorted(deltas),)
+            )
+            updated = cursor.rowcount
+            scope = f"{len(deltas)} advisors (summary deltas)"
+        else:
+            cursor.execute(
+                """
+                UPDATE users u
+                SET 
+                    rating = subquery.avg_rating,
+                    review_count = subquery.review_count
+                FROM (
+                    SELECT 
+                        advisor_id, 
+                        COUNT(*) as review_count,
+                        CAST(AVG(rating) * 10 AS INTEGER) as avg_rating
+                    FROM reviews
+                    WHERE advisor_id = ANY(%s)
+                    GROUP BY advisor_id
+                ) as subquery
+                WHERE u.id = subquery.advisor_id
+                """,
+                (sorted(deltas),)
+            )
+            updated = cursor.rowcount
+            scope = f"{len(deltas)} advisors (reviewed advisors only)"
+        conn.commit()
+        print(f"Updated ratings of {updated} advisors in {(time.perf_counter() - started) * 1000:.0f} ms, {scope}.")
+    except Exception as e:
+        conn.rollback()
+        print(f"Warning: Failed to update advisor ratings: {e}")
+        # Continue anyway
+    finally:
+        cursor.close()
+
+# Stream the IDs of regular users that have no Angela AI conversation yet, in id order
+def users_without_conversations(conn, itersize=CURSOR_ITERSIZE):
+    rows = stream_rows(
+        conn,
+        'users_without_conversations',
+        """
+        SELECT u.id
+        FROM users u
+        WHERE u.user_type = %s
+        AND NOT EXISTS (SELECT 1 FROM conversations c WHERE c.user_id = u.id)
+        ORDER BY u.id
+        """,
+        (UserType.USER,),
+        itersize
+    )
+    return (row[0] for row in rows)
+
 # Generate AI conversations with Angela
-def generate_conversations(conn, count=50):
+def generate_conversations(conn, count=50, sink=None, itersize=CURSOR_ITERSIZE):
     print(f"Generating {count} Angela AI conversations...")
     
+    sink = sink or make_sink(conn)
     cursor = conn.cursor()
     try:
-        # Get user IDs
-        cursor.execute("SELECT id FROM users WHERE user_type = %s", (UserType.USER,))
-        user_ids = [row[0] for row in cursor.fetchall()]
+        # Sample some users without a conversation yet, as their IDs stream in
+        selected_users = reservoir_sample(users_without_conversations(conn, itersize), count)
         
-        if not user_ids:
-            print("No users found. Skipping Angela AI conversation generation.")
+        if not selected_users:
+            print("No users without a conversation found. Skipping Angela AI conversation generation.")
             return
-            
-        # Check existing conversations to avoid duplicates
-        cursor.execute("SELECT user_id FROM conversations")
-        existing_user_convos = {row[0] for row in cursor.fetchall()}
         
-        # Sample some users for conversations
-        available_users = [uid for uid in user_ids if uid not in existing_user_convos]
-        selected_users = random.sample(available_users, min(count, len(available_users)))
+        now = datetime.now()
         
-        conversations_created = 0
-        for user_id in selected_users:
-            try:
-                # Generate a conversation with 3-10 messages
-                message_count = random.randint(3, 10)
-                messages = []
-                
-                for i in range(message_count):
-                    if i % 2 == 0:
-                        role = "user"
-                        content = faker.sentence()
-                    else:
-                        role = "assistant"
-                        content = faker.paragraph()
-                    
-                    # Add timestamp to each message
-                    timestamp = datetime.now() - timedelta(
-                        days=random.randint(0, 14),
-                        hours=random.randint(0, 23),
-                        minutes=random.randint(0, 59)
-                    )
-                    
-                    messages.append({
-                        "role": role,
-                        "content": content,
-                        "timestamp": timestamp.isoformat()
-                    })
-                
-                # Sort messages by timestamp
-                messages.sort(key=lambda x: x["timestamp"])
-                
-                cursor.execute(
-                    """
-                    INSERT INTO conversations (
-                        user_id, messages, last_updated
-                    ) VALUES (
-                        %s, %s, %s
-                    )
-                    """,
-                    (
-                        user_id,
-                        json.dumps(messages),
-                        datetime.now() - timedelta(days=random.randint(0, 14))
-                    )
-                )
-                
-                conversations_created += 1
-                
-                # Commit in batches
-                if conversations_created % 10 == 0:
-                    conn.commit()
-                    
-            except Exception as e:
-                # Skip this conversation if it fails
-                if "duplicate key" in str(e):
-                    continue
-                else:
-                    raise
+        def build(chunk):
+            rows = [build_conversation(user_id, now) for user_id in chunk]
+            return [('conversations', CONVERSATION_COLUMNS, rows)]
         
-        conn.commit()
-        print(f"Created {conversations_created} Angela AI conversations.")
+        # Commit in batches
+        written = run_pipeline(selected_users, build, sink, commit_batch_size(sink, 'conversations'))
+        print(f"Created {written.get('conversations', 0)} Angela AI conversations.")
     except Exception as e:
-        conn.rollback()
+        sink.rollback()
         print(f"Error generating conversations: {e}")
     finally:
         cursor.close()
 
+# Build a topup transaction row for a user
+def build_topup(user_id, now):
+    # Random topup amount between $10 and $200
+    amount = random.randint(1000, 20000)  # In cents
+    
+    # Random date in the past 60 days
+    topup_date = now - timedelta(days=random.randint(0, 60))
+    
+    # Generate unique reference
+    payment_reference = f"top_{faker.uuid4()}"
+    
+    return (
+        TransactionType.USER_TOPUP,
+        user_id,
+        amount,
+        "Account balance topup",
+        topup_date,
+        "completed",
+        payment_reference
+    )
+
+# Add per-user amounts to account balances with one UPDATE
+#
+# The amounts are applied as increments, so balance changes made concurrently by the
+# application are kept, and rows are listed in id order so that concurrent batches lock
+# users in the same order.
+def add_to_balances(cursor, totals):
+    if not totals:
+        return
+    execute_values(
+        cursor,
+        """
+        UPDATE users u
+        SET account_balance = u.account_balance + v.amount
+        FROM (VALUES %s) AS v(id, amount)
+        WHERE u.id = v.id
+        """,
+        sorted(totals.items()),
+        page_size=len(totals)
+    )
+
 # Generate topup transactions
-def generate_topups(conn, count=50):
+def generate_topups(conn, count=50, sink=None, now=None):
     print(f"Generating {count} topup transactions...")
     
+    sink = sink or make_sink(conn)
     cursor = conn.cursor()
     try:
         # Get user IDs
-        cursor.execute("SELECT id FROM users WHERE user_type = %s", (UserType.USER,))
-        user_ids = [row[0] for row in cursor.fetchall()]
+        user_ids = id_registry.pool(conn, 'users').ids
         
         if not user_ids:
             print("No users found. Skipping topup generation.")
@@ -818,102 +1075,349 @@ def generate_topups(conn, count=50):
         # Sample some users for topups
         selected_users = random.sample(user_ids, min(count, len(user_ids)))
         
-        topups_created = 0
-        users_with_topups = 0
+        now = now or datetime.now()
         
-        for user_id in selected_users:
-            user_topups = 0
-            # Generate 1-3 topups per user
-            topup_count = random.randint(1, 3)
-            
-            for _ in range(topup_count):
-                try:
-                    # Random topup amount between $10 and $200
-                    amount = random.randint(1000, 20000)  # In cents
-                    
-                    # Random date in the past 60 days
-                    topup_date = datetime.now() - timedelta(days=random.randint(0, 60))
-                    
-                    # Generate unique reference
-                    payment_reference = f"top_{faker.uuid4()}"
-                    
-                    cursor.execute(
-                        """
-                        INSERT INTO transactions (
-                            type, user_id, amount, description, timestamp, payment_status, payment_reference
-                        ) VALUES (
-                            %s, %s, %s, %s, %s, %s, %s
-                        )
-                        """,
-                        (
-                            TransactionType.USER_TOPUP,
-                            user_id,
-                            amount,
-                            "Account balance topup",
-                            topup_date,
-                            "completed",
-                            payment_reference
-                        )
-                    )
-                    
-                    topups_created += 1
-                    user_topups += 1
-                    
-                    # Also update user account balance
-                    cursor.execute(
-                        """
-                        UPDATE users
-                        SET account_balance = account_balance + %s
-                        WHERE id = %s
-                        """,
-                        (amount, user_id)
-                    )
-                    
-                    # Commit in batches
-                    if topups_created % 10 == 0:
-                        conn.commit()
-                        
-                except Exception as e:
-                    # Skip this topup if it fails
-                    if "duplicate key" in str(e):
-                        continue
-                    else:
-                        raise
-            
-            if user_topups > 0:
-                users_with_topups += 1
+        # Generate 1-3 topups per user (drawn up front so rows don't depend on the batch size)
+        topup_counts = [random.randint(*TOPUPS_PER_USER) for _ in selected_users]
+        topup_users = (user_id for user_id, n in zip(selected_users, topup_counts) for _ in range(n))
         
-        conn.commit()
-        print(f"Created {topups_created} topup transactions for {users_with_topups} users.")
+        def build(chunk):
+            return [('transactions', TOPUP_COLUMNS, [build_topup(user_id, now) for user_id in chunk])]
+        
+        # Also add each batch's topups to the user account balances before it commits
+        def update_balances(writes):
+            totals = {}
+            for _, _, rows, _ in writes:
+                for row in rows:
+                    totals[row[1]] = totals.get(row[1], 0) + row[2]
+            add_to_balances(cursor, totals)
+        
+        # Commit in batches
+        written = run_pipeline(topup_users, build, sink, commit_batch_size(sink, 'topups'), update_balances)
+        print(f"Created {written.get('transactions', 0)} topup transactions for {len(selected_users)} users.")
     except Exception as e:
-        conn.rollback()
+        sink.rollback()
         print(f"Error generating topups: {e}")
     finally:
         cursor.close()
 
 # Main function to generate all data
-def generate_all_data():
+def generate_all_data(load_mode=LoadMode.INSERT, workers=0, seed=None, reference_time=None,
+                      output_dir=None, file_format=FileFormat.CSV, vectorized=False,
+                      text_uniqueness=None, server_side=False, rating_summary=False,
+                      itersize=CURSOR_ITERSIZE, concurrency=0, targets=None, skip_complete=False,
+                      metrics=None, profile=None, profile_dir=DEFAULT_PROFILE_DIR, counts=None,
+                      journal_name=None, append_hours=None, batch_target=None,
+                      max_batch_rows=DEFAULT_MAX_BATCH_ROWS, defer_indexes=False, maintenance_work_mem=None,
+                      staging_load=False, plan=False, query_benchmark=None):
+    counts = counts or DEFAULT_COUNTS
+    if staging_load and (append_hours or journal_name):
+        raise ValueError("A staging load builds a complete dataset; it cannot append or resume a journaled run")
+    if batch_target:
+        use_adaptive_batches(batch_target, max_batch_rows)
+    if text_uniqueness is not None:
+        # The corpus is keyed by the seed, so unseeded runs share the default corpus
+        use_text_corpus(DEFAULT_SEED if seed is None else seed, text_uniqueness)
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    now = reference_time or datetime.now()
+    
+    if plan:
+        # Estimate rows, size and runtime from a local trial batch instead of generating
+        from planner import print_plan
+        print_plan(counts, load_mode, workers, seed, now)
+        return
+    
+    if output_dir:
+        # Offline generation to files, no database connection needed
+        from offline import generate_offline
+        print(f"Starting offline data generation (seed {seed}, reference time {now.isoformat()})...")
+        generate_offline(output_dir, file_format, counts, seed, now)
+        print("Data generation complete!")
+        return
+    
+    if metrics or profile:
+        # Stage and commit timings as JSON lines, optionally one profile per stage
+        configure_instrumentation(metrics, profile, profile_dir)
+    
     try:
         conn = get_db_connection()
+        sink = make_sink(conn, load_mode)
+        
+        print(f"Starting data generation ({load_mode}): {counts}")
         
-        print("Starting data generation...")
+        staging = nullcontext()
+        if staging_load:
+            # Rows go to UNLOGGED shadow tables that replace the live ones once complete
+            from staging_swap import staged_dataset
+            expected = {
+                'users': counts['users'] + counts['advisors'] + counts['admins'],
+                'sessions': counts['sessions'],
+                # Threads end at random lengths, so only their shortest total is certain
+                'messages': message_rows(counts, minimum=True),
+            }
+            staging = staged_dataset(conn, expected)
         
-        # Generate all the data types
-        generate_specialties(conn)
-        generate_users(conn, 100)
-        generate_advisors(conn, 50)
-        generate_admins(conn, 2)
-        generate_sessions(conn, 200)
-        generate_messages(conn, 500)
-        generate_reviews(conn)
-        generate_conversations(conn, 50)
-        generate_topups(conn, 50)
+        deferral = nullcontext()
+        if defer_indexes:
+            # Secondary indexes and foreign keys are rebuilt once all rows are in
+            from index_deferral import DEFAULT_MAINTENANCE_WORK_MEM, deferred_schema
+            deferral = deferred_schema(conn, maintenance_work_mem=maintenance_work_mem or DEFAULT_MAINTENANCE_WORK_MEM)
+        
+        with staging, deferral:
+            if append_hours:
+                # Only the activity of a recent window, on top of the existing data
+                from incremental import append_activity
+                append_activity(conn, append_hours, counts, sink, now, rating_summary)
+            elif journal_name:
+                # Resumable sharded generation; a resumed run keeps the settings it started with
+                from journal import Journal
+                from parallel import generate_all_data_parallel
+                journal = Journal(conn, journal_name)
+                settings = journal.start(dict(seed=seed, now=now, counts=counts))
+                if settings is None:
+                    print(f"Run {journal_name} has already finished.")
+                else:
+                    seed, now, counts = settings['seed'], settings['now'], settings['counts']
+                    workers = workers or 1
+                    print(f"Run {journal_name}: {workers} worker(s), seed {seed}, reference time {now.isoformat()}")
+                    generate_all_data_parallel(conn, load_mode, workers, seed, now, counts, journal)
+            elif workers:
+                # Sharded generation across worker processes
+                from parallel import generate_all_data_parallel
+                print(f"Using {workers} worker(s), seed {seed}, reference time {now.isoformat()}")
+                generate_all_data_parallel(conn, load_mode, workers, seed, now, counts)
+            elif concurrency or targets or skip_complete:
+                # Stages run from the dependency graph, independent ones at the same time on
+                # pooled connections
+                from async_runner import run_targets
+                from stages import STAGES
+                options = dict(
+                    now=now, vectorized=vectorized, server_side=server_side,
+                    rating_summary=rating_summary, itersize=itersize
+                )
+                run_targets(targets or list(STAGES), counts, load_mode, concurrency or 1, options, skip_complete)
+            else:
+                # Generate all the data types, one stage after another
+                from async_runner import run_generator
+                options = dict(
+                    now=now, vectorized=vectorized, server_side=server_side,
+                    rating_summary=rating_summary, itersize=itersize
+                )
+                for name in STAGE_NAMES:
+                    run_generator(name, conn, sink, counts, options)
         
         print("Data generation complete!")
+        
+        if query_benchmark:
+            # Latencies and plans of the app's hot read queries on the data just seeded
+            from query_benchmark import run_query_benchmark, write_results
+            results = run_query_benchmark(conn, seed=seed)
+            if query_benchmark != '-':
+                write_results(results, query_benchmark)
         conn.close()
     except Exception as e:
         print(f"Error in data generation: {e}")
         sys.exit(1)
 
+# Parse a --count TABLE=ROWS override
+def count_override(value):
+    name, separator, rows = value.partition('=')
+    if not separator or name not in DEFAULT_COUNTS or not rows.isdigit():
+        raise argparse.ArgumentTypeError(
+            f"expected TABLE=ROWS with TABLE one of {', '.join(DEFAULT_COUNTS)}, got {value!r}"
+        )
+    return name, int(rows)
+
+# Command line options
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate test data for the AngelGuides database")
+    parser.add_argument(
+        "--scale-factor",
+        type=float,
+        default=1,
+        help=f"Dataset size: {USERS_PER_SCALE_FACTOR} regular users per unit, every other table in proportion "
+             "(default: 1)"
+    )
+    parser.add_argument(
+        "--count",
+        dest="counts",
+        action="append",
+        type=count_override,
+        default=[],
+        metavar="TABLE=ROWS",
+        help="Override one count of the scale factor, e.g. messages=100000 (repeatable; tables derived from "
+             "users follow an overridden user count)"
+    )
+    parser.add_argument(
+        "--load-mode",
+        choices=[LoadMode.INSERT, LoadMode.COPY_TEXT, LoadMode.COPY_BINARY],
+        default=LoadMode.INSERT,
+        help="How generated rows are written: per-row INSERT, or COPY in text or binary format"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Shard generation across this many worker processes (0 runs the classic single-process path)"
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        help="Master seed for sharded or offline generation; the same seed gives the same data for any worker count"
+    )
+    parser.add_argument(
+        "--reference-time",
+        type=datetime.fromisoformat,
+        help="Timestamp that generated dates are relative to (ISO format, defaults to now)"
+    )
+    parser.add_argument(
+        "--output-dir",
+        help="Write the dataset to compressed COPY files and a manifest in this directory instead of the database"
+    )
+    parser.add_argument(
+        "--file-format",
+        choices=[FileFormat.CSV, FileFormat.BINARY],
+        default=FileFormat.CSV,
+        help="File format for --output-dir: gzip CSV or gzip Postgres binary COPY"
+    )
+    parser.add_argument(
+        "--vectorized",
+        action="store_true",
+        help="Synthesize sessions and their payments a column at a time with NumPy"
+    )
+    parser.add_argument(
+        "--text-corpus",
+        dest="text_uniqueness",
+        type=float,
+        nargs="?",
+        const=DEFAULT_UNIQUENESS,
+        metavar="UNIQUENESS",
+        help="Assemble free text from a cached pre-generated corpus instead of calling Faker per row; "
+             f"UNIQUENESS (0-1, default {DEFAULT_UNIQUENESS}) is the share of texts assembled fresh"
+    )
+    parser.add_argument(
+        "--server-side",
+        action="store_true",
+        help="Synthesize sessions, messages and topups inside Postgres with INSERT ... SELECT over generate_series"
+    )
+    parser.add_argument(
+        "--rating-summary",
+        action="store_true",
+        help=f"Maintain the {RATING_SUMMARY_TABLE} table and update advisor ratings incrementally from it"
+    )
+    parser.add_argument(
+        "--itersize",
+        type=int,
+        default=CURSOR_ITERSIZE,
+        help="Rows fetched per round-trip when streaming sessions and users from server-side cursors"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=0,
+        help="Run independent generators at the same time, at most this many at once (0 runs them one after another)"
+    )
+    parser.add_argument(
+        "--target",
+        dest="targets",
+        action="append",
+        choices=STAGE_NAMES,
+        help="Generate only this stage plus the prerequisite stages whose data is missing (repeatable)"
+    )
+    parser.add_argument(
+        "--skip-complete",
+        action="store_true",
+        help="Also skip target stages whose tables already hold the rows they would generate"
+    )
+    parser.add_argument(
+        "--metrics",
+        metavar="PATH",
+        help="Append per-stage and per-commit timings as JSON lines to this file ('-' for stdout)"
+    )
+    parser.add_argument(
+        "--profile",
+        choices=[ProfileMode.CPU, ProfileMode.MEMORY],
+        help="Profile every stage with cProfile (cpu) or tracemalloc (memory), one artifact per stage"
+    )
+    parser.add_argument(
+        "--profile-dir",
+        default=DEFAULT_PROFILE_DIR,
+        help=f"Where --profile writes its artifacts (default: {DEFAULT_PROFILE_DIR})"
+    )
+    parser.add_argument(
+        "--journal",
+        dest="journal_name",
+        metavar="RUN_NAME",
+        help="Generate shard by shard with progress journaled in the seed_journal table under this run name, "
+             "resuming the run if it was interrupted (implies sharded generation, --workers defaults to 1)"
+    )
+    parser.add_argument(
+        "--append-hours",
+        type=float,
+        metavar="HOURS",
+        help="Only append the sessions, messages, reviews and topups of the last HOURS (from where the previous "
+             "append stopped), at the rates of the scale factor"
+    )
+    parser.add_argument(
+        "--adaptive-batches",
+        dest="batch_target",
+        type=float,
+        nargs="?",
+        const=DEFAULT_TARGET_COMMIT_SECONDS,
+        metavar="SECONDS",
+        help="Grow or shrink commit batches while the run goes so each transaction takes about SECONDS "
+             f"(default {DEFAULT_TARGET_COMMIT_SECONDS}), and report the sizes chosen"
+    )
+    parser.add_argument(
+        "--max-batch-rows",
+        type=int,
+        default=DEFAULT_MAX_BATCH_ROWS,
+        help=f"Upper bound of an adaptive commit batch (default: {DEFAULT_MAX_BATCH_ROWS})"
+    )
+    parser.add_argument(
+        "--defer-indexes",
+        action="store_true",
+        help="Drop the secondary indexes and foreign keys of the generated tables for the load, then rebuild them "
+             "in parallel, validate the foreign keys and analyze (restored even if the run fails; see index_deferral.py)"
+    )
+    parser.add_argument(
+        "--maintenance-work-mem",
+        help="maintenance_work_mem for the index rebuilds of --defer-indexes (default: 1GB)"
+    )
+    parser.add_argument(
+        "--staging-load",
+        action="store_true",
+        help="Generate into UNLOGGED shadow tables and swap them in for the live ones in one transaction once the "
+             "load is complete (the app sees the old or the new dataset, never a mix)"
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Only print the expected rows, on-disk size and runtime of the run, estimated from a small trial "
+             "batch built locally (the database is not touched)"
+    )
+    parser.add_argument(
+        "--query-benchmark",
+        nargs="?",
+        const="-",
+        metavar="PATH",
+        help="After seeding, time the app's hot read queries with parameters from the generated ids, flagging "
+             "sequential scans; with PATH the results and EXPLAIN plans are also written there as JSON"
+    )
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
-    generate_all_data()
\ No newline at end of file
+    # Run through the imported module, which the runners and instrumentation also use, so
+    # that the text source and timers are set on the same module state
+    import python_data_generator
+    args = python_data_generator.parse_args()
+    python_data_generator.generate_all_data(
+        args.load_mode, args.workers, args.seed, args.reference_time, args.output_dir, args.file_format,
+        args.vectorized, args.text_uniqueness, args.server_side, args.rating_summary,
+        args.itersize, args.concurrency, args.targets, args.skip_complete,
+        args.metrics, args.profile, args.profile_dir,
+        python_data_generator.scaled_counts(args.scale_factor, dict(args.counts)), args.journal_name,
+        args.append_hours, args.batch_target, args.max_batch_rows, args.defer_indexes, args.maintenance_work_mem,
+        args.staging_load, args.plan, args.query_benchmark
+    )
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+
+# Post-seed query workload benchmark for the app's hot read paths
+#
+# Runs parameterized versions of the queries server/storage.ts (DatabaseStorage) issues
+# on its busiest paths against the seeded database: advisors by specialty, the messages
+# between two users, the unread message count, session, transaction and review history.
+# Parameters are drawn from the generator's ID registry (users, advisors, specialties)
+# and, for conversations, from the user pairs that exchanged messages, so every call hits
+# rows that exist. Per query it records latency percentiles over
+# --iterations calls (after a few unmeasured warm-up calls), the EXPLAIN (ANALYZE,
+# BUFFERS) plan of one call, its buffer hits and reads, and flags sequential scans in
+# that plan, which usually mean an index the path needs is missing.
+#
+#   python3 query_benchmark.py --iterations 500 --output query-results.json
+
+import sys
+import json
+import time
+import random
+import argparse
+from datetime import datetime
+
+import python_data_generator as generator
+from benchmark import percentile
+from python_data_generator import UserType
+
+DEFAULT_ITERATIONS = 200
+
+# Conversation pairs loaded to draw from (the pairs of the lowest ids beyond that)
+CONVERSATION_PAIRS = 100000
+
+# Calls per query before measuring (plan cache, buffer cache)
+WARMUP_CALLS = 5
+
+# Hot read paths: name -> (query, parameters from pick(kind), which draws a registry id)
+WORKLOAD = {
+    # getAdvisorsBySpecialty (two round-trips in the app, one statement here)
+    'advisors_by_specialty': (
+        """
+        SELECT * FROM users
+        WHERE id IN (SELECT advisor_id FROM advisor_specialties WHERE specialty_id = %s)
+        AND user_type = %s
+        """,
+        lambda pick: (pick('specialties'), UserType.ADVISOR)
+    ),
+    # getConversation between two users who exchanged messages
+    'conversation': (
+        """
+        SELECT * FROM messages
+        WHERE (sender_id = %(a)s AND receiver_id = %(b)s) OR (sender_id = %(b)s AND receiver_id = %(a)s)
+        ORDER BY timestamp
+        """,
+        lambda pick: dict(zip('ab', pick('conversations')))
+    ),
+    # getUnreadMessageCount
+    'unread_message_count': (
+        "SELECT count(*) FROM messages WHERE receiver_id = %s AND read = false",
+        lambda pick: (pick('users'),)
+    ),
+    # getSessionsByUser and getSessionsByAdvisor (session history)
+    'sessions_by_user': (
+        "SELECT * FROM sessions WHERE user_id = %s",
+        lambda pick: (pick('users'),)
+    ),
+    'sessions_by_advisor': (
+        "SELECT * FROM sessions WHERE advisor_id = %s",
+        lambda pick: (pick('advisors'),)
+    ),
+    # getTransactionsByUser
+    'transactions_by_user': (
+        "SELECT * FROM transactions WHERE user_id = %s ORDER BY timestamp DESC",
+        lambda pick: (pick('users'),)
+    ),
+    # getReviewsByAdvisor
+    'reviews_by_advisor': (
+        "SELECT * FROM reviews WHERE advisor_id = %s AND is_hidden = false ORDER BY created_at DESC",
+        lambda pick: (pick('advisors'),)
+    ),
+}
+
+# Distinct pairs of users that exchanged messages, in either direction
+def conversation_pairs(conn, limit=CONVERSATION_PAIRS):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            """
+            SELECT DISTINCT LEAST(sender_id, receiver_id), GREATEST(sender_id, receiver_id)
+            FROM messages
+            ORDER BY 1, 2
+            LIMIT %s
+            """,
+            (limit,)
+        )
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+# Plan nodes of a JSON plan, depth first
+def plan_nodes(node):
+    yield node
+    for child in node.get('Plans', ()):
+        yield from plan_nodes(child)
+
+# Run one query of the workload: latencies, rows returned and its EXPLAIN ANALYZE plan
+def measure_query(conn, name, iterations, pick):
+    query, parameters = WORKLOAD[name]
+    cursor = conn.cursor()
+    try:
+        for _ in range(WARMUP_CALLS):
+            cursor.execute(query, parameters(pick))
+            cursor.fetchall()
+
+        latencies = []
+        rows = 0
+        for _ in range(iterations):
+            params = parameters(pick)
+            started = time.perf_counter()
+            cursor.execute(query, params)
+            rows += len(cursor.fetchall())
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        cursor.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query, parameters(pick))
+        plan = cursor.fetchone()[0][0]
+        conn.rollback()
+    finally:
+        cursor.close()
+
+    latencies.sort()
+    seq_scans = sorted({
+        node['Relation Name'] for node in plan_nodes(plan['Plan']) if node['Node Type'] == 'Seq Scan'
+    })
+    return {
+        'query': name,
+        'calls': iterations,
+        'rows_per_call': round(rows / iterations, 2) if iterations else None,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 0.5), 3) if latencies else None,
+            'p95': round(percentile(latencies, 0.95), 3) if latencies else None,
+            'p99': round(percentile(latencies, 0.99), 3) if latencies else None,
+            'max': round(latencies[-1], 3) if latencies else None,
+        },
+        'shared_hit_blocks': plan['Plan'].get('Shared Hit Blocks'),
+        'shared_read_blocks': plan['Plan'].get('Shared Read Blocks'),
+        'seq_scans': seq_scans,
+        'plan': plan,
+    }
+
+# Run the workload (all queries, or the named ones) and return one result per query
+def run_query_benchmark(conn, iterations=DEFAULT_ITERATIONS, seed=None, queries=None):
+    rng = random.Random(seed)
+    pools = {kind: generator.id_registry.pool(conn, kind).ids for kind in ('users', 'advisors', 'specialties')}
+    pools['conversations'] = conversation_pairs(conn)
+    empty = [kind for kind, ids in pools.items() if not ids]
+    if empty:
+        print(f"Skipping the query benchmark: no {', '.join(empty)} to draw parameters from.")
+        return []
+
+    def pick(kind):
+        return rng.choice(pools[kind])
+
+    print(f"Benchmarking {len(queries or WORKLOAD)} queries, {iterations} calls each...")
+    results = []
+    for name in queries or WORKLOAD:
+        result = measure_query(conn, name, iterations, pick)
+        results.append(result)
+        latency = result['latency_ms']
+        print(
+            f"  {name:<24} p50 {latency['p50']:>8.3f} ms  p95 {latency['p95']:>8.3f} ms  "
+            f"p99 {latency['p99']:>8.3f} ms  {result['rows_per_call']:>8} rows/call"
+        )
+        if result['seq_scans']:
+            print(f"  {'':<24} WARNING: sequential scan on {', '.join(result['seq_scans'])}")
+    return results
+
+def write_results(results, path):
+    with open(path, 'w') as output:
+        json.dump({'recorded_at': datetime.now().isoformat(), 'queries': results}, output, indent=2)
+    print(f"Wrote query benchmark results to {path}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the app's hot read queries against the seeded database")
+    parser.add_argument(
+        "--iterations", type=int, default=DEFAULT_ITERATIONS, help=f"Calls per query (default: {DEFAULT_ITERATIONS})"
+    )
+    parser.add_argument("--seed", type=int, help="Seed for drawing the query parameters")
+    parser.add_argument(
+        "--query", dest="queries", action="append", choices=list(WORKLOAD), help="Only run this query (repeatable)"
+    )
+    parser.add_argument("--output", help="Write the results, plans included, to this JSON file")
+    parser.add_argument(
+        "--fail-on-seq-scan", action="store_true", help="Exit with status 1 when any plan has a sequential scan"
+    )
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    conn = generator.get_db_connection()
+    try:
+        results = run_query_benchmark(conn, args.iterations, args.seed, args.queries)
+    finally:
+        conn.close()
+    if args.output:
+        write_results(results, args.output)
+    if args.fail_on_seq_scan and any(result['seq_scans'] for result in results):
+        sys.exit(1)
@@ -1,31 +1,39 @@
 #!/usr/bin/env python3
 
 import sys
-from python_data_generator import get_db_connection, generate_reviews, generate_conversations, generate_messages, generate_topups
+import argparse
+from python_data_generator import DEFAULT_COUNTS
+from async_runner import DEFAULT_CONCURRENCY, run_targets
 
-def run_specific_generators():
+# Rows generated for each generator
+COUNTS = {
+    'messages': 200,
+    'conversations': 30,
+    'topups': 30,
+}
+
+def run_specific_generators(concurrency=DEFAULT_CONCURRENCY):
     try:
-        conn = get_db_connection()
-        
         print("Starting specific data generation...")
         
-        # Generate more messages
-        generate_messages(conn, 200)
-        
-        # Generate reviews for existing sessions
-        generate_reviews(conn)
-        
-        # Generate Angela AI conversations
-        generate_conversations(conn, 30)
-        
-        # Generate topup transactions
-        generate_topups(conn, 30)
+        # Generate more messages, reviews for existing sessions, Angela AI conversations
+        # and topup transactions (independent generators run at the same time, after any
+        # prerequisite stages whose data is missing)
+        targets = ['messages', 'reviews', 'conversations', 'topups']
+        run_targets(targets, dict(DEFAULT_COUNTS, **COUNTS), concurrency=concurrency)
         
         print("Specific data generation complete!")
-        conn.close()
     except Exception as e:
         print(f"Error in data generation: {e}")
         sys.exit(1)
 
 if __name__ == "__main__":
-    run_specific_generators()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate more messages, reviews, conversations and topups")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help="Generators run at once (1 runs them one after another)"
+    )
+    args = parser.parse_args()
+    run_specific_generators(args.concurrency)
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+# Schema-only template databases
+#
+# Throwaway databases (benchmark runs, fixture snapshots) are cloned from a template that
+# holds the schema and no rows: an empty database drizzle-kit pushes shared/schema.ts
+# into, named after a hash of that file so a schema change gets a template of its own.
+# Nothing is cloned from the configured database (PGDATABASE), so cloning works while the
+# app is connected to it and no dataset is copied only to be truncated.
+#
+# Statements that create, alter or drop databases run on the maintenance database
+# (PGMAINTENANCEDB, default postgres) rather than on PGDATABASE: Postgres refuses to copy
+# a template that any other session is connected to.
+#
+#   python3 schema_template.py   # build the template if needed and print its name
+
+import os
+import hashlib
+import subprocess
+from urllib.parse import quote
+
+import python_data_generator as generator
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(SCRIPTS_DIR)
+SCHEMA_FILE = os.path.join(ROOT_DIR, 'shared', 'schema.ts')
+
+DEFAULT_MAINTENANCE_DATABASE = 'postgres'
+
+# Template names: <database>_schema_<hash>, short enough for Postgres' 63-byte identifiers
+# with the suffix of the database being built
+SCHEMA_MARKER = '_schema_'
+NAME_PREFIX_LENGTH = 30
+HASH_LENGTH = 12
+BUILDING_SUFFIX = '_build'
+
+# Push the schema with drizzle-kit, without prompting (the database is empty)
+PUSH_COMMAND = ('npx', 'drizzle-kit', 'push', '--force')
+
+# Autocommit connection to the maintenance database, for CREATE/ALTER/DROP DATABASE
+def admin_connection():
+    dbname = os.environ.get('PGMAINTENANCEDB', DEFAULT_MAINTENANCE_DATABASE)
+    conn = generator.psycopg2.connect(**dict(generator.db_connection_params(), dbname=dbname))
+    conn.autocommit = True
+    return conn
+
+def database_exists(cursor, name):
+    cursor.execute("SELECT 1 FROM pg_database WHERE datname = %s", (name,))
+    return cursor.fetchone() is not None
+
+# Connection URL of a database on the configured server (drizzle-kit reads DATABASE_URL)
+def database_url(dbname):
+    params = generator.db_connection_params()
+    credentials = quote(params['user'] or '', safe='')
+    if params['password']:
+        credentials += ':' + quote(params['password'], safe='')
+    host = params['host'] or 'localhost'
+    port = f":{params['port']}" if params['port'] else ''
+    return f"postgresql://{credentials + '@' if credentials else ''}{host}{port}/{quote(dbname, safe='')}"
+
+def schema_digest():
+    with open(SCHEMA_FILE, 'rb') as schema:
+        return hashlib.sha256(schema.read()).hexdigest()
+
+def template_name(base, digest=None):
+    return f"{base[:NAME_PREFIX_LENGTH]}{SCHEMA_MARKER}{(digest or schema_digest())[:HASH_LENGTH]}"
+
+# Mark a finished database as a template nobody can connect to
+def seal_template(cursor, name):
+    cursor.execute(f'ALTER DATABASE "{name}" WITH IS_TEMPLATE true ALLOW_CONNECTIONS false')
+
+def drop_template(cursor, name):
+    cursor.execute(f'ALTER DATABASE "{name}" WITH IS_TEMPLATE false')
+    cursor.execute(f'DROP DATABASE "{name}"')
+
+# Drop the templates named by prefix whose name fails keep (one still being cloned stays)
+def prune_templates(cursor, prefix, keep):
+    cursor.execute("SELECT datname FROM pg_database WHERE datistemplate AND starts_with(datname, %s)", (prefix,))
+    for name, in cursor.fetchall():
+        if keep(name):
+            continue
+        try:
+            drop_template(cursor, name)
+            print(f"Dropped stale template {name}.")
+        except Exception as e:
+            print(f"Could not drop stale template {name}: {e}")
+
+# Name of the schema-only template of base (default PGDATABASE), built first when missing
+#
+# Concurrent callers serialize on an advisory lock, so one of them builds the template
+# and the others wait for it.
+def ensure_schema_template(base=None):
+    base = base or os.environ.get('PGDATABASE')
+    name = template_name(base)
+    conn = admin_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT pg_advisory_lock(hashtext(%s))", (name,))
+        if not database_exists(cursor, name):
+            building = name + BUILDING_SUFFIX
+            print(f"Building schema template {name} from {os.path.relpath(SCHEMA_FILE, ROOT_DIR)}...")
+            cursor.execute(f'DROP DATABASE IF EXISTS "{building}"')
+            cursor.execute(f'CREATE DATABASE "{building}" TEMPLATE template0')
+            try:
+                subprocess.run(
+                    PUSH_COMMAND, cwd=ROOT_DIR, env=dict(os.environ, DATABASE_URL=database_url(building)), check=True
+                )
+            except BaseException:
+                cursor.execute(f'DROP DATABASE IF EXISTS "{building}"')
+                raise
+            cursor.execute(f'ALTER DATABASE "{building}" RENAME TO "{name}"')
+            seal_template(cursor, name)
+            prune_templates(cursor, base[:NAME_PREFIX_LENGTH] + SCHEMA_MARKER, lambda other: other == name)
+        cursor.execute("SELECT pg_advisory_unlock(hashtext(%s))", (name,))
+    finally:
+        cursor.close()
+        conn.close()
+    return name
+
+# Clone a template into a new database (replacing an earlier database of the same name)
+def clone_database(template, name):
+    conn = admin_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f'DROP DATABASE IF EXISTS "{name}"')
+        # FILE_COPY (Postgres 15+) copies the files instead of WAL-logging every block
+        strategy = " STRATEGY = FILE_COPY" if conn.server_version >= 150000 else ""
+        cursor.execute(f'CREATE DATABASE "{name}" TEMPLATE "{template}"{strategy}')
+        return name
+    finally:
+        cursor.close()
+        conn.close()
+
+def drop_database(name):
+    conn = admin_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f'DROP DATABASE IF EXISTS "{name}"')
+    finally:
+        cursor.close()
+        conn.close()
+
+if __name__ == "__main__":
+    print(ensure_schema_template())
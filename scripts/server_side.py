@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+
+# Server-side generation: sessions, messages and topups synthesized inside Postgres
+#
+# Each generator sends one INSERT ... SELECT over generate_series per batch, joined to
+# the users already in the database, so no generated row crosses the wire. The SQL
+# reproduces the distributions of build_session(), message_threads()/build_message()
+# and build_topup(). Free text (session notes, message content) is picked from a pool
+# drawn from the generator's text source and passed as an array parameter.
+#
+# Random draws are made in MATERIALIZED CTEs so every expression that uses a draw sees
+# the same value, and the server's random() is seeded from Python's random with
+# setseed(), so a seeded run produces the same rows every time.
+
+import math
+import random
+from datetime import datetime
+
+import python_data_generator as generator
+from python_data_generator import SessionType, TransactionType, UserType
+
+# Rows per INSERT ... SELECT statement (each one commits)
+SERVER_BATCH_ROWS = 1000000
+
+# Distinct free texts passed to the server per run
+SERVER_TEXT_POOL = 1000
+
+# Pools of user ids and advisor (id, rate) arrays in id order, shared by the statements
+POOLS_SQL = """
+    pools AS (
+        SELECT
+            (SELECT array_agg(id ORDER BY id) FROM users WHERE user_type = %(user_type)s) AS user_ids,
+            advisors.ids AS advisor_ids,
+            advisors.chat_rates,
+            advisors.audio_rates,
+            advisors.video_rates
+        FROM (
+            SELECT
+                array_agg(id ORDER BY id) AS ids,
+                array_agg(chat_rate ORDER BY id) AS chat_rates,
+                array_agg(audio_rate ORDER BY id) AS audio_rates,
+                array_agg(video_rate ORDER BY id) AS video_rates
+            FROM users
+            WHERE user_type = %(advisor_type)s
+        ) AS advisors
+    )
+"""
+
+SESSIONS_SQL = """
+    WITH
+    """ + POOLS_SQL + """,
+    draws AS MATERIALIZED (
+        SELECT
+            p.user_ids[1 + floor(random() * cardinality(p.user_ids))::int] AS user_id,
+            1 + floor(random() * cardinality(p.advisor_ids))::int AS advisor_index,
+            floor(random() * 31)::int AS days_ago,
+            floor(random() * 24)::int AS hours,
+            15 + floor(random() * 76)::int AS duration,
+            floor(random() * 3)::int AS session_type,
+            random() < 0.5 AS coin,
+            random() AS pay_draw,
+            CASE WHEN random() > 0.7
+                THEN (%(notes)s::text[])[1 + floor(random() * cardinality(%(notes)s::text[]))::int]
+            END AS notes
+        FROM generate_series(1, %(count)s), pools p
+    ),
+    drawn AS (
+        SELECT
+            d.user_id,
+            p.advisor_ids[d.advisor_index] AS advisor_id,
+            %(now)s - make_interval(days => d.days_ago, hours => d.hours) AS start_time,
+            d.duration,
+            (%(session_types)s::text[])[d.session_type + 1] AS session_type,
+            CASE d.session_type
+                WHEN 0 THEN p.chat_rates[d.advisor_index]
+                WHEN 1 THEN p.audio_rates[d.advisor_index]
+                ELSE p.video_rates[d.advisor_index]
+            END AS rate,
+            CASE
+                WHEN d.days_ago > 7 THEN 'completed'
+                WHEN d.days_ago > 2 THEN CASE WHEN d.coin THEN 'completed' ELSE 'canceled' END
+                ELSE CASE WHEN d.coin THEN 'scheduled' ELSE 'in_progress' END
+            END AS status,
+            d.pay_draw > CASE WHEN d.days_ago > 7 THEN 0.3 ELSE 0.5 END AS paid_draw,
+            d.notes
+        FROM draws d, pools p
+    ),
+    inserted AS (
+        INSERT INTO sessions (
+            user_id, advisor_id, start_time, end_time, session_type, status, notes,
+            rate_per_minute, actual_start_time, actual_end_time, actual_duration,
+            billed_amount, is_paid
+        )
+        SELECT
+            user_id,
+            advisor_id,
+            start_time,
+            start_time + make_interval(mins => duration),
+            session_type,
+            status,
+            notes,
+            rate,
+            CASE WHEN status IN ('completed', 'in_progress') THEN start_time END,
+            CASE WHEN status = 'completed' THEN start_time + make_interval(mins => duration) END,
+            CASE WHEN status = 'completed' THEN duration END,
+            CASE WHEN status = 'completed' THEN rate * duration END,
+            status = 'completed' AND paid_draw
+        FROM drawn
+        RETURNING id, user_id, advisor_id, session_type, status, actual_end_time, billed_amount, is_paid
+    )
+    INSERT INTO transactions (
+        type, user_id, advisor_id, session_id, amount, description, timestamp, payment_status
+    )
+    SELECT
+        %(payment_type)s,
+        user_id,
+        advisor_id,
+        id,
+        -billed_amount,
+        'Payment for ' || session_type || ' session with advisor #' || advisor_id,
+        actual_end_time,
+        'completed'
+    FROM inserted
+    WHERE status = 'completed' AND billed_amount > 0 AND is_paid
+"""
+
+MESSAGES_SQL = """
+    WITH
+    """ + POOLS_SQL + """,
+    threads AS MATERIALIZED (
+        SELECT
+            thread,
+            p.user_ids[1 + floor(random() * cardinality(p.user_ids))::int] AS user_id,
+            p.advisor_ids[1 + floor(random() * cardinality(p.advisor_ids))::int] AS advisor_id,
+            %(min_messages)s + floor(random() * (%(max_messages)s - %(min_messages)s + 1))::int AS message_count
+        FROM generate_series(1, %(threads)s) AS thread, pools p
+    ),
+    draws AS MATERIALIZED (
+        -- Threads are expanded in order, so the limit only cuts the last thread short
+        SELECT
+            t.user_id,
+            t.advisor_id,
+            i,
+            %(now)s - make_interval(
+                days => floor(random() * 8)::int,
+                hours => floor(random() * 24)::int,
+                mins => floor(random() * 60)::int
+            ) AS message_time,
+            random() > 0.5 AS read_draw,
+            floor(random() * %(pool_size)s)::int AS text_index
+        FROM threads t, generate_series(0, t.message_count - 1) AS i
+        ORDER BY t.thread, i
+        LIMIT %(count)s
+    )
+    INSERT INTO messages (sender_id, receiver_id, content, timestamp, read)
+    SELECT
+        CASE WHEN i %% 2 = 0 THEN user_id ELSE advisor_id END,
+        CASE WHEN i %% 2 = 0 THEN advisor_id ELSE user_id END,
+        -- User messages are shorter than advisor responses
+        CASE WHEN i %% 2 = 0
+            THEN (%(short_texts)s::text[])[1 + text_index]
+            ELSE (%(long_texts)s::text[])[1 + text_index]
+        END,
+        message_time,
+        message_time < %(now)s - interval '1 day' OR read_draw
+    FROM draws
+"""
+
+TOPUPS_SQL = """
+    WITH selected AS MATERIALIZED (
+        -- Drawn outside the sampling subquery, where random() would reuse the sort key
+        SELECT user_id, %(min_topups)s + floor(random() * (%(max_topups)s - %(min_topups)s + 1))::int AS topup_count
+        FROM (
+            SELECT id AS user_id
+            FROM users
+            WHERE user_type = %(user_type)s
+            ORDER BY random()
+            LIMIT %(count)s
+        ) AS sampled
+    ),
+    topups AS MATERIALIZED (
+        SELECT
+            s.user_id,
+            1000 + floor(random() * 19001)::int AS amount,
+            %(now)s - make_interval(days => floor(random() * 61)::int) AS topup_date,
+            'top_' || md5(random()::text)::uuid AS payment_reference
+        FROM selected s, generate_series(1, s.topup_count)
+    ),
+    inserted AS (
+        INSERT INTO transactions (
+            type, user_id, amount, description, timestamp, payment_status, payment_reference
+        )
+        SELECT %(topup_type)s, user_id, amount, 'Account balance topup', topup_date, 'completed', payment_reference
+        FROM topups
+        RETURNING user_id, amount
+    )
+    UPDATE users u
+    SET account_balance = u.account_balance + totals.amount
+    FROM (SELECT user_id, SUM(amount) AS amount FROM inserted GROUP BY user_id) AS totals
+    WHERE u.id = totals.user_id
+    RETURNING (SELECT COUNT(*) FROM inserted)
+"""
+
+# Seed the server's random() from Python's random, so seeded runs repeat
+def seed_server(cursor):
+    cursor.execute("SELECT setseed(%s)", (random.uniform(-1, 1),))
+
+def _batches(count):
+    for start in range(0, count, SERVER_BATCH_ROWS):
+        yield min(SERVER_BATCH_ROWS, count - start)
+
+def _has_parents(cursor, advisors=True):
+    cursor.execute("SELECT COUNT(*) FROM users WHERE user_type = %s", (UserType.USER,))
+    if not cursor.fetchone()[0]:
+        return False
+    if advisors:
+        cursor.execute("SELECT COUNT(*) FROM users WHERE user_type = %s", (UserType.ADVISOR,))
+        return cursor.fetchone()[0] > 0
+    return True
+
+# Generate sessions and their payments on the server
+def generate_sessions_server(conn, count=200, now=None):
+    print(f"Generating {count} sessions (server-side)...")
+
+    cursor = conn.cursor()
+    try:
+        if not _has_parents(cursor):
+            print("No users or advisors found. Skipping session generation.")
+            return
+
+        seed_server(cursor)
+        params = {
+            'user_type': UserType.USER,
+            'advisor_type': UserType.ADVISOR,
+            'now': now or datetime.now(),
+            'notes': [generator.text_source.text(200) for _ in range(SERVER_TEXT_POOL)],
+            'session_types': [SessionType.CHAT, SessionType.AUDIO, SessionType.VIDEO],
+            'payment_type': TransactionType.SESSION_PAYMENT,
+        }
+        transactions = 0
+        for batch in _batches(count):
+            cursor.execute(SESSIONS_SQL, dict(params, count=batch))
+            transactions += cursor.rowcount
+            conn.commit()
+        print(f"Created {count} sessions with {transactions} related transactions.")
+    except Exception as e:
+        conn.rollback()
+        print(f"Error generating sessions: {e}")
+    finally:
+        cursor.close()
+
+# Generate message threads on the server (pair_count caps the threads like generate_messages)
+def generate_messages_server(conn, count=500, now=None, pair_count=30):
+    print(f"Generating {count} messages (server-side)...")
+
+    cursor = conn.cursor()
+    try:
+        if not _has_parents(cursor):
+            print("No users or advisors found. Skipping message generation.")
+            return
+
+        seed_server(cursor)
+        params = {
+            'user_type': UserType.USER,
+            'advisor_type': UserType.ADVISOR,
+            'now': now or datetime.now(),
+            'pool_size': SERVER_TEXT_POOL,
+            'short_texts': [generator.text_source.text(100) for _ in range(SERVER_TEXT_POOL)],
+            'long_texts': [generator.text_source.text(150) for _ in range(SERVER_TEXT_POOL)],
+            'min_messages': generator.MESSAGES_PER_THREAD[0],
+            'max_messages': generator.MESSAGES_PER_THREAD[1],
+        }
+        if pair_count is not None:
+            # The capped threads hold a bounded number of messages, so one statement does
+            cursor.execute("SELECT COUNT(*) FROM users WHERE user_type = %s", (UserType.USER,))
+            users = cursor.fetchone()[0]
+            cursor.execute("SELECT COUNT(*) FROM users WHERE user_type = %s", (UserType.ADVISOR,))
+            threads = min(users, cursor.fetchone()[0], pair_count)
+            batches = [(count, threads)]
+        else:
+            # Every thread has at least the minimum number of messages
+            batches = [(batch, math.ceil(batch / generator.MESSAGES_PER_THREAD[0])) for batch in _batches(count)]
+
+        written = 0
+        for batch, threads in batches:
+            cursor.execute(MESSAGES_SQL, dict(params, count=batch, threads=threads))
+            written += cursor.rowcount
+            conn.commit()
+        print(f"Created {written} messages.")
+    except Exception as e:
+        conn.rollback()
+        print(f"Error generating messages: {e}")
+    finally:
+        cursor.close()
+
+# Generate TOPUPS_PER_USER topups for each of count random users on the server, updating balances
+def generate_topups_server(conn, count=50, now=None):
+    print(f"Generating {count} topup transactions (server-side)...")
+
+    cursor = conn.cursor()
+    try:
+        if not _has_parents(cursor, advisors=False):
+            print("No users found. Skipping topup generation.")
+            return
+
+        seed_server(cursor)
+        cursor.execute(TOPUPS_SQL, {
+            'user_type': UserType.USER,
+            'topup_type': TransactionType.USER_TOPUP,
+            'now': now or datetime.now(),
+            'count': count,
+            'min_topups': generator.TOPUPS_PER_USER[0],
+            'max_topups': generator.TOPUPS_PER_USER[1],
+        })
+        row = cursor.fetchone()
+        conn.commit()
+        print(f"Created {row[0] if row else 0} topup transactions for {cursor.rowcount} users.")
+    except Exception as e:
+        conn.rollback()
+        print(f"Error generating topups: {e}")
+    finally:
+        cursor.close()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+
+# Template-database snapshots for test fixtures
+#
+# A snapshot is a database seeded once and then marked as a template: it is cloned from
+# the schema-only template of the configured database (see schema_template.py), seeded
+# through sharded generation (so the seed alone decides the data) and renamed into place
+# only once complete. Each test worker then gets its own copy with CREATE DATABASE ...
+# TEMPLATE, a file-level copy that takes milliseconds at fixture sizes; copies are
+# independent, so any number of workers can be provisioned at the same time.
+#
+# Snapshots are named after a hash of the generator config (counts, seed, reference day,
+# text corpus) and of the generator code (scripts/*.py) and shared/schema.ts, so changing
+# any of them selects a new snapshot. Building one drops the snapshots of this database
+# that were built from other code or another schema. The reference time defaults to the
+# start of the day, so dates in the fixtures stay recent and a snapshot lasts a day.
+#
+#   python3 snapshots.py provision test_w1 test_w2 test_w3   # build if needed, then clone
+#   python3 snapshots.py drop test_w1 test_w2 test_w3
+
+import os
+import sys
+import glob
+import json
+import hashlib
+import argparse
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import python_data_generator as generator
+from bulk_loader import LoadMode
+from schema_template import (
+    ROOT_DIR,
+    SCHEMA_FILE,
+    SCRIPTS_DIR,
+    admin_connection,
+    clone_database,
+    database_exists,
+    drop_database,
+    ensure_schema_template,
+    prune_templates,
+    seal_template,
+)
+
+# Seed of snapshots that do not ask for one
+DEFAULT_SNAPSHOT_SEED = 1
+
+# Snapshot names: <database>_snap_<hash>, short enough for Postgres' 63-byte identifiers
+# with the suffix of the database being built
+SNAPSHOT_MARKER = '_snap_'
+NAME_PREFIX_LENGTH = 30
+HASH_LENGTH = 16
+BUILDING_SUFFIX = '_build'
+
+# Digest of everything that shapes the generated data besides the config
+def code_digest():
+    digest = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(SCRIPTS_DIR, '*.py'))) + [SCHEMA_FILE]:
+        digest.update(os.path.relpath(path, ROOT_DIR).encode('utf-8'))
+        with open(path, 'rb') as source:
+            digest.update(source.read())
+    return digest.hexdigest()
+
+# Generator config of a snapshot (JSON-serializable, part of its name)
+def snapshot_config(counts=None, seed=None, reference_time=None, text_uniqueness=None):
+    reference_time = reference_time or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    return dict(
+        counts=counts or generator.DEFAULT_COUNTS,
+        seed=DEFAULT_SNAPSHOT_SEED if seed is None else seed,
+        reference_time=reference_time.isoformat(),
+        text_uniqueness=text_uniqueness,
+    )
+
+def snapshot_name(base, config, code=None):
+    key = json.dumps(dict(config=config, code=code or code_digest()), sort_keys=True)
+    return f"{base[:NAME_PREFIX_LENGTH]}{SNAPSHOT_MARKER}{hashlib.sha256(key.encode('utf-8')).hexdigest()[:HASH_LENGTH]}"
+
+# Seed the database PGDATABASE points at (runs in a child process, see build_snapshot)
+def _seed_snapshot(config, workers, load_mode):
+    generator.generate_all_data(
+        load_mode, max(workers, 1), config['seed'], datetime.fromisoformat(config['reference_time']),
+        text_uniqueness=config['text_uniqueness'], counts=config['counts']
+    )
+
+# Users a complete snapshot holds (generators report errors instead of raising)
+def _snapshot_complete(name, config):
+    counts = config['counts']
+    conn = generator.psycopg2.connect(**dict(generator.db_connection_params(), dbname=name))
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT COUNT(*) FROM users")
+        return cursor.fetchone()[0] >= counts['users'] + counts['advisors'] + counts['admins']
+    finally:
+        cursor.close()
+        conn.close()
+
+# Build a snapshot under a temporary name and move it into place once it is complete
+def build_snapshot(base, name, config, code, workers=1, load_mode=LoadMode.COPY_BINARY):
+    building = name + BUILDING_SUFFIX
+    print(f"Building snapshot {name} from {base}: {config}")
+    clone_database(ensure_schema_template(base), building)
+
+    # The child connects to the database being built through the inherited environment,
+    # and keeps this process' generator state (id registry, text source) untouched
+    os.environ['PGDATABASE'] = building
+    try:
+        child = multiprocessing.get_context('spawn').Process(target=_seed_snapshot, args=(config, workers, load_mode))
+        child.start()
+        child.join()
+    finally:
+        os.environ['PGDATABASE'] = base
+    if child.exitcode != 0 or not _snapshot_complete(building, config):
+        drop_database(building)
+        raise RuntimeError(f"Seeding snapshot {name} failed")
+
+    conn = admin_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f'ALTER DATABASE "{building}" RENAME TO "{name}"')
+        # No connections: clones fail while anyone is connected to their template
+        seal_template(cursor, name)
+        cursor.execute(f"COMMENT ON DATABASE \"{name}\" IS %s", (json.dumps(dict(code=code, config=config)),))
+    finally:
+        cursor.close()
+        conn.close()
+
+# Generator code digest each snapshot of base was built from (from its comment)
+def _snapshot_codes(cursor, prefix):
+    cursor.execute(
+        "SELECT datname, shobj_description(oid, 'pg_database') FROM pg_database WHERE starts_with(datname, %s)",
+        (prefix,)
+    )
+    codes = {}
+    for name, comment in cursor.fetchall():
+        try:
+            codes[name] = json.loads(comment or '{}').get('code')
+        except ValueError:
+            codes[name] = None
+    return codes
+
+# Drop the snapshots of base built from other generator code or schema
+def prune_snapshots(base, code):
+    prefix = base[:NAME_PREFIX_LENGTH] + SNAPSHOT_MARKER
+    conn = admin_connection()
+    cursor = conn.cursor()
+    try:
+        codes = _snapshot_codes(cursor, prefix)
+        prune_templates(cursor, prefix, lambda name: codes.get(name) == code)
+    finally:
+        cursor.close()
+        conn.close()
+
+# Name of the snapshot for config, built first when it does not exist yet
+#
+# Concurrent callers (parallel test workers) serialize on an advisory lock, so one of
+# them builds the snapshot and the others wait for it. The lock is held on the
+# maintenance database, so waiting callers keep no session on any database being cloned.
+def ensure_snapshot(config, workers=1, load_mode=LoadMode.COPY_BINARY):
+    base = os.environ.get('PGDATABASE')
+    code = code_digest()
+    name = snapshot_name(base, config, code)
+    conn = admin_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT pg_advisory_lock(hashtext(%s))", (name,))
+        if not database_exists(cursor, name):
+            build_snapshot(base, name, config, code, workers, load_mode)
+            prune_snapshots(base, code)
+        cursor.execute("SELECT pg_advisory_unlock(hashtext(%s))", (name,))
+    finally:
+        cursor.close()
+        conn.close()
+    return name
+
+# Clone a snapshot into several databases at once, each on its own connection
+def provision_databases(snapshot, names, jobs=None):
+    with ThreadPoolExecutor(max_workers=jobs or max(len(names), 1)) as executor:
+        return list(executor.map(lambda name: clone_database(snapshot, name), names))
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Seed template-database snapshots and clone them for test workers")
+    parser.add_argument(
+        "command", choices=['ensure', 'provision', 'drop'],
+        help="ensure: build the snapshot if needed and print its name; provision: ensure, then clone it into "
+             "each DATABASE; drop: drop each DATABASE"
+    )
+    parser.add_argument("databases", nargs='*', metavar="DATABASE", help="Databases to provision or drop")
+    parser.add_argument("--scale-factor", type=float, default=1, help="Dataset size (see python_data_generator.py)")
+    parser.add_argument(
+        "--count", dest="counts", action="append", type=generator.count_override, default=[], metavar="TABLE=ROWS",
+        help="Override one count of the scale factor (repeatable)"
+    )
+    parser.add_argument("--seed", type=int, help=f"Master seed (default: {DEFAULT_SNAPSHOT_SEED})")
+    parser.add_argument(
+        "--reference-time", type=datetime.fromisoformat, help="Timestamp dates are relative to (default: start of today)"
+    )
+    parser.add_argument(
+        "--text-corpus", dest="text_uniqueness", type=float, metavar="UNIQUENESS",
+        help="Assemble free text from the cached corpus (see python_data_generator.py)"
+    )
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes seeding a new snapshot")
+    parser.add_argument(
+        "--load-mode", choices=[LoadMode.INSERT, LoadMode.COPY_TEXT, LoadMode.COPY_BINARY],
+        default=LoadMode.COPY_BINARY, help="How a new snapshot is written (does not change its data)"
+    )
+    parser.add_argument("--jobs", type=int, help="Databases cloned at the same time (default: all of them)")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == 'drop':
+        for database in args.databases:
+            drop_database(database)
+        sys.exit(0)
+
+    config = snapshot_config(
+        generator.scaled_counts(args.scale_factor, dict(args.counts)), args.seed, args.reference_time,
+        args.text_uniqueness
+    )
+    snapshot = ensure_snapshot(config, args.workers, args.load_mode)
+    if args.command == 'ensure':
+        print(snapshot)
+    else:
+        for database in provision_databases(snapshot, args.databases, args.jobs):
+            print(database)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+# Generation stages as a dependency graph
+#
+# Every stage declares the resources it reads (inputs) and writes (outputs); a resource
+# is a table, or the rows of one type in a shared table (users by user_type,
+# transactions by type). A stage depends on the stages that output its inputs, so
+# reviews <- sessions <- users/advisors, and stages without a path between them can run
+# at the same time.
+#
+# plan_stages() turns target stages into the stages that have to run: each target, plus
+# the prerequisites whose outputs are not complete yet. A stage is complete when its
+# first output has rows, and at least as many as it generates for stages that generate
+# a fixed number of rows.
+
+from python_data_generator import SPECIALTIES, TransactionType, UserType
+
+# Stages in an order where every stage comes after the stages it depends on
+STAGES = {
+    'specialties': {'inputs': (), 'outputs': ('specialties',), 'counted': True},
+    'users': {'inputs': (), 'outputs': ('users.user',), 'counted': True},
+    'advisors': {'inputs': ('specialties',), 'outputs': ('users.advisor', 'advisor_specialties'), 'counted': True},
+    'admins': {'inputs': (), 'outputs': ('users.admin',), 'counted': True},
+    'sessions': {
+        'inputs': ('users.user', 'users.advisor'),
+        'outputs': ('sessions', 'transactions.session_payment'),
+        'counted': True,
+    },
+    # Messages, reviews, conversations and topups produce a random number of rows
+    'messages': {'inputs': ('users.user', 'users.advisor'), 'outputs': ('messages',), 'counted': False},
+    'reviews': {'inputs': ('sessions',), 'outputs': ('reviews',), 'counted': False},
+    'conversations': {'inputs': ('users.user',), 'outputs': ('conversations',), 'counted': False},
+    'topups': {'inputs': ('users.user',), 'outputs': ('transactions.user_topup',), 'counted': False},
+}
+
+# Row count query for each resource
+RESOURCE_QUERIES = {
+    'specialties': ("SELECT COUNT(*) FROM specialties", ()),
+    'users.user': ("SELECT COUNT(*) FROM users WHERE user_type = %s", (UserType.USER,)),
+    'users.advisor': ("SELECT COUNT(*) FROM users WHERE user_type = %s", (UserType.ADVISOR,)),
+    'users.admin': ("SELECT COUNT(*) FROM users WHERE user_type = %s", (UserType.ADMIN,)),
+    'advisor_specialties': ("SELECT COUNT(*) FROM advisor_specialties", ()),
+    'sessions': ("SELECT COUNT(*) FROM sessions", ()),
+    'transactions.session_payment': (
+        "SELECT COUNT(*) FROM transactions WHERE type = %s", (TransactionType.SESSION_PAYMENT,)
+    ),
+    'messages': ("SELECT COUNT(*) FROM messages", ()),
+    'reviews': ("SELECT COUNT(*) FROM reviews", ()),
+    'conversations': ("SELECT COUNT(*) FROM conversations", ()),
+    'transactions.user_topup': ("SELECT COUNT(*) FROM transactions WHERE type = %s", (TransactionType.USER_TOPUP,)),
+}
+
+# Stages that output at least one of a stage's inputs
+def stage_dependencies(name):
+    inputs = set(STAGES[name]['inputs'])
+    return tuple(other for other, stage in STAGES.items() if inputs & set(stage['outputs']))
+
+# Rows a counted stage generates
+def expected_rows(name, counts):
+    if name == 'specialties':
+        return len(SPECIALTIES)
+    return counts[name]
+
+# Whether a stage's first output already holds the rows the stage would generate
+# (later outputs, like session payments, can legitimately be empty)
+def stage_complete(cursor, name, counts):
+    stage = STAGES[name]
+    query, params = RESOURCE_QUERIES[stage['outputs'][0]]
+    cursor.execute(query, params)
+    rows = cursor.fetchone()[0]
+    if stage['counted']:
+        return rows >= max(expected_rows(name, counts), 1)
+    return rows > 0
+
+# Stages to run for the targets, in dependency order
+#
+# Targets always run (unless skip_complete is set and they are complete); prerequisites
+# only run when their outputs are incomplete, and a complete prerequisite also covers
+# everything it depends on.
+def plan_stages(conn, targets, counts, skip_complete=False):
+    for name in targets:
+        if name not in STAGES:
+            raise ValueError(f"Unknown stage: {name}")
+
+    cursor = conn.cursor()
+    try:
+        planned = {}
+
+        def visit(name, is_target):
+            # Already planned to run, or found complete and not needed as a target
+            if planned.get(name) or (name in planned and not is_target):
+                return
+            if (skip_complete or not is_target) and stage_complete(cursor, name, counts):
+                planned[name] = False
+                return
+            planned[name] = True
+            for dependency in stage_dependencies(name):
+                visit(dependency, False)
+
+        for name in targets:
+            visit(name, True)
+    finally:
+        cursor.close()
+
+    skipped = [name for name in STAGES if planned.get(name) is False]
+    stages = [name for name in STAGES if planned.get(name)]
+    if skipped:
+        print(f"Skipping complete stage(s): {', '.join(skipped)}")
+    print(f"Planned stage(s): {', '.join(stages) or 'none'}")
+    return stages
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+
+# Staging load: generate into UNLOGGED shadow tables, then swap them in atomically
+#
+# staged_dataset() creates an UNLOGGED shadow copy of every SWAP_TABLES table in the
+# seed_staging schema (columns, defaults, indexes and constraints from LIKE ... INCLUDING
+# ALL, a sequence of its own, and the foreign keys re-pointed at the other shadows) and
+# puts that schema first on the search_path of every connection the load opens, so the
+# generators write the shadows without naming them. The shadows skip WAL while they fill.
+#
+# Once the load is done the shadows are switched to logged (one rewrite per table, which
+# WAL-logs the finished data in bulk unless wal_level is minimal) and swapped in by one
+# transaction that moves the live tables to seed_retired and the shadows to public. The
+# app therefore sees the old dataset or the new one, never a mix. Foreign keys of other
+# tables (working_hours) are moved over to the new tables in the same transaction, and
+# the new tables' constraints and indexes get the names the old ones had, so the schema
+# still matches what drizzle-kit pushed.
+#
+# A load that fails, or that did not write the rows it was asked for, drops the shadows
+# and leaves the live dataset untouched.
+
+import os
+from contextlib import contextmanager
+
+SWAP_TABLES = (
+    'users', 'advisor_specialties', 'sessions', 'messages', 'reviews', 'conversations', 'transactions'
+)
+
+LIVE_SCHEMA = 'public'
+STAGING_SCHEMA = 'seed_staging'
+RETIRED_SCHEMA = 'seed_retired'
+
+# Constraints other than foreign keys (those keep their names, see create_shadows), by
+# what they enforce; LIKE ... INCLUDING ALL gives the shadows' copies generated names
+CONSTRAINT_NAMES_SQL = """
+    SELECT c.relname, k.contype::text, pg_get_constraintdef(k.oid), k.conname
+    FROM pg_constraint k
+    JOIN pg_class c ON c.oid = k.conrelid
+    WHERE k.contype <> 'f' AND c.relnamespace = %(schema)s::regnamespace AND c.relname = ANY(%(tables)s)
+    ORDER BY 1, 2, 3, 4
+"""
+
+# Indexes not backing a constraint, by what they index (their definition after USING)
+INDEX_NAMES_SQL = """
+    SELECT c.relname, x.indisunique::text, regexp_replace(pg_get_indexdef(x.indexrelid), '^.*? USING ', ''),
+           i.relname
+    FROM pg_index x
+    JOIN pg_class i ON i.oid = x.indexrelid
+    JOIN pg_class c ON c.oid = x.indrelid
+    WHERE c.relnamespace = %(schema)s::regnamespace AND c.relname = ANY(%(tables)s)
+    AND NOT EXISTS (SELECT 1 FROM pg_constraint k WHERE k.conindid = x.indexrelid)
+    ORDER BY 1, 2, 3, 4
+"""
+
+# Foreign keys of the swapped tables, and of other tables pointing at them
+FOREIGN_KEYS_SQL = """
+    SELECT c.relname, quote_ident(k.conname), pg_get_constraintdef(k.oid), k.convalidated,
+           c.relname = ANY(%(tables)s)
+    FROM pg_constraint k
+    JOIN pg_class c ON c.oid = k.conrelid
+    JOIN pg_class r ON r.oid = k.confrelid
+    WHERE k.contype = 'f'
+    AND ((c.relnamespace = %(schema)s::regnamespace AND c.relname = ANY(%(tables)s))
+         OR (r.relnamespace = %(schema)s::regnamespace AND r.relname = ANY(%(tables)s)))
+    ORDER BY 1, 2
+"""
+
+def _execute(conn, *statements):
+    cursor = conn.cursor()
+    try:
+        for statement in statements:
+            cursor.execute(statement)
+    finally:
+        cursor.close()
+
+def _fetch(conn, query, params=None):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query, params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+# Create the shadow tables and route conn to them (search_path from staging_search_path),
+# returning the foreign keys of other tables that point at the swapped ones
+def create_shadows(conn, search_path, tables=SWAP_TABLES):
+    foreign_keys = _fetch(conn, FOREIGN_KEYS_SQL, dict(tables=list(tables), schema=LIVE_SCHEMA))
+    _execute(
+        conn,
+        f"DROP SCHEMA IF EXISTS {STAGING_SCHEMA} CASCADE",
+        f"CREATE SCHEMA {STAGING_SCHEMA}",
+    )
+    for table in tables:
+        sequence = _fetch(conn, "SELECT pg_get_serial_sequence(%s, 'id')", (f"{LIVE_SCHEMA}.{table}",))[0][0]
+        _execute(conn, f"CREATE UNLOGGED TABLE {STAGING_SCHEMA}.{table} (LIKE {LIVE_SCHEMA}.{table} INCLUDING ALL)")
+        if sequence:
+            # Its own sequence (same name), so retiring the live table cannot take it along
+            shadow_sequence = f"{STAGING_SCHEMA}.{sequence.rpartition('.')[2]}"
+            _execute(
+                conn,
+                f"CREATE SEQUENCE {shadow_sequence} OWNED BY {STAGING_SCHEMA}.{table}.id",
+                f"ALTER TABLE {STAGING_SCHEMA}.{table} ALTER COLUMN id SET DEFAULT nextval('{shadow_sequence}')",
+            )
+
+    # The definitions name referenced tables unqualified, so with the staging schema first
+    # on the search path they point at the shadows where there is one
+    _execute(conn, f"SET search_path = {search_path}")
+    for table, name, definition, _, swapped in foreign_keys:
+        if swapped:
+            _execute(conn, f"ALTER TABLE {STAGING_SCHEMA}.{table} ADD CONSTRAINT {name} {definition}")
+    conn.commit()
+    return [fk for fk in foreign_keys if not fk[4]]
+
+# The connection's search path with the staging schema in front
+def staging_search_path(conn):
+    current = _fetch(conn, "SELECT current_setting('search_path')")[0][0]
+    schemas = [schema.strip() for schema in current.split(',') if schema.strip() != STAGING_SCHEMA]
+    return ','.join([STAGING_SCHEMA] + schemas)
+
+# Make the connections opened from now on (workers, pools, rebuilds) write the shadows
+def _route_connections(search_path):
+    previous = os.environ.get('PGOPTIONS')
+    option = f"-c search_path={search_path}"
+    os.environ['PGOPTIONS'] = f"{previous} {option}" if previous else option
+    return previous
+
+def _unroute_connections(previous):
+    if previous is None:
+        os.environ.pop('PGOPTIONS', None)
+    else:
+        os.environ['PGOPTIONS'] = previous
+
+# Tables whose shadows hold fewer rows than expected ({table: rows})
+def missing_rows(conn, expected):
+    short = []
+    for table, rows in expected.items():
+        found = _fetch(conn, f"SELECT COUNT(*) FROM {STAGING_SCHEMA}.{table}")[0][0]
+        if found < rows:
+            short.append(f"{table} ({found} of {rows})")
+    return short
+
+# Names of a schema's constraints and indexes on tables, keyed by (table, kind, definition)
+def _object_names(conn, schema, tables):
+    names = {}
+    for query, kind in ((CONSTRAINT_NAMES_SQL, 'constraint'), (INDEX_NAMES_SQL, 'index')):
+        for table, flavour, definition, name in _fetch(conn, query, dict(tables=list(tables), schema=schema)):
+            names.setdefault((table, kind, flavour, definition), []).append(name)
+    return names
+
+# Renames that give the swapped-in tables' constraints and indexes the names the retired
+# ones had (the names drizzle-kit knows), as (table, kind, current name, original name)
+def _original_names(originals, shadows):
+    renames = []
+    for key, names in shadows.items():
+        table, kind = key[:2]
+        for name, original in zip(names, originals.get(key, ())):
+            if name != original:
+                renames.append((table, kind, name, original))
+    return renames
+
+def _rename(conn, table, kind, name, new_name):
+    if kind == 'constraint':
+        # Renames the index of a primary key or unique constraint along with it
+        _execute(conn, f'ALTER TABLE {LIVE_SCHEMA}.{table} RENAME CONSTRAINT "{name}" TO "{new_name}"')
+    else:
+        _execute(conn, f'ALTER INDEX {LIVE_SCHEMA}."{name}" RENAME TO "{new_name}"')
+
+# Switch the shadows to logged and swap them in, in one transaction
+def swap_in(conn, outside_foreign_keys, tables=SWAP_TABLES):
+    # Referenced tables first: a logged table may not reference an unlogged one
+    for table in tables:
+        print(f"Writing {table} to the WAL...")
+        _execute(conn, f"ALTER TABLE {STAGING_SCHEMA}.{table} SET LOGGED")
+        conn.commit()
+
+    # Leftovers of an earlier swap are dropped without CASCADE too; if anything still uses
+    # them this fails here, before the live tables are touched
+    _execute(
+        conn,
+        *[f"DROP TABLE IF EXISTS {RETIRED_SCHEMA}.{table}" for table in tables],
+        f"CREATE SCHEMA IF NOT EXISTS {RETIRED_SCHEMA}",
+    )
+    conn.commit()
+
+    renames = _original_names(_object_names(conn, LIVE_SCHEMA, tables), _object_names(conn, STAGING_SCHEMA, tables))
+    for table in tables:
+        _execute(conn, f"ALTER TABLE {LIVE_SCHEMA}.{table} SET SCHEMA {RETIRED_SCHEMA}")
+    for table in tables:
+        _execute(conn, f"ALTER TABLE {STAGING_SCHEMA}.{table} SET SCHEMA {LIVE_SCHEMA}")
+    # Through temporary names, in case one generated name is another object's original
+    for i, (table, kind, name, _) in enumerate(renames):
+        _rename(conn, table, kind, name, f"seed_swap_{i}")
+    for i, (table, kind, _, original) in enumerate(renames):
+        _rename(conn, table, kind, f"seed_swap_{i}", original)
+    # Other tables' foreign keys still point at the retired tables; point them at the new
+    # ones (checked below, their rows may reference ids the new dataset does not have)
+    for table, name, definition, _, _ in outside_foreign_keys:
+        if not definition.endswith(' NOT VALID'):
+            definition += ' NOT VALID'
+        _execute(
+            conn,
+            f"ALTER TABLE {LIVE_SCHEMA}.{table} DROP CONSTRAINT {name}",
+            f"ALTER TABLE {LIVE_SCHEMA}.{table} ADD CONSTRAINT {name} {definition}",
+        )
+    conn.commit()
+    print(f"Swapped in the new {', '.join(tables)}.")
+
+    for table, name, _, validated, _ in outside_foreign_keys:
+        if not validated:
+            continue
+        try:
+            _execute(conn, f"ALTER TABLE {LIVE_SCHEMA}.{table} VALIDATE CONSTRAINT {name}")
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            print(f"Warning: {table} has rows the new dataset does not satisfy, {name} left NOT VALID: {e}")
+
+    # Without CASCADE, so nothing else (views) is dropped along with the retired tables
+    try:
+        _execute(conn, *[f"DROP TABLE {RETIRED_SCHEMA}.{table}" for table in tables], f"DROP SCHEMA {RETIRED_SCHEMA}")
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"Kept the previous dataset in schema {RETIRED_SCHEMA}, still in use: {e}")
+    drop_shadows(conn)
+
+# Discard the shadows, leaving the live tables untouched
+def drop_shadows(conn):
+    conn.rollback()
+    _execute(conn, f"DROP SCHEMA IF EXISTS {STAGING_SCHEMA} CASCADE")
+    conn.commit()
+
+def _leave_staging(conn, previous_options):
+    _unroute_connections(previous_options)
+    conn.rollback()
+    _execute(conn, "RESET search_path")
+    conn.commit()
+
+# Generate the body's rows into shadow tables and swap them in when it succeeds
+#
+# expected gives the rows ({table: rows}) the load must have written for the swap to go
+# ahead; generators report their errors instead of raising, so this is what catches a
+# stage that failed.
+@contextmanager
+def staged_dataset(conn, expected=None, tables=SWAP_TABLES):
+    print(f"Generating into UNLOGGED shadow tables in schema {STAGING_SCHEMA}...")
+    search_path = staging_search_path(conn)
+    outside_foreign_keys = create_shadows(conn, search_path, tables)
+    previous_options = _route_connections(search_path)
+    try:
+        yield
+    except BaseException:
+        _leave_staging(conn, previous_options)
+        print("Load failed, discarding the shadow tables; the live dataset is unchanged.")
+        drop_shadows(conn)
+        raise
+    _leave_staging(conn, previous_options)
+
+    short = missing_rows(conn, expected or {})
+    if short:
+        drop_shadows(conn)
+        raise RuntimeError(f"Not swapping in an incomplete dataset, short of: {', '.join(short)}")
+    swap_in(conn, outside_foreign_keys, tables)
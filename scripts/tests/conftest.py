@@ -0,0 +1,12 @@
+# Unit tests for the generator scripts
+#
+# These cover the logic that runs without a database (encoders, batch sizing, counts,
+# thread planning, stage planning, shard seeding); run them with
+#
+#   python -m pytest scripts/tests
+
+import os
+import sys
+
+# The scripts import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,98 @@
+# COPY payload encoders (text, csv and binary formats)
+
+import struct
+from datetime import datetime
+
+from bulk_loader import (
+    BINARY_HEADER,
+    BINARY_TRAILER,
+    PG_EPOCH,
+    encode_binary_rows,
+    encode_binary_tuples,
+    encode_csv_rows,
+    encode_text_rows,
+)
+
+COLUMNS = ('id', 'sender_id', 'receiver_id', 'content', 'timestamp', 'read')
+SENT = datetime(2024, 3, 1, 12, 30, 15, 250)
+
+# Special characters are escaped, NULL is \N and every row ends with a newline
+def test_text_rows_escape_values():
+    rows = [
+        (1, 2, 3, 'tab\there\nnew \\ line\r', SENT, True),
+        (2, 3, 2, None, SENT, False),
+    ]
+    assert encode_text_rows('messages', COLUMNS, rows) == (
+        b'1\t2\t3\ttab\\there\\nnew \\\\ line\\r\t2024-03-01T12:30:15.000250\tt\n'
+        b'2\t3\t2\t\\N\t2024-03-01T12:30:15.000250\tf\n'
+    )
+
+def test_text_rows_encode_utf8():
+    rows = [(1, 2, 3, 'café ☕', SENT, True)]
+    assert 'café ☕'.encode('utf-8') in encode_text_rows('messages', COLUMNS, rows)
+
+def test_text_rows_empty():
+    assert encode_text_rows('messages', COLUMNS, []) == b''
+
+# Strings are always quoted (quotes doubled), so only an unquoted empty field is NULL
+def test_csv_rows_quote_strings():
+    rows = [
+        (1, 2, 3, 'say "hi", then\nleave', SENT, True),
+        (2, 3, 2, '', SENT, False),
+        (3, 2, 3, None, SENT, False),
+    ]
+    assert encode_csv_rows('messages', COLUMNS, rows) == (
+        b'1,2,3,"say ""hi"", then\nleave",2024-03-01T12:30:15.000250,t\n'
+        b'2,3,2,"",2024-03-01T12:30:15.000250,f\n'
+        b'3,2,3,,2024-03-01T12:30:15.000250,f\n'
+    )
+
+# Split one binary tuple into its raw fields (None for NULL)
+def _binary_fields(payload, offset):
+    count, = struct.unpack_from('!h', payload, offset)
+    offset += 2
+    fields = []
+    for _ in range(count):
+        length, = struct.unpack_from('!i', payload, offset)
+        offset += 4
+        if length < 0:
+            fields.append(None)
+            continue
+        fields.append(payload[offset:offset + length])
+        offset += length
+    return fields, offset
+
+def test_binary_rows_frame_tuples():
+    rows = [(1, 2, 3, 'hello', SENT, True), (2, 3, 2, None, SENT, False)]
+    payload = encode_binary_rows('messages', COLUMNS, rows)
+    assert payload.startswith(BINARY_HEADER)
+    assert payload.endswith(BINARY_TRAILER)
+    assert payload[len(BINARY_HEADER):-len(BINARY_TRAILER)] == encode_binary_tuples('messages', COLUMNS, rows)
+
+def test_binary_tuples_encode_each_type():
+    payload = encode_binary_tuples('messages', COLUMNS, [(1, -2, 3, 'café', SENT, True)])
+    fields, end = _binary_fields(payload, 0)
+    assert end == len(payload)
+    assert fields[:3] == [struct.pack('!i', 1), struct.pack('!i', -2), struct.pack('!i', 3)]
+    assert fields[3] == 'café'.encode('utf-8')
+    # Microseconds since 2000-01-01
+    assert struct.unpack('!q', fields[4])[0] == (SENT - PG_EPOCH) // SENT.resolution
+    assert fields[5] == b'\x01'
+
+def test_binary_tuples_encode_nulls_and_false():
+    payload = encode_binary_tuples('messages', COLUMNS, [(2, 3, 2, None, SENT, False)])
+    fields, _ = _binary_fields(payload, 0)
+    assert fields[3] is None
+    assert fields[5] == b'\x00'
+
+def test_binary_jsonb_has_version_byte():
+    columns = ('id', 'user_id', 'messages', 'last_updated')
+    payload = encode_binary_tuples('conversations', columns, [(1, 2, '[{"a": 1}]', SENT)])
+    fields, _ = _binary_fields(payload, 0)
+    assert fields[2] == b'\x01[{"a": 1}]'
+
+def test_binary_timestamp_before_epoch_is_negative():
+    columns = ('id', 'user_id', 'messages', 'last_updated')
+    payload = encode_binary_tuples('conversations', columns, [(1, 2, '[]', datetime(1999, 12, 31, 23, 59, 59))])
+    fields, _ = _binary_fields(payload, 0)
+    assert struct.unpack('!q', fields[3])[0] == -1000000
@@ -0,0 +1,47 @@
+# Recent sessions appended by the incremental mode
+
+import random
+from datetime import datetime, timedelta
+
+from incremental import build_recent_session, hourly_rates, window_rows
+from python_data_generator import SESSION_COLUMNS, scaled_counts
+
+NOW = datetime(2024, 3, 1, 12, 0)
+ADVISOR = (7, 10, 20, 30)
+
+def _recent_sessions(hours, count=2000):
+    random.seed(8)
+    start = NOW - timedelta(hours=hours)
+    for session_id in range(count):
+        row, payment = build_recent_session(session_id, 1, ADVISOR, start, NOW)
+        yield start, dict(zip(SESSION_COLUMNS, row)), payment
+
+# Nothing happens after now: sessions that have ended are settled, running ones are not
+def test_recent_sessions_end_by_now_or_run():
+    statuses = set()
+    for start, session, payment in _recent_sessions(6):
+        statuses.add(session['status'])
+        assert start <= session['start_time'] <= NOW
+        if session['end_time'] > NOW:
+            assert session['status'] == 'in_progress'
+        else:
+            assert session['status'] in ('completed', 'canceled')
+        if session['status'] == 'in_progress':
+            assert (session['actual_end_time'], session['billed_amount'], session['is_paid']) == (None, None, False)
+            assert payment is None
+        if payment:
+            assert session['status'] == 'completed'
+            assert payment[6] <= NOW
+    assert statuses == {'completed', 'canceled', 'in_progress'}
+
+# A window shorter than the shortest session only holds running sessions
+def test_recent_sessions_in_short_window():
+    for _, session, payment in _recent_sessions(0.2, 200):
+        assert session['status'] == 'in_progress'
+        assert payment is None
+
+def test_window_rows_follow_full_run_rates():
+    rates = hourly_rates(scaled_counts(1))
+    assert window_rows(rates['sessions'], NOW - timedelta(days=30), NOW) == 200
+    assert window_rows(rates['messages'], NOW - timedelta(days=7), NOW) == 500
+    assert window_rows(rates['messages'], NOW, NOW) == 0
@@ -0,0 +1,81 @@
+# Shard planning and seeding: the master seed alone decides every shard's rows
+
+import random
+from datetime import datetime
+from itertools import chain
+
+import python_data_generator as generator
+from bulk_loader import encode_binary_rows
+from parallel import (
+    SHARD_ROWS,
+    plan_shards,
+    seed_shard,
+    shard_advisors,
+    shard_messages,
+    shard_seed,
+    shard_sessions,
+    shard_users,
+)
+from pipeline import chunked
+
+NOW = datetime(2024, 3, 1, 12, 0)
+USER_IDS = list(range(1, 101))
+ADVISORS = [(advisor_id, 10, 20, 30) for advisor_id in range(101, 151)]
+
+# Rows a shard writes, run in chunks of chunk_size, as COPY binary payloads per table
+def _shard_payloads(shard_stage, context, seed, name, index, start, count, chunk_size=SHARD_ROWS):
+    seed_shard(seed, name, index)
+    source, build = shard_stage(None, context, start, count)
+    tables = {}
+    for table, columns, rows in chain.from_iterable(build(chunk) for chunk in chunked(source, chunk_size)):
+        tables.setdefault((table, columns), []).extend(rows)
+    return {table: encode_binary_rows(table, columns, rows) for (table, columns), rows in tables.items()}
+
+# Shard seeds come from SHA-256, so they are the same in every process and Python version
+def test_shard_seed_is_stable():
+    assert shard_seed(1, 'users', 0) == 8358114068902405045
+    assert len({shard_seed(seed, name, index) for seed in (1, 2) for name in ('users', 'sessions') for index in range(3)}) == 12
+
+def test_plan_shards_cover_rows():
+    assert plan_shards(0) == []
+    assert plan_shards(SHARD_ROWS) == [(0, 0, SHARD_ROWS)]
+    shards = plan_shards(2 * SHARD_ROWS + 1)
+    assert shards == [(0, 0, SHARD_ROWS), (1, SHARD_ROWS, SHARD_ROWS), (2, 2 * SHARD_ROWS, 1)]
+
+def test_user_shards_are_byte_identical():
+    context = {'first_id': 1}
+    first = _shard_payloads(shard_users, context, 42, 'users', 3, 300, 50)
+    assert first == _shard_payloads(shard_users, context, 42, 'users', 3, 300, 50)
+    assert first != _shard_payloads(shard_users, context, 43, 'users', 3, 300, 50)
+
+def test_advisor_shards_are_byte_identical():
+    context = {'first_id': 1, 'first_specialty_id': 1}
+    first = _shard_payloads(shard_advisors, context, 42, 'advisors', 0, 0, 40)
+    assert set(first) == {'users', 'advisor_specialties'}
+    assert first == _shard_payloads(shard_advisors, context, 42, 'advisors', 0, 0, 40)
+
+# Session and message rows don't depend on the chunk size the pipeline runs them in
+def test_session_shards_ignore_chunk_size():
+    context = {
+        'user_ids': USER_IDS, 'advisors': ADVISORS, 'first_id': 1, 'first_transaction_id': 1, 'now': NOW,
+    }
+    first = _shard_payloads(shard_sessions, context, 42, 'sessions', 1, 500, 300)
+    assert first['transactions']
+    assert first == _shard_payloads(shard_sessions, context, 42, 'sessions', 1, 500, 300, chunk_size=7)
+
+def test_message_shards_ignore_chunk_size():
+    counts = generator.scaled_counts(1)
+    context = {
+        'user_ids': USER_IDS, 'advisor_ids': [advisor[0] for advisor in ADVISORS], 'first_id': 1, 'now': NOW,
+        'counts': counts, 'total': counts['messages'],
+    }
+    first = _shard_payloads(shard_messages, context, 42, 'messages', 0, 0, 200)
+    assert first == _shard_payloads(shard_messages, context, 42, 'messages', 0, 0, 200, chunk_size=13)
+
+# A shard's rows depend on its index only through its seed, not on the shards run before it
+def test_shards_ignore_run_order():
+    context = {'first_id': 1}
+    alone = _shard_payloads(shard_users, context, 42, 'users', 1, 100, 100)
+    _shard_payloads(shard_users, context, 42, 'users', 0, 0, 100)
+    random.random()
+    assert alone == _shard_payloads(shard_users, context, 42, 'users', 1, 100, 100)
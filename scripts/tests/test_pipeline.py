@@ -0,0 +1,73 @@
+# Adaptive batch sizing and chunking
+
+import random
+
+from pipeline import MAX_BATCH_STEP, AdaptiveBatchSize, chunked, reservoir_sample
+
+# Fast chunks grow the batch, by at most MAX_BATCH_STEP per chunk
+def test_observe_grows_fast_batches():
+    size = AdaptiveBatchSize('t', 100, max_rows=10000, target_seconds=1)
+    size.observe(100, 0.01, 0.02)
+    assert size.size == 100 * MAX_BATCH_STEP
+
+# Slow chunks shrink the batch, by at most MAX_BATCH_STEP per chunk
+def test_observe_shrinks_slow_batches():
+    size = AdaptiveBatchSize('t', 100, max_rows=10000, target_seconds=1)
+    size.observe(100, 10, 10)
+    assert size.size == 100 / MAX_BATCH_STEP
+
+def test_observe_settles_on_target():
+    size = AdaptiveBatchSize('t', 100, max_rows=10000, target_seconds=1)
+    for _ in range(20):
+        size.observe(size.size, size.size * 0.001, size.size * 0.001)
+    assert size.size == 1000
+
+def test_observe_stays_within_bounds():
+    size = AdaptiveBatchSize('t', 100, min_rows=80, max_rows=150, target_seconds=1)
+    size.observe(100, 0.001, 0.001)
+    assert size.size == 150
+    size = AdaptiveBatchSize('t', 100, min_rows=80, max_rows=150, target_seconds=1)
+    size.observe(100, 100, 100)
+    assert size.size == 80
+
+# A short last chunk and an empty one leave the size alone
+def test_observe_ignores_short_chunks():
+    size = AdaptiveBatchSize('t', 100, max_rows=10000, target_seconds=1)
+    size.observe(30, 10, 10)
+    size.observe(0, 10, 10)
+    assert size.size == 100
+    assert size.row_seconds is None
+    assert (size.batches, size.smallest, size.largest) == (1, 30, 30)
+
+# A grown batch that lowers throughput becomes the ceiling
+def test_observe_backs_off_when_throughput_drops():
+    size = AdaptiveBatchSize('t', 100, max_rows=10000, target_seconds=1)
+    size.observe(100, 0.01, 0.1)
+    assert size.size == 200
+    size.observe(200, 0.02, 1.0)
+    assert (size.ceiling, size.size) == (100, 100)
+    size.observe(100, 0.001, 0.01)
+    assert size.size == 100
+
+def test_initial_size_is_clamped():
+    assert AdaptiveBatchSize('t', 0, min_rows=10, max_rows=50).size == 10
+    assert AdaptiveBatchSize('t', 500, min_rows=10, max_rows=50).size == 50
+
+def test_chunked_fixed_size():
+    assert list(chunked(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+
+# An adaptive size is read again for every chunk
+def test_chunked_adaptive_size():
+    size = AdaptiveBatchSize('t', 2, max_rows=10)
+    chunks = chunked(range(10), size)
+    assert next(chunks) == [0, 1]
+    size.size = 5
+    assert next(chunks) == [2, 3, 4, 5, 6]
+    assert size.pulled == 5
+    assert list(chunks) == [[7, 8, 9]]
+
+def test_reservoir_sample():
+    assert reservoir_sample(range(3), 5) == [0, 1, 2]
+    sample = reservoir_sample(range(1000), 10, random.Random(1))
+    assert len(set(sample)) == 10
+    assert sample == reservoir_sample(range(1000), 10, random.Random(1))
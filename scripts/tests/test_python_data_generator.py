@@ -0,0 +1,131 @@
+# Row counts, message threads and session rows
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+import python_data_generator as generator
+from python_data_generator import (
+    MESSAGES_PER_THREAD,
+    SESSION_COLUMNS,
+    message_rows,
+    message_thread_count,
+    message_threads,
+    scaled_counts,
+)
+
+NOW = datetime(2024, 3, 1, 12, 0)
+ADVISOR = (7, 10, 20, 30)
+
+def test_scaled_counts_scale_factor_1():
+    assert scaled_counts(1) == {
+        'users': 100, 'admins': 2, 'advisors': 50, 'sessions': 200, 'messages': 500,
+        'conversations': 50, 'topups': 50, 'message_threads': 43,
+    }
+
+# Derived counts follow an overridden user count
+def test_scaled_counts_follow_users_override():
+    assert scaled_counts(1, {'users': 5000}) == scaled_counts(50)
+
+def test_scaled_counts_keep_overrides():
+    counts = scaled_counts(2, {'sessions': 7, 'admins': 0})
+    assert (counts['users'], counts['sessions'], counts['admins']) == (200, 7, 0)
+
+# The thread cap follows the message count unless it is overridden itself
+def test_scaled_counts_message_threads():
+    assert scaled_counts(1, {'messages': 115})['message_threads'] == 10
+    assert scaled_counts(1, {'messages': 115, 'message_threads': 3})['message_threads'] == 3
+
+def test_scaled_counts_never_zero():
+    counts = scaled_counts(0.001)
+    assert min(counts[name] for name in counts if name != 'admins') == 1
+
+def test_scaled_counts_reject_bad_input():
+    with pytest.raises(ValueError, match="Unknown count: bogus"):
+        scaled_counts(1, {'bogus': 1})
+    with pytest.raises(ValueError):
+        scaled_counts(0)
+
+# The thread cap is also bounded by the users and advisors there are
+def test_message_rows():
+    counts = scaled_counts(1)
+    assert message_thread_count(counts) == 43
+    assert message_thread_count(counts, users=5) == 5
+    assert message_rows(counts) == 494
+    assert message_rows(counts, minimum=True) == 43 * MESSAGES_PER_THREAD[0]
+    assert message_rows(dict(counts, messages=10)) == 10
+
+# Split (sender, receiver, turn) triples into threads
+def _threads(messages):
+    threads = []
+    for message in messages:
+        if message[2] == 0:
+            threads.append([])
+        threads[-1].append(message)
+    return threads
+
+def test_message_threads_fill_count():
+    messages = list(message_threads([1, 2, 3], [10, 11], 500, rng=random.Random(1)))
+    assert len(messages) == 500
+    threads = _threads(messages)
+    for thread in threads[:-1]:
+        assert MESSAGES_PER_THREAD[0] <= len(thread) <= MESSAGES_PER_THREAD[1]
+    assert 1 <= len(threads[-1]) <= MESSAGES_PER_THREAD[1]
+
+# Turns alternate between the user and the advisor of the thread
+def test_message_threads_alternate_senders():
+    for thread in _threads(message_threads([1, 2, 3], [10, 11], 200, rng=random.Random(2))):
+        user_id, advisor_id, _ = thread[0]
+        assert user_id in (1, 2, 3) and advisor_id in (10, 11)
+        for sender_id, receiver_id, i in thread:
+            expected = (user_id, advisor_id) if i % 2 == 0 else (advisor_id, user_id)
+            assert (sender_id, receiver_id) == expected
+        assert [i for _, _, i in thread] == list(range(len(thread)))
+
+# pair_count caps the threads, so fewer than count messages may come out
+def test_message_threads_pair_count():
+    messages = list(message_threads([1], [10], 1000, pair_count=4, rng=random.Random(3)))
+    assert len(_threads(messages)) == 4
+    assert 4 * MESSAGES_PER_THREAD[0] <= len(messages) <= 4 * MESSAGES_PER_THREAD[1]
+    assert list(message_threads([1], [10], 1000, pair_count=0)) == []
+
+def test_message_threads_deterministic():
+    first = list(message_threads(list(range(50)), list(range(50, 60)), 300, rng=random.Random(4)))
+    assert first == list(message_threads(list(range(50)), list(range(50, 60)), 300, rng=random.Random(4)))
+
+def _session(row):
+    return dict(zip(SESSION_COLUMNS, row))
+
+# Only completed sessions carry actual times and billing; only they can be paid
+def test_build_session_fields_follow_status():
+    random.seed(5)
+    for session_id in range(2000):
+        row, payment = generator.build_session(session_id, 1, ADVISOR, NOW)
+        session = _session(row)
+        assert session['start_time'] <= NOW
+        assert session['rate_per_minute'] in ADVISOR[1:]
+        if session['status'] == 'completed':
+            assert session['actual_end_time'] == session['end_time']
+            assert session['billed_amount'] == session['rate_per_minute'] * session['actual_duration']
+        else:
+            assert session['billed_amount'] is None
+            assert not session['is_paid']
+        assert (payment is not None) == bool(session['is_paid'])
+        if payment:
+            assert payment[4] == -session['billed_amount']
+
+def test_session_outcome_by_age():
+    random.seed(6)
+    assert {generator.session_outcome(10)[0] for _ in range(100)} == {'completed'}
+    assert {generator.session_outcome(5)[0] for _ in range(100)} == {'completed', 'canceled'}
+    recent = {generator.session_outcome(1) for _ in range(100)}
+    assert recent == {('scheduled', False), ('in_progress', False)}
+
+def test_session_rows_in_progress():
+    row, payment = generator.session_rows(1, 2, 3, NOW, 30, 'chat', 'in_progress', None, 10, False)
+    session = _session(row)
+    assert session['actual_start_time'] == NOW
+    assert session['end_time'] == NOW + timedelta(minutes=30)
+    assert (session['actual_end_time'], session['billed_amount'], session['is_paid']) == (None, None, False)
+    assert payment is None
@@ -0,0 +1,82 @@
+# Stage dependencies and planning
+
+import pytest
+
+from python_data_generator import scaled_counts
+from stages import RESOURCE_QUERIES, STAGES, plan_stages, stage_dependencies
+
+COUNTS = scaled_counts(1)
+
+# Connection whose COUNT(*) queries answer from a dict of resource row counts
+class FakeConnection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.closed_cursors = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.result = None
+
+    def execute(self, query, params=()):
+        resource = next(name for name, (sql, args) in RESOURCE_QUERIES.items() if (sql, args) == (query, params))
+        self.result = (self.conn.rows.get(resource, 0),)
+
+    def fetchone(self):
+        return self.result
+
+    def close(self):
+        self.conn.closed_cursors += 1
+
+# Row counts of a database where the given stages have run
+def _complete(*names):
+    rows = {}
+    for name in names:
+        for resource in STAGES[name]['outputs']:
+            rows[resource] = 10 ** 6
+    return rows
+
+def test_stage_dependencies():
+    assert stage_dependencies('users') == ()
+    assert stage_dependencies('advisors') == ('specialties',)
+    assert stage_dependencies('sessions') == ('users', 'advisors')
+    assert stage_dependencies('reviews') == ('sessions',)
+
+# Every stage comes after the stages it depends on
+def test_stages_in_dependency_order():
+    order = list(STAGES)
+    for name in STAGES:
+        for dependency in stage_dependencies(name):
+            assert order.index(dependency) < order.index(name)
+
+def test_plan_runs_missing_prerequisites():
+    conn = FakeConnection({})
+    assert plan_stages(conn, ['reviews'], COUNTS) == ['specialties', 'users', 'advisors', 'sessions', 'reviews']
+    assert conn.closed_cursors == 1
+
+def test_plan_skips_complete_prerequisites():
+    conn = FakeConnection(_complete('specialties', 'users', 'advisors'))
+    assert plan_stages(conn, ['sessions', 'messages'], COUNTS) == ['sessions', 'messages']
+
+# A complete prerequisite covers everything it depends on
+def test_plan_trusts_complete_prerequisites():
+    conn = FakeConnection(_complete('sessions'))
+    assert plan_stages(conn, ['reviews'], COUNTS) == ['reviews']
+
+# Targets run even when complete, unless skip_complete is set
+def test_plan_targets():
+    conn = FakeConnection(_complete('specialties', 'users'))
+    assert plan_stages(conn, ['users'], COUNTS) == ['users']
+    assert plan_stages(conn, ['users'], COUNTS, skip_complete=True) == []
+
+# A counted stage is only complete with at least the rows it generates
+def test_plan_reruns_short_counted_stages():
+    conn = FakeConnection({'specialties': 10 ** 6, 'users.user': COUNTS['users'] - 1})
+    assert plan_stages(conn, ['users', 'conversations'], COUNTS, skip_complete=True) == ['users', 'conversations']
+
+def test_plan_rejects_unknown_stage():
+    with pytest.raises(ValueError, match="Unknown stage: bogus"):
+        plan_stages(FakeConnection({}), ['bogus'], COUNTS)
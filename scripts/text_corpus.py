@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+# Pre-generated text corpus for message, review, session and conversation content
+#
+# Faker builds every sentence word by word, which makes faker.text(), faker.paragraph()
+# and faker.sentence() the bulk of the generators' runtime. A TextCorpus builds pools of
+# sentences and paragraphs with Faker once, saves them to a cache file keyed by locale,
+# seed and Faker version, and memory-maps it on later runs, so content costs a pool
+# lookup and a join per row.
+#
+# The uniqueness ratio is the share of paragraphs assembled fresh from randomly picked
+# pool sentences; the rest are reused verbatim from the paragraph pool. At 1.0 nearly
+# every body is distinct, at 0.0 every paragraph is one of the PARAGRAPH_POOL.
+#
+# Cache file layout (native byte order):
+#   MAGIC, sentence count, paragraph count (int64)
+#   offsets of every sentence then every paragraph into the text blob, plus the end
+#   offset of each section (int64)
+#   UTF-8 text blob
+
+import os
+import mmap
+import random
+import struct
+from array import array
+
+import faker as faker_package
+from faker import Faker
+
+DEFAULT_LOCALE = 'en_US'
+DEFAULT_SEED = 0
+DEFAULT_UNIQUENESS = 0.9
+
+# Pool sizes
+SENTENCE_POOL = 20000
+PARAGRAPH_POOL = 5000
+
+MAGIC = b'AGCORPUS'
+_HEADER = struct.Struct('=8sqq')
+
+# Where corpus files are cached (override with TEXT_CORPUS_DIR)
+def cache_dir():
+    return os.environ.get('TEXT_CORPUS_DIR') or os.path.join(os.path.expanduser('~'), '.cache', 'angelguides')
+
+def cache_path(locale, seed, directory=None):
+    name = f"corpus-{locale}-{seed}-faker{faker_package.VERSION}-{SENTENCE_POOL}x{PARAGRAPH_POOL}.bin"
+    return os.path.join(directory or cache_dir(), name)
+
+# Generate the pools with a dedicated Faker instance and write them to path
+def build_corpus_file(path, locale, seed):
+    print(f"Building text corpus {os.path.basename(path)}...")
+    fake = Faker(locale)
+    fake.seed_instance(seed)
+    texts = [fake.sentence() for _ in range(SENTENCE_POOL)]
+    texts += [fake.paragraph() for _ in range(PARAGRAPH_POOL)]
+
+    blob = bytearray()
+    offsets = array('q')
+    for index, text in enumerate(texts):
+        if index == SENTENCE_POOL:
+            offsets.append(len(blob))  # End of the sentence section
+        offsets.append(len(blob))
+        blob += text.encode('utf-8')
+    offsets.append(len(blob))
+
+    # Write to a temporary file first so concurrent runs never read a partial corpus
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, 'wb') as corpus_file:
+        corpus_file.write(_HEADER.pack(MAGIC, SENTENCE_POOL, PARAGRAPH_POOL))
+        offsets.tofile(corpus_file)
+        corpus_file.write(blob)
+    os.replace(temporary, path)
+
+# Text source backed by a memory-mapped corpus file
+class TextCorpus:
+    def __init__(self, path, uniqueness=DEFAULT_UNIQUENESS, spec=None):
+        self.uniqueness = uniqueness
+        self.spec = spec
+        with open(path, 'rb') as corpus_file:
+            self.data = mmap.mmap(corpus_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.sentence_count, self.paragraph_count = _HEADER.unpack_from(self.data)
+        if magic != MAGIC:
+            raise ValueError(f"Not a text corpus file: {path}")
+        offset_count = self.sentence_count + self.paragraph_count + 2
+        self.offsets = memoryview(self.data)[_HEADER.size:_HEADER.size + offset_count * 8].cast('q')
+        self.blob_start = _HEADER.size + offset_count * 8
+
+    def _text(self, index):
+        start = self.blob_start + self.offsets[index]
+        end = self.blob_start + self.offsets[index + 1]
+        return self.data[start:end].decode('utf-8')
+
+    def _fresh(self, rng):
+        return rng.random() < self.uniqueness
+
+    def sentence(self, rng=random):
+        return self._text(rng.randrange(self.sentence_count))
+
+    # A paragraph of 1-4 sentences, like faker.paragraph()
+    def paragraph(self, rng=random):
+        if self._fresh(rng):
+            return ' '.join(self.sentence(rng) for _ in range(rng.randint(1, 4)))
+        return self._text(self.sentence_count + 1 + rng.randrange(self.paragraph_count))
+
+    # Paragraphs joined by newlines while they fit in max_chars, like faker.text() for
+    # 100 characters and more (which retries until at least one paragraph fits)
+    def text(self, max_chars, rng=random):
+        while True:
+            parts = []
+            size = 0
+            while size < max_chars:
+                paragraph = self.paragraph(rng)
+                size += len(paragraph) + (1 if parts else 0)
+                parts.append(paragraph)
+            # The last paragraph overflows unless it fits exactly
+            if size > max_chars:
+                parts.pop()
+            if parts:
+                return '\n'.join(parts)
+
+# Text source that calls Faker for every text (the generators' original behaviour)
+class FakerText:
+    spec = None
+
+    def __init__(self, fake):
+        self.fake = fake
+
+    def sentence(self, rng=random):
+        return self.fake.sentence()
+
+    def paragraph(self, rng=random):
+        return self.fake.paragraph()
+
+    def text(self, max_chars, rng=random):
+        return self.fake.text(max_nb_chars=max_chars)
+
+# Open the corpus for a locale and seed, building the cache file on first use
+def open_corpus(locale=DEFAULT_LOCALE, seed=DEFAULT_SEED, uniqueness=DEFAULT_UNIQUENESS, directory=None):
+    if not 0 <= uniqueness <= 1:
+        raise ValueError(f"Uniqueness ratio must be between 0 and 1, got {uniqueness}")
+    path = cache_path(locale, seed, directory)
+    if not os.path.exists(path):
+        build_corpus_file(path, locale, seed)
+    return TextCorpus(path, uniqueness, (locale, seed, uniqueness, directory))
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+
+# Vectorized session synthesis with NumPy
+#
+# generate_sessions() draws every attribute with scalar random calls and works out the
+# status, rate and billing with an if/elif ladder per row. Here each attribute is drawn
+# for a whole batch at once and the ladder becomes boolean masks, so a batch of sessions
+# and their session_payment transactions comes out as column arrays. Nullable columns
+# are numpy masked arrays (masked = NULL).
+#
+# The distributions match build_session(): days ago 0-30, hour offset 0-23, duration
+# 15-90 minutes, uniform session type, and for the status
+#   days ago > 7   completed, paid 70% of the time
+#   days ago 3-7   completed or canceled 50/50, completed ones paid 50% of the time
+#   days ago 0-2   scheduled or in_progress 50/50, never paid
+# Notes are set on 30% of sessions; their text is sampled from a pool of texts drawn
+# once per run from the generator's text source, since calling Faker per row would cost
+# more than everything else.
+
+import random
+from datetime import datetime
+
+import numpy as np
+
+import python_data_generator as generator
+from bulk_loader import COLUMN_TYPES, TEXT_ENCODERS, CopySink, make_sink
+from instrumentation import InstrumentedSink
+from python_data_generator import (
+    PAYMENT_COLUMNS,
+    SESSION_COLUMNS,
+    SessionType,
+    TransactionType,
+)
+
+# Sessions drawn, encoded and committed together
+VECTOR_BATCH_ROWS = 100000
+
+# Distinct note texts drawn per run
+NOTES_POOL_SIZE = 1000
+
+SESSION_TYPES = np.array([SessionType.CHAT, SessionType.AUDIO, SessionType.VIDEO], dtype=object)
+
+# Status codes, in the order of SESSION_STATUSES
+COMPLETED, CANCELED, SCHEDULED, IN_PROGRESS = range(4)
+SESSION_STATUSES = np.array(["completed", "canceled", "scheduled", "in_progress"], dtype=object)
+
+MINUTE = np.timedelta64(1, 'm')
+HOUR = np.timedelta64(1, 'h')
+DAY = np.timedelta64(1, 'D')
+
+# Draw count sessions and their payments as column arrays
+#
+# user_ids is an int array, advisors an (n, 4) int array of (id, chat_rate, audio_rate,
+# video_rate) and first_id the id of the first session. Returns two dicts of column name
+# to array, for SESSION_COLUMNS and PAYMENT_COLUMNS.
+def session_columns(rng, user_ids, advisors, notes_pool, first_id, count, now):
+    session_ids = np.arange(first_id, first_id + count, dtype=np.int64)
+    user_id = user_ids[rng.integers(len(user_ids), size=count)]
+    advisor = advisors[rng.integers(len(advisors), size=count)]
+
+    # Timing: start in the past 30 days, 15 to 90 minutes long
+    days_ago = rng.integers(0, 31, size=count)
+    hours = rng.integers(0, 24, size=count)
+    duration = rng.integers(15, 91, size=count)
+    start_time = np.datetime64(now, 'us') - days_ago * DAY - hours * HOUR
+    end_time = start_time + duration * MINUTE
+
+    # Rate for the session type (advisor columns 1-3 are chat, audio and video rates)
+    session_type = rng.integers(0, 3, size=count)
+    rate = advisor[np.arange(count), session_type + 1]
+
+    # Status from how long ago the session was, with a coin flip for recent ones
+    coin = rng.random(count) < 0.5
+    status = np.where(
+        days_ago > 7,
+        COMPLETED,
+        np.where(days_ago > 2, np.where(coin, COMPLETED, CANCELED), np.where(coin, SCHEDULED, IN_PROGRESS)),
+    )
+    completed = status == COMPLETED
+    started = completed | (status == IN_PROGRESS)
+    paid_threshold = np.where(days_ago > 7, 0.3, 0.5)
+    is_paid = completed & (rng.random(count) > paid_threshold)
+    billed_amount = rate * duration
+
+    # 30% of sessions have notes
+    has_notes = rng.random(count) > 0.7
+    notes = notes_pool[rng.integers(len(notes_pool), size=count)]
+
+    sessions = {
+        'id': session_ids,
+        'user_id': user_id,
+        'advisor_id': advisor[:, 0],
+        'start_time': start_time,
+        'end_time': end_time,
+        'session_type': SESSION_TYPES[session_type],
+        'status': SESSION_STATUSES[status],
+        'notes': np.ma.masked_array(notes, mask=~has_notes),
+        'rate_per_minute': rate,
+        'actual_start_time': np.ma.masked_array(start_time, mask=~started),
+        'actual_end_time': np.ma.masked_array(end_time, mask=~completed),
+        'actual_duration': np.ma.masked_array(duration, mask=~completed),
+        'billed_amount': np.ma.masked_array(billed_amount, mask=~completed),
+        'is_paid': is_paid,
+    }
+
+    # Payments for completed sessions that have been paid
+    paying = is_paid & (billed_amount > 0)
+    payment_types = sessions['session_type'][paying].tolist()
+    payment_advisors = sessions['advisor_id'][paying]
+    payments = {
+        'type': np.full(int(paying.sum()), TransactionType.SESSION_PAYMENT, dtype=object),
+        'user_id': user_id[paying],
+        'advisor_id': payment_advisors,
+        'session_id': session_ids[paying],
+        'amount': -billed_amount[paying],  # Negative for user (payment)
+        'description': np.array([
+            f"Payment for {session_type} session with advisor #{advisor_id}"
+            for session_type, advisor_id in zip(payment_types, payment_advisors.tolist())
+        ], dtype=object),
+        'timestamp': end_time[paying],  # Paid when the session ended
+        'payment_status': np.full(int(paying.sum()), "completed", dtype=object),
+    }
+    return sessions, payments
+
+# Convert column arrays to row tuples for sinks that take rows (masked values become None)
+def column_rows(arrays):
+    return list(zip(*(array.tolist() for array in arrays)))
+
+# Format one column as COPY text values
+def _text_column(kind, column):
+    values = np.ma.getdata(column)
+    if kind == 'int4':
+        strings = values.astype(str)
+    elif kind == 'bool':
+        strings = np.where(values, 't', 'f')
+    elif kind == 'timestamp':
+        strings = np.datetime_as_string(values, unit='us')
+    else:
+        encode = TEXT_ENCODERS[kind]
+        strings = np.array(['' if value is None else encode(value) for value in values.tolist()], dtype=object)
+    mask = np.ma.getmaskarray(column)
+    if mask.any():
+        strings = np.where(mask, '\\N', strings)
+    return strings.tolist()
+
+# Encode column arrays as a COPY text format payload, formatting a column at a time
+def encode_text_columns(table, columns, arrays):
+    types = COLUMN_TYPES[table]
+    strings = [_text_column(types[column], array) for column, array in zip(columns, arrays)]
+    lines = list(map('\t'.join, zip(*strings)))
+    lines.append('')
+    return '\n'.join(lines).encode('utf-8')
+
+# Write column arrays to a sink, skipping the per-value encoders for COPY text
+def write_columns(sink, table, columns, data):
+    arrays = [data[column] for column in columns]
+    row_count = len(arrays[0])
+    if not row_count:
+        return 0
+    # Judge the sink the payload ends up in; the instrumented wrapper still writes it
+    target = sink.sink if isinstance(sink, InstrumentedSink) else sink
+    if isinstance(target, CopySink) and not target.binary:
+        return sink.write_encoded(table, columns, encode_text_columns(table, columns, arrays), row_count)
+    return sink.write(table, columns, column_rows(arrays))
+
+# Generate sessions with vectorized synthesis (same tables and distributions as generate_sessions)
+def generate_sessions_vectorized(conn, count=200, sink=None, now=None):
+    print(f"Generating {count} sessions (vectorized)...")
+
+    sink = sink or make_sink(conn)
+    try:
+        # Get all users and the advisors with rates from the shared registry
+        user_ids = generator.id_registry.pool(conn, 'users').as_numpy()
+        advisors = generator.id_registry.pool(conn, 'advisor_rates').as_numpy()
+
+        if not len(user_ids) or not len(advisors):
+            print("No users or advisors found. Skipping session generation.")
+            return
+
+        now = now or datetime.now()
+        rng = np.random.default_rng(random.getrandbits(64))
+        notes_pool = np.array([generator.text_source.text(200) for _ in range(NOTES_POOL_SIZE)], dtype=object)
+
+        # Commit in batches to bound memory
+        written = {}
+        for start in range(0, count, VECTOR_BATCH_ROWS):
+            batch = min(VECTOR_BATCH_ROWS, count - start)
+            session_ids = sink.reserve_id_range('sessions', batch)
+            sessions, payments = session_columns(rng, user_ids, advisors, notes_pool, session_ids.start, batch, now)
+            for table, columns, data in (('sessions', SESSION_COLUMNS, sessions), ('transactions', PAYMENT_COLUMNS, payments)):
+                written[table] = written.get(table, 0) + write_columns(sink, table, columns, data)
+            sink.commit()
+        print(f"Created {written.get('sessions', 0)} sessions with {written.get('transactions', 0)} related transactions.")
+    except Exception as e:
+        sink.rollback()
+        print(f"Error generating sessions: {e}")